@@ -4,9 +4,65 @@ import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
 from io import BytesIO
-import math
+import time
+import threading
+import uuid
 from datetime import datetime
 
+from grade_analyzer import profiling
+from grade_analyzer.analysis import compare_classes, cube_analyses, find_problem_subjects
+from grade_analyzer.cache import AnalysisCache, content_hash, make_key
+from grade_analyzer.charts import cube_box, cube_histogram
+from grade_analyzer.comparison import (
+    RANK_METRICS,
+    class_matrix,
+    exact_pvalues,
+    matrix_frame,
+    top_divergent_pairs,
+)
+from grade_analyzer.correlation import (
+    MIN_PAIRS,
+    TARGET_COLUMNS,
+    alignment_table,
+    build_correlations,
+    class_alignment_table,
+    correlation_frame,
+    strongest_pairs,
+)
+from grade_analyzer.cube import build_stats_cube, class_rows
+from grade_analyzer.export import XLSX_MIME, export_workbook
+from grade_analyzer.history import HistoryStore
+from grade_analyzer.incremental import changed_cells_table, diff_frames, has_changes, update_cube
+from grade_analyzer.ingest import ingest_upload, remove_snapshot
+from grade_analyzer.jobs import JobQueue, stage_progress
+from grade_analyzer.parallel import default_workers
+from grade_analyzer.profiling import profiled, span
+from grade_analyzer.ranking import (
+    GPA_COLUMN,
+    build_rank_index,
+    leaderboard,
+    student_names,
+    student_profile,
+    student_ranks,
+)
+from grade_analyzer.reports import generate_all_reports, generate_teacher_report, write_reports
+from grade_analyzer.render import (
+    comparison_report_html,
+    font_face,
+    pdf_available,
+    problems_report_html,
+    render_document,
+    render_teacher_reports,
+    school_report_html,
+    subject_report_html,
+    teacher_report_html,
+    write_rendered,
+)
+from grade_analyzer.risk import MIN_WEAK_SUBJECTS, WEAK_SCORE, detect_at_risk_students, student_risk_flags
+from grade_analyzer.rules import load_rules
+from grade_analyzer.search import build_search_index, search_students, search_table
+from grade_analyzer.stats import get_subject_columns
+
 # تنظیمات صفحه
 st.set_page_config(
     page_title="سیستم تحلیل نمرات مدرسه",
@@ -16,12 +72,13 @@ st.set_page_config(
 )
 
 # استایل فارسی پیشرفته
+# قلم از سیستم یا GRADE_ANALYZER_FONT، بدون نیاز به اینترنت
 st.markdown("""
 <style>
-    @import url('https://fonts.googleapis.com/css2?family=Vazirmatn:wght@300;400;500;600;700;800&display=swap');
+    """ + font_face() + """
     
     * {
-        font-family: 'Vazirmatn', sans-serif !important;
+        font-family: 'Vazirmatn', Tahoma, sans-serif !important;
     }
     
     .main-title {
@@ -100,347 +157,956 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# معیارهای ماتریس مقایسه کلاس‌ها
+MATRIX_METRICS = {
+    'mean_diff': 'اختلاف میانگین',
+    'cohen_d': 'd کوهن',
+    'welch_t': 't ولش',
+    'std_diff': 'اختلاف انحراف معیار',
+    'iqr_diff': 'اختلاف IQR',
+}
+MAX_HEATMAP_CLASSES = 60
+
+# فاصله به‌روزرسانی نوار پیشرفت کارهای پس‌زمینه و مدت انتظار برای کارهای کوتاه (ثانیه)
+JOB_POLL_SECONDS = 0.5
+JOB_WAIT_SECONDS = 0.3
+
 # توابع محاسباتی
-def calculate_iqr_statistics(data):
-    """محاسبه آمار IQR برای یک سری داده"""
-    if len(data) < 3:
-        return None
-    
-    sorted_data = sorted(data)
-    n = len(sorted_data)
-    
-    # محاسبه میانه
-    if n % 2 == 1:
-        median = sorted_data[n // 2]
+@st.cache_resource
+def get_analysis_cache():
+    """کش مشترک نتایج بین همه نشست‌ها"""
+    return AnalysisCache()
+
+@st.cache_resource
+def get_history_store():
+    """انبار تاریخی مشترک نمرات ترم‌ها (فایل GRADE_ANALYZER_HISTORY_DB)"""
+    return HistoryStore()
+
+@st.cache_resource
+def get_job_queue():
+    """صف مشترک کارهای پس‌زمینه بین همه نشست‌ها"""
+    return JobQueue(cache=get_analysis_cache())
+
+def get_upload_lineage():
+    """بارگذاری‌های همین نشست برای هر نام فایل: {'hash', 'previous'}
+
+    در session_state نگه داشته می‌شود تا فایل هم‌نام کاربر دیگر با نسخه قبلی
+    این کاربر مقایسه نشود.
+    """
+    return st.session_state.setdefault('upload_lineage', {})
+
+def get_upload_changes(cache, file_name, file_hash, df):
+    """تفاوت با نسخه قبلی همین فایل؛ مکعب آمار نسخه جدید به صورت افزایشی ساخته می‌شود"""
+    lineage = get_upload_lineage()
+    entry = lineage.get(file_name)
+    if entry is None or entry['hash'] != file_hash:
+        previous = entry and entry['hash']
+        lineage[file_name] = {'hash': file_hash, 'previous': previous}
     else:
-        median = (sorted_data[n // 2 - 1] + sorted_data[n // 2]) / 2
-    
-    # محاسبه چارک‌ها بر اساس روش دقیق
-    if n % 2 == 1:  # تعداد فرد
-        median_pos = n // 2
-        lower_half = sorted_data[:median_pos]
-        upper_half = sorted_data[median_pos + 1:]
-    else:  # تعداد زوج
-        mid_pos1 = n // 2 - 1
-        mid_pos2 = n // 2
-        lower_half = sorted_data[:mid_pos2]
-        upper_half = sorted_data[mid_pos1 + 1:]
-    
-    # تابع میانه داخلی
-    def calc_median(arr):
-        if not arr:
-            return None
-        m = len(arr)
-        if m % 2 == 1:
-            return arr[m // 2]
-        else:
-            return (arr[m // 2 - 1] + arr[m // 2]) / 2
-    
-    q1 = calc_median(lower_half)
-    q3 = calc_median(upper_half)
-    
-    if q1 is None or q3 is None:
+        previous = entry['previous']
+    if previous is None:
         return None
-    
-    iqr = q3 - q1
-    lower_bound = q1 - 1.5 * iqr
-    upper_bound = q3 + 1.5 * iqr
-    
-    outliers = [x for x in sorted_data if x < lower_bound or x > upper_bound]
-    
-    return {
-        'count': n,
-        'mean': float(np.mean(data)),
-        'median': float(median),
-        'std': float(np.std(data)) if n > 1 else 0,
-        'min': float(min(data)),
-        'max': float(max(data)),
-        'q1': float(q1),
-        'q3': float(q3),
-        'iqr': float(iqr),
-        'lower_bound': float(lower_bound),
-        'upper_bound': float(upper_bound),
-        'outliers': outliers,
-        'outlier_count': len(outliers),
-        'outlier_percent': (len(outliers) / n * 100) if n > 0 else 0
-    }
+    # کلید شامل هر دو نسخه است؛ تفاوت یک جفت نسخه برای همه کاربران یکسان است
+    changes_key = make_key(file_hash, 'changes', previous)
+    old_ingest = cache.get(make_key(previous, 'frame'))
+    old_cube = cache.get(make_key(previous, 'cube'))
+    if old_ingest is None or old_cube is None:
+        return cache.get(changes_key)
 
-def analyze_subject_scores(df, subject_name):
-    """تحلیل نمرات یک درس خاص"""
-    scores = df[subject_name].dropna().tolist()
-    
-    if not scores:
-        return None
-    
-    stats = calculate_iqr_statistics(scores)
-    if stats is None:
+    def compute():
+        diff = diff_frames(old_ingest['frame'], df, old_cube['subjects'])
+        cube, work = update_cube(old_cube, df, diff)
+        # مکعبی که قبلاً برای این محتوا ساخته شده جایگزین نمی‌شود
+        if cache.get(make_key(file_hash, 'cube')) is None:
+            cache.put(make_key(file_hash, 'cube'), cube)
+        return dict(diff, work=work)
+
+    return cache.get_or_compute(changes_key, compute)
+
+def render_upload_changes(changes, df):
+    """نمایش بخش‌های تغییرکرده نسبت به بارگذاری قبلی"""
+    if not has_changes(changes):
+        st.caption("🔁 بدون تغییر نسبت به بارگذاری قبلی")
+        return
+    st.info(f"🔁 نسبت به بارگذاری قبلی: {len(changes['cell_rows'])} نمره تغییر کرده، "
+            f"{len(changes['added'])} ردیف اضافه و {len(changes['removed'])} ردیف حذف شده")
+    with st.expander("جزئیات تغییرات"):
+        work = changes['work']
+        if work['rebuilt']:
+            st.caption("تغییرات زیاد بود؛ آمار از ابتدا محاسبه شد")
+        else:
+            st.caption(f"کلاس‌های بدون تغییر: {work['reused']} | به‌روزرسانی افزایشی: {work['patched']} | "
+                       f"محاسبه دوباره: {work['recomputed']}")
+        st.write("**دروس تغییرکرده:** " + ("، ".join(changes['changed_subjects']) or "-"))
+        st.write("**کلاس‌های تغییرکرده:** " + ("، ".join(changes['changed_classes']) or "-"))
+        if len(changes['cell_rows']):
+            st.dataframe(changed_cells_table(changes, df, limit=200), use_container_width=True)
+
+def show_chart(fig, name):
+    """نمایش نمودار؛ زمان ساخت JSON و ارسال آن در پروفایل ثبت می‌شود"""
+    with span(f'chart.{name}', traces=len(fig.data)):
+        st.plotly_chart(fig, use_container_width=True)
+
+def pdf_notice():
+    """هشدار ساخت HTML به جای PDF وقتی weasyprint یا کتابخانه‌های سیستمی آن نصب نیستند"""
+    if not pdf_available():
+        st.info("ℹ️ ساخت PDF در این سرور فعال نیست (weasyprint نصب نشده)؛ گزارش‌ها با قالب HTML "
+                "ساخته می‌شوند و از مرورگر قابل چاپ هستند.")
+
+def render_profile_panel():
+    """پنل اشکال‌زدایی زمان و حافظه مراحل این اجرا (با GRADE_ANALYZER_PROFILE)"""
+    items = profiling.records()
+    with st.sidebar.expander(f"🐞 پروفایل اجرا ({len(items)} مرحله)"):
+        if not items:
+            st.caption("مرحله‌ای ثبت نشده است")
+            return
+        # مراحل کارگرها هم‌زمان با این اجرا هستند و در جمع زمان حساب نمی‌شوند
+        thread = threading.current_thread().name
+        top_level = sum(item['ms'] for item in items
+                        if item['depth'] == 0 and item.get('thread') == thread)
+        st.caption(f"زمان مراحل سطح اول: {top_level:.0f}ms | "
+                   f"بیشینه RSS: {max(item.get('rss_peak_mb') or 0 for item in items):.0f}MB")
+        totals = pd.DataFrame.from_dict(profiling.summary(items), orient='index')
+        st.dataframe(totals.sort_values('ms', ascending=False).round(1), use_container_width=True)
+        st.dataframe(pd.DataFrame(items), use_container_width=True)
+
+def job_owner():
+    """شناسه این نشست برای پیوستن به کارهای مشترک و لغو سهم خودش"""
+    return st.session_state.setdefault('job_owner', uuid.uuid4().hex)
+
+def background_job(slot, key, label, compute, start=False, auto=False):
+    """نتیجه کار پس‌زمینه یک بخش؛ تا پایان کار نوار پیشرفت نمایش داده می‌شود و None برمی‌گردد
+
+    شناسه کار در session_state نگه داشته می‌شود تا اجرای دوباره صفحه کار را
+    قطع نکند. با start (کلیک کاربر) کار compute(progress) ثبت می‌شود و اگر
+    قبلاً ناموفق یا لغو شده باشد از نو اجرا می‌شود؛ با auto کار در هر اجرا
+    ثبت می‌شود اما کار ناموفق یا لغوشده فقط با دکمه «تلاش دوباره» تکرار می‌شود.
+    """
+    queue = get_job_queue()
+    jobs = st.session_state.setdefault('jobs', {})
+    cancelled = st.session_state.setdefault('cancelled_jobs', set())
+    if start:
+        cancelled.discard(key)
+    if start or (auto and key not in cancelled):
+        jobs[slot] = queue.submit(key, compute, label, owner=job_owner(), retry=start)
+    job = queue.get(jobs.get(slot))
+    if job is not None and job.key == key:
+        if not job.done:
+            # کارهای کوتاه (مثلاً وقتی نتیجه در کش است) بدون نوار پیشرفت نمایش داده می‌شوند
+            queue.wait(job.id, JOB_WAIT_SECONDS)
+        if job.state == 'done':
+            return queue.result(job.id)
+        if job.state == 'failed':
+            st.error(f"خطا در {label}: {job.error}")
+        elif job.state == 'cancelled':
+            st.warning(f"{label} لغو شد")
+        else:
+            render_job_progress(slot, job.id)
+            return None
+    elif key in cancelled:
+        st.warning(f"{label} لغو شد")
+    else:
         return None
-    
-    # تحلیل کیفیت تدریس
-    analysis = {
-        'stats': stats,
-        'grade_distribution': categorize_scores(scores),
-        'weaknesses': identify_weaknesses(scores, subject_name),
-        'strengths': identify_strengths(scores, subject_name),
-        'recommendations': generate_recommendations(stats, subject_name)
-    }
-    
-    return analysis
-
-def categorize_scores(scores):
-    """دسته‌بندی نمرات به ضعیف، متوسط، خوب، عالی"""
-    categories = {
-        'ضعیف (0-9)': len([s for s in scores if 0 <= s <= 9]),
-        'قابل قبول (10-14)': len([s for s in scores if 10 <= s <= 14]),
-        'خوب (15-17)': len([s for s in scores if 15 <= s <= 17]),
-        'عالی (18-20)': len([s for s in scores if 18 <= s <= 20])
-    }
-    return categories
+    if auto and st.button("🔁 تلاش دوباره", key=f'retry_{slot}'):
+        cancelled.discard(key)
+        jobs[slot] = queue.submit(key, compute, label, owner=job_owner(), retry=True)
+        st.rerun()
+    return None
 
-def identify_weaknesses(scores, subject_name):
-    """شناسایی نقاط ضعف"""
-    weaknesses = []
-    
-    if len([s for s in scores if s < 10]) / len(scores) > 0.3:
-        weaknesses.append(f"تعداد زیاد دانش‌آموزان ضعیف (نمره زیر ۱۰)")
-    
-    if np.std(scores) > 6:
-        weaknesses.append("پراکندگی زیاد نمرات (اختلاف سطح بالا)")
-    
-    if min(scores) == 0:
-        weaknesses.append("وجود نمره صفر (نیاز به بررسی ویژه)")
-    
-    if len([s for s in scores if s < 5]) > 0:
-        weaknesses.append("وجود نمرات بسیار پایین (زیر ۵)")
-    
-    return weaknesses
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def render_job_progress(slot, job_id):
+    """نوار پیشرفت یک کار؛ فقط همین بخش دوره‌ای اجرا می‌شود و با پایان کار کل صفحه"""
+    queue = get_job_queue()
+    job = queue.get(job_id)
+    if job is None or job.done:
+        st.rerun()
+    st.progress(job.progress, text=f"⏳ {job.label}: {job.message or 'در صف'} ({job.elapsed():.0f} ثانیه)")
+    if st.button("لغو", key=f'cancel_{job_id}'):
+        # فقط همین نشست جدا می‌شود؛ کار تا وقتی نشست دیگری منتظر است ادامه دارد
+        queue.cancel(job_id, owner=job_owner())
+        st.session_state['jobs'].pop(slot, None)
+        st.session_state['cancelled_jobs'].add(job.key)
+        st.rerun()
 
-def identify_strengths(scores, subject_name):
-    """شناسایی نقاط قوت"""
-    strengths = []
-    
-    if np.mean(scores) > 15:
-        strengths.append("میانگین کلاس عالی")
-    
-    if len([s for s in scores if s >= 18]) / len(scores) > 0.4:
-        strengths.append("تعداد قابل توجه دانش‌آموزان ممتاز")
-    
-    if np.std(scores) < 4:
-        strengths.append("همگنی مناسب کلاس")
-    
-    if min(scores) > 10:
-        strengths.append("عدم وجود دانش‌آموز بسیار ضعیف")
-    
-    return strengths
+def render_jobs_panel():
+    """وضعیت کارهای پس‌زمینه در سایدبار"""
+    jobs = get_job_queue().jobs()
+    if not jobs:
+        return
+    running = sum(job['state'] in ('pending', 'running') for job in jobs)
+    with st.sidebar.expander(f"🧵 کارهای پس‌زمینه ({running} در حال اجرا)"):
+        st.dataframe(pd.DataFrame(jobs).drop(columns=['id']), use_container_width=True)
 
-def generate_recommendations(stats, subject_name):
-    """تولید توصیه‌های آموزشی"""
-    recommendations = []
-    
-    # بر اساس میانگین
-    mean = stats['mean']
-    if mean < 12:
-        recommendations.append("🔴 **نیاز فوری**: برگزاری کلاس‌های جبرانی فشرده")
-    elif mean < 15:
-        recommendations.append("🟡 **نیاز متوسط**: افزایش تمرین‌های تکمیلی")
+@profiled('chart.histogram_figure')
+def histogram_figure(histogram, title):
+    """هیستوگرام از شمارش‌های از پیش دسته‌بندی‌شده"""
+    fig = go.Figure(go.Bar(
+        x=histogram['centers'],
+        y=histogram['counts'],
+        width=histogram['widths'],
+        hovertemplate='%{x:.2f}: %{y}<extra></extra>'
+    ))
+    fig.update_layout(title=title, xaxis_title='نمره', yaxis_title='تعداد دانش‌آموز', bargap=0)
+    return fig
+
+@profiled('chart.box_figure')
+def box_figure(boxes, title):
+    """نمودار جعبه‌ای از چارک‌ها و حدود از پیش محاسبه‌شده؛ فقط نمرات پرت جداگانه رسم می‌شوند"""
+    fig = go.Figure()
+    for name, box, color in boxes:
+        fig.add_trace(go.Box(
+            x=[name],
+            q1=[box['q1']], median=[box['median']], q3=[box['q3']], mean=[box['mean']],
+            lowerfence=[box['lower_fence']], upperfence=[box['upper_fence']],
+            name=name,
+            legendgroup=name,
+            marker_color=color
+        ))
+        if len(box['outliers']):
+            fig.add_trace(go.Scatter(
+                x=[name] * len(box['outliers']),
+                y=box['outliers'],
+                mode='markers',
+                name=f"{name} (پرت: {box['outlier_count']})",
+                legendgroup=name,
+                showlegend=False,
+                marker_color=color
+            ))
+    fig.update_layout(title=title, yaxis_title='نمره', showlegend=True)
+    return fig
+
+def get_stats_cube(cache, file_hash, df):
+    """مکعب آمار فایل بارگذاری‌شده (یک بار برای هر محتوای فایل ساخته می‌شود)"""
+    return cache.get_or_compute(make_key(file_hash, 'cube'),
+                                lambda: build_stats_cube(df, workers=default_workers()))
+
+def get_rank_index(cache, file_hash, df):
+    """شاخص رتبه و صدک فایل بارگذاری‌شده (یک بار برای هر محتوای فایل ساخته می‌شود)"""
+    cube = get_stats_cube(cache, file_hash, df)
+    return cache.get_or_compute(make_key(file_hash, 'ranks'), lambda: build_rank_index(df, cube))
+
+def get_correlations(cache, file_hash, df):
+    """ماتریس‌های همبستگی دروس فایل بارگذاری‌شده (یک بار برای هر محتوای فایل ساخته می‌شود)"""
+    cube = get_stats_cube(cache, file_hash, df)
+    return cache.get_or_compute(make_key(file_hash, 'correlations'), lambda: build_correlations(df, cube))
+
+def get_search_index(cache, file_hash, df):
+    """شاخص جستجوی نام و کد دانش‌آموزان فایل بارگذاری‌شده (یک بار برای هر محتوای فایل)"""
+    return cache.get_or_compute(make_key(file_hash, 'search'), lambda: build_search_index(df))
+
+def get_subject_analysis(cache, file_hash, cube, subject, class_name=None):
+    """تحلیل کش‌شده یک درس"""
+    analyses = cache.get_or_compute(
+        make_key(file_hash, 'analyses', class_name, load_rules()['fingerprint']),
+        lambda: cube_analyses(cube, class_name))
+    return analyses.get(subject)
+
+def get_teacher_report(cache, file_hash, df, cube, subject, teacher_name):
+    """گزارش معلم کش‌شده"""
+    today = datetime.now().strftime("%Y/%m/%d")
+    return cache.get_or_compute(
+        make_key(file_hash, 'teacher_report', subject, teacher_name, load_rules()['fingerprint'], today),
+        lambda: generate_teacher_report(df, subject, teacher_name, cube=cube,
+                                        ranks=get_rank_index(cache, file_hash, df)))
+
+def get_at_risk_students(cache, file_hash, df, subjects, min_score, min_weak_subjects):
+    """جدول کش‌شده دانش‌آموزان نیازمند حمایت ویژه"""
+    return cache.get_or_compute(
+        make_key(file_hash, 'at_risk', tuple(subjects), min_score, min_weak_subjects),
+        lambda: detect_at_risk_students(df, subjects, min_score, min_weak_subjects))
+
+def get_risk_thresholds(subject_columns):
+    """آستانه‌های دانش‌آموزان نیازمند حمایت (مقادیر بخش شناسایی مشکلات یا پیش‌فرض)"""
+    return (st.session_state.get('risk_min_score', float(WEAK_SCORE)),
+            st.session_state.get('risk_min_subjects',
+                                 min(MIN_WEAK_SUBJECTS, max(len(subject_columns), 1))))
+
+def get_all_analyses(ctx):
+    """تحلیل کش‌شده همه دروس فایل"""
+    cube = get_stats_cube(ctx['cache'], ctx['file_hash'], ctx['df'])
+    return {subject: get_subject_analysis(ctx['cache'], ctx['file_hash'], cube, subject)
+            for subject in get_subject_columns(ctx['df'])}
+
+def scan_problems(ctx, progress):
+    """تحلیل همه دروس و یافتن دروس مشکل‌دار (کار پس‌زمینه بخش شناسایی مشکلات)"""
+    progress(0.0, "ساخت مکعب آمار")
+    get_stats_cube(ctx['cache'], ctx['file_hash'], ctx['df'])
+    progress(0.5, "تحلیل همه دروس")
+    all_analyses = get_all_analyses(ctx)
+    progress(0.9, "یافتن دروس مشکل‌دار")
+    return find_problem_subjects(all_analyses)
+
+def build_reports_archive(ctx, cube, group_format, progress):
+    """فایل zip گزارش همه دروس و کلاس‌ها (کار پس‌زمینه)"""
+    cache, file_hash = ctx['cache'], ctx['file_hash']
+    today = datetime.now().strftime("%Y/%m/%d")
+    all_reports = cache.get_or_compute(
+        make_key(file_hash, 'all_reports', load_rules()['fingerprint'], today),
+        lambda: generate_all_reports(ctx['df'], cube=cube, ranks=get_rank_index(cache, file_hash, ctx['df']),
+                                     progress=stage_progress(progress, 0.0, 0.5, "تحلیل کلاس‌ها و دروس")))
+    archive = BytesIO()
+    if group_format == "JSON":
+        progress(0.5, "نوشتن فایل‌ها")
+        write_reports(all_reports, archive)
     else:
-        recommendations.append("🟢 **وضعیت مطلوب**: ادامه رویه فعلی با افزودن چالش‌های بیشتر")
-    
-    # بر اساس پراکندگی
-    if stats['std'] > 6:
-        recommendations.append("🎯 **تدریس تفکیکی**: گروه‌بندی دانش‌آموزان بر اساس سطح")
-    
-    # بر اساس outliers
-    if stats['outlier_count'] > 0:
-        recommendations.append("👥 **حمایت ویژه**: توجه خاص به دانش‌آموزان outlier")
-    
-    # بر اساس IQR
-    if stats['iqr'] > 8:
-        recommendations.append("📊 **بازبینی روش**: بررسی تأثیر روش تدریس فعلی")
-    
-    return recommendations
+        # ساخت PDF همه گزارش‌ها در یک process pool
+        write_rendered(render_teacher_reports(all_reports, workers=default_workers(),
+                                              progress=stage_progress(progress, 0.5, 1.0, "ساخت فایل‌ها")),
+                       archive)
+    return {'count': len(all_reports), 'data': archive.getvalue()}
 
-def compare_classes(df, class1, class2, subject_name):
-    """مقایسه دو کلاس در یک درس"""
-    scores1 = df[df['کلاس'] == class1][subject_name].dropna().tolist()
-    scores2 = df[df['کلاس'] == class2][subject_name].dropna().tolist()
-    
-    if not scores1 or not scores2:
-        return None
-    
-    stats1 = calculate_iqr_statistics(scores1)
-    stats2 = calculate_iqr_statistics(scores2)
-    
-    comparison = {
-        'class1': {
-            'name': class1,
-            'stats': stats1,
-            'analysis': analyze_subject_scores(df[df['کلاس'] == class1], subject_name)
-        },
-        'class2': {
-            'name': class2,
-            'stats': stats2,
-            'analysis': analyze_subject_scores(df[df['کلاس'] == class2], subject_name)
-        },
-        'comparison_points': compare_statistics(stats1, stats2)
-    }
-    
-    return comparison
+def render_overview(ctx):
+    """بخش تحلیل کلی دروس"""
+    df, cache, file_hash = ctx['df'], ctx['cache'], ctx['file_hash']
+    cube = get_stats_cube(cache, file_hash, df)
+    st.markdown('<h3 class="sub-title">تحلیل کلی تمام دروس</h3>', unsafe_allow_html=True)
+    changes = ctx.get('changes')
+    if changes is not None and changes['changed_subjects']:
+        st.caption("🔁 دروس تغییرکرده در این نسخه: " + "، ".join(changes['changed_subjects']))
 
-def compare_statistics(stats1, stats2):
-    """مقایسه آماری دو مجموعه داده"""
-    points = []
-    
-    # مقایسه میانگین
-    diff_mean = stats2['mean'] - stats1['mean']
-    if diff_mean > 2:
-        points.append(f"کلاس دوم به طور قابل توجهی میانگین بالاتری دارد (+{diff_mean:.1f})")
-    elif diff_mean < -2:
-        points.append(f"کلاس اول میانگین بالاتری دارد ({abs(diff_mean):.1f} واحد)")
+    # انتخاب دروس برای تحلیل
+    subject_columns = st.multiselect(
+        "دروس مورد نظر برای تحلیل را انتخاب کنید:",
+        options=get_subject_columns(df),
+        default=['ریاضی', 'علوم', 'ادبیات فارسی']
+    )
+
+    if subject_columns:
+        analyses = {subject: get_subject_analysis(cache, file_hash, cube, subject)
+                    for subject in subject_columns}
+        cols = st.columns(len(subject_columns))
+        for idx, subject in enumerate(subject_columns):
+            with cols[idx]:
+                analysis = analyses[subject]
+                if analysis:
+                    stats = analysis['stats']
+
+                    # کارت متریک
+                    card_class = "success-card" if stats['mean'] >= 15 else "warning-card" if stats['mean'] >= 12 else "danger-card"
+                    st.markdown(f'<div class="metric-card {card_class} rtl-text">', unsafe_allow_html=True)
+                    st.metric(subject, f"{stats['mean']:.1f}",
+                            f"±{stats['std']:.1f} STD")
+                    st.caption(f"تعداد: {stats['count']} | میانه: {stats['median']:.1f}")
+                    st.caption(f"ضعیف: {analysis['grade_distribution']['ضعیف (0-9)']} نفر")
+                    st.markdown('</div>', unsafe_allow_html=True)
+
+        # نمودار مقایسه‌ای
+        st.markdown('<h4 class="sub-title">مقایسه دروس</h4>', unsafe_allow_html=True)
+
+        fig_data = []
+        for subject in subject_columns:
+            if analyses[subject]:
+                stats = analyses[subject]['stats']
+                fig_data.append({
+                    'درس': subject,
+                    'میانگین': stats['mean'],
+                    'میانه': stats['median'],
+                    'انحراف معیار': stats['std'],
+                    'حداقل': stats['min'],
+                    'حداکثر': stats['max']
+                })
+
+        if fig_data:
+            df_compare = pd.DataFrame(fig_data)
+            fig = px.bar(df_compare, x='درس', y='میانگین',
+                        title='میانگین نمرات دروس مختلف',
+                        color='میانگین',
+                        color_continuous_scale='viridis')
+            show_chart(fig, 'subject_means')
+
+    render_correlations(ctx)
+
+def correlation_heatmap(correlations, class_name=None):
+    """نقشه حرارتی ماتریس همبستگی دروس"""
+    values = correlation_frame(correlations, class_name).round(2)
+    return px.imshow(values, text_auto=len(values) <= 20, aspect='auto', zmin=-1, zmax=1,
+                     color_continuous_scale='RdBu', color_continuous_midpoint=0,
+                     labels={'x': '', 'y': '', 'color': 'همبستگی'},
+                     title=f"همبستگی نمرات دروس ({class_name or 'کل مدرسه'})")
+
+def render_correlations(ctx):
+    """همبستگی دروس با یکدیگر، با معدل و با انضباط (کل مدرسه یا یک کلاس)"""
+    df, cache, file_hash = ctx['df'], ctx['cache'], ctx['file_hash']
+    correlations = get_correlations(cache, file_hash, df)
+    if len(correlations['columns']) < 2:
+        return
+    st.markdown('<h4 class="sub-title">🔗 همبستگی دروس</h4>', unsafe_allow_html=True)
+    scope = st.selectbox("محدوده:", ["کل مدرسه"] + correlations['classes'], key='correlation_scope')
+    class_name = None if scope == "کل مدرسه" else scope
+
+    # شکل نمودار هم مثل نتایج تحلیل برای هر محدوده یک بار ساخته می‌شود
+    fig = cache.get_or_compute(make_key(file_hash, 'correlation_heatmap', class_name),
+                               lambda: correlation_heatmap(correlations, class_name))
+    show_chart(fig, 'correlation_heatmap')
+    st.caption("ضریب پیرسون روی دانش‌آموزانی که هر دو نمره را دارند؛ "
+               f"جفت‌های با کمتر از {MIN_PAIRS} نمره مشترک خالی‌اند")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.dataframe(alignment_table(correlations, class_name), use_container_width=True, hide_index=True)
+    with col2:
+        st.dataframe(strongest_pairs(correlations, 10, class_name), use_container_width=True, hide_index=True)
+
+    # همبستگی یک درس با معدل در هر کلاس
+    if class_name is None and GPA_COLUMN in correlations['column_index'] and correlations['classes']:
+        subjects = [column for column in correlations['columns'] if column not in TARGET_COLUMNS]
+        subject = st.selectbox("همبستگی درس با معدل در هر کلاس:", subjects, key='correlation_subject')
+        st.dataframe(class_alignment_table(correlations, subject), use_container_width=True, hide_index=True)
+
+def render_teacher_report(ctx):
+    """بخش گزارش معلم"""
+    df, cache, file_hash = ctx['df'], ctx['cache'], ctx['file_hash']
+    cube = get_stats_cube(cache, file_hash, df)
+    st.markdown('<h3 class="sub-title">گزارش تخصصی برای معلم</h3>', unsafe_allow_html=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        selected_subject = st.selectbox(
+            "درس مورد نظر:",
+            options=get_subject_columns(df)
+        )
+
+    with col2:
+        teacher_name = st.text_input("نام معلم:", value="")
+
+    if selected_subject:
+        report = get_teacher_report(cache, file_hash, df, cube, selected_subject, teacher_name)
+
+        if report:
+            # نمایش گزارش در کارت‌های زیبا
+            st.markdown('<div class="teacher-report rtl-text">', unsafe_allow_html=True)
+            st.subheader(f"📋 گزارش درس {selected_subject}")
+            if teacher_name:
+                st.write(f"**معلم:** {teacher_name}")
+            st.write(f"**تاریخ گزارش:** {report['date']}")
+            st.markdown('</div>', unsafe_allow_html=True)
+
+            # خلاصه
+            st.markdown('<div class="highlight-box rtl-text">', unsafe_allow_html=True)
+            st.write("### 📊 خلاصه عملکرد")
+            for item in report['summary']:
+                st.write(f"- {item}")
+            st.markdown('</div>', unsafe_allow_html=True)
+
+            # آمار دقیق
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("میانگین", f"{report['detailed_analysis']['stats']['mean']:.2f}")
+                st.metric("حداقل", f"{report['detailed_analysis']['stats']['min']:.2f}")
+            with col2:
+                st.metric("میانه", f"{report['detailed_analysis']['stats']['median']:.2f}")
+                st.metric("حداکثر", f"{report['detailed_analysis']['stats']['max']:.2f}")
+            with col3:
+                st.metric("انحراف معیار", f"{report['detailed_analysis']['stats']['std']:.2f}")
+                st.metric("IQR", f"{report['detailed_analysis']['stats']['iqr']:.2f}")
+
+            # توزیع نمرات
+            st.markdown('<h4 class="sub-title">توزیع نمرات</h4>', unsafe_allow_html=True)
+            dist_df = pd.DataFrame.from_dict(
+                report['detailed_analysis']['grade_distribution'],
+                orient='index',
+                columns=['تعداد']
+            )
+            dist_df['درصد'] = (dist_df['تعداد'] / report['detailed_analysis']['stats']['count'] * 100).round(1)
+            st.dataframe(dist_df, use_container_width=True)
+
+            # نمودار هیستوگرام
+            histogram = cube_histogram(cube, selected_subject)
+            if histogram:
+                fig = histogram_figure(histogram, f'توزیع نمرات درس {selected_subject}')
+                show_chart(fig, 'score_histogram')
+
+            # اقدامات لازم
+            st.markdown('<h4 class="sub-title">📝 اقدامات پیشنهادی</h4>', unsafe_allow_html=True)
+            actions_df = pd.DataFrame(report['action_items'])
+            st.dataframe(actions_df, use_container_width=True)
+
+            # موفقیت‌ها و نگرانی‌ها
+            col1, col2 = st.columns(2)
+            with col1:
+                st.markdown('<div class="success-card rtl-text">', unsafe_allow_html=True)
+                st.write("### 🎉 نقاط قوت")
+                for item in report['success_stories']:
+                    st.write(f"- {item}")
+                st.markdown('</div>', unsafe_allow_html=True)
+
+            with col2:
+                st.markdown('<div class="warning-card rtl-text">', unsafe_allow_html=True)
+                st.write("### ⚠️ نقاط ضعف")
+                for item in report['concerns']:
+                    st.write(f"- {item}")
+                for weakness in report['detailed_analysis']['weaknesses']:
+                    st.write(f"- {weakness}")
+                st.markdown('</div>', unsafe_allow_html=True)
+
+            pdf_notice()
+            document = cache.get_or_compute(
+                make_key(file_hash, 'teacher_document', selected_subject, teacher_name,
+                         load_rules()['fingerprint'], report['date']),
+                lambda: render_document(teacher_report_html(report)))
+            st.download_button(
+                label="📥 دانلود همین گزارش",
+                data=document['data'],
+                file_name=f"teacher_report_{selected_subject}{document['extension']}",
+                mime=document['mime']
+            )
+
+    # گزارش گروهی همه دروس و کلاس‌ها
+    st.markdown('<h4 class="sub-title">📦 گزارش همه دروس و کلاس‌ها</h4>', unsafe_allow_html=True)
+    group_format = st.radio("قالب فایل‌ها:", ["JSON", "PDF" if pdf_available() else "HTML"],
+                            horizontal=True)
+    # ساخت در پس‌زمینه؛ با تغییر ویجت‌ها کار ادامه پیدا می‌کند
+    started = st.button("تولید گزارش گروهی معلمان")
+    today = datetime.now().strftime("%Y/%m/%d")
+    archive = background_job(
+        'teacher_reports',
+        make_key(file_hash, 'teacher_archive', group_format, load_rules()['fingerprint'], today),
+        "گزارش گروهی معلمان",
+        lambda progress: build_reports_archive(ctx, cube, group_format, progress),
+        start=started)
+    if archive:
+        st.caption(f"{archive['count']} گزارش تولید شد")
+        st.download_button(
+            label="📥 دانلود فایل zip گزارش‌ها",
+            data=archive['data'],
+            file_name="teacher_reports.zip",
+            mime="application/zip"
+        )
+
+def render_class_comparison(ctx):
+    """بخش مقایسه کلاس‌ها"""
+    df, cache, file_hash = ctx['df'], ctx['cache'], ctx['file_hash']
+    cube = get_stats_cube(cache, file_hash, df)
+    st.markdown('<h3 class="sub-title">مقایسه عملکرد کلاس‌ها</h3>', unsafe_allow_html=True)
+
+    # اگر ستون کلاس وجود دارد
+    if 'کلاس' in df.columns:
+        classes = cube['classes']
+
+        if len(classes) >= 2:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                class1 = st.selectbox("کلاس اول:", classes)
+            with col2:
+                class2 = st.selectbox("کلاس دوم:", [c for c in classes if c != class1])
+            with col3:
+                compare_subject = st.selectbox(
+                    "درس مورد مقایسه:",
+                    options=get_subject_columns(df)
+                )
+
+            if class1 and class2 and compare_subject:
+                comparison = compare_classes(df, class1, class2, compare_subject, cube=cube)
+
+                if comparison:
+                    # نمایش نتایج مقایسه
+                    st.markdown('<div class="info-card rtl-text">', unsafe_allow_html=True)
+                    st.write(f"### 📊 مقایسه {class1} و {class2} در {compare_subject}")
+
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        st.write(f"**{class1}:**")
+                        st.metric("میانگین", f"{comparison['class1']['stats']['mean']:.2f}")
+                        st.metric("میانه", f"{comparison['class1']['stats']['median']:.2f}")
+                        st.metric("انحراف معیار", f"{comparison['class1']['stats']['std']:.2f}")
+
+                    with col2:
+                        st.write(f"**{class2}:**")
+                        st.metric("میانگین", f"{comparison['class2']['stats']['mean']:.2f}")
+                        st.metric("میانه", f"{comparison['class2']['stats']['median']:.2f}")
+                        st.metric("انحراف معیار", f"{comparison['class2']['stats']['std']:.2f}")
+
+                    st.markdown('</div>', unsafe_allow_html=True)
+
+                    # نکات مقایسه
+                    st.markdown('<div class="highlight-box rtl-text">', unsafe_allow_html=True)
+                    st.write("### 🔍 نتایج مقایسه")
+                    for point in comparison['comparison_points']:
+                        st.write(f"- {point}")
+                    st.markdown('</div>', unsafe_allow_html=True)
+
+                    # نمودار مقایسه‌ای
+                    boxes = [(class1, cube_box(cube, compare_subject, class1), 'blue'),
+                             (class2, cube_box(cube, compare_subject, class2), 'red')]
+                    fig = box_figure([item for item in boxes if item[1]],
+                                     f'مقایسه Boxplot {compare_subject}')
+                    show_chart(fig, 'class_box')
+
+            render_class_matrix(cache, file_hash, cube)
+        else:
+            st.warning("حداقل دو کلاس برای مقایسه نیاز است")
     else:
-        points.append("تفاوت معنی‌داری در میانگین وجود ندارد")
-    
-    # مقایسه پراکندگی
-    if stats2['std'] < stats1['std'] - 1:
-        points.append(f"کلاس دوم همگن‌تر است (انحراف معیار کمتر)")
-    elif stats2['std'] > stats1['std'] + 1:
-        points.append(f"کلاس اول همگن‌تر است")
-    
-    # مقایسه میانه
-    diff_median = stats2['median'] - stats1['median']
-    if abs(diff_median) > 2:
-        points.append(f"تفاوت قابل توجه در میانه: {diff_median:.1f} واحد")
-    
-    # مقایسه تعداد ضعیف‌ها
-    weak1 = stats1['mean'] < 10
-    weak2 = stats2['mean'] < 10
-    if weak1 and not weak2:
-        points.append("کلاس اول نیاز فوری به مداخله دارد")
-    elif not weak1 and weak2:
-        points.append("کلاس دوم نیاز فوری به مداخله دارد")
-    
-    return points
+        st.warning("ستون 'کلاس' در فایل یافت نشد")
 
-def generate_teacher_report(df, subject_column, teacher_name=""):
-    """تولید گزارش جامع برای معلم"""
-    scores = df[subject_column].dropna().tolist()
-    
-    if not scores:
-        return None
-    
-    stats = calculate_iqr_statistics(scores)
-    analysis = analyze_subject_scores(df, subject_column)
-    
-    report = {
-        'teacher': teacher_name,
-        'subject': subject_column,
-        'date': datetime.now().strftime("%Y/%m/%d"),
-        'summary': generate_summary(stats, analysis),
-        'detailed_analysis': analysis,
-        'action_items': generate_action_items(stats, analysis),
-        'success_stories': identify_success_stories(df, subject_column),
-        'concerns': identify_concerns(df, subject_column)
-    }
-    
-    return report
+def render_class_matrix(cache, file_hash, cube):
+    """ماتریس مقایسه همه کلاس‌ها و پراختلاف‌ترین جفت‌ها"""
+    st.markdown('<h4 class="sub-title">🧮 مقایسه همه کلاس‌ها</h4>', unsafe_allow_html=True)
+    col1, col2 = st.columns(2)
+    with col1:
+        subject = st.selectbox("درس:", cube['subjects'], key='matrix_subject')
+    with col2:
+        metric = st.radio("معیار:", list(MATRIX_METRICS), horizontal=True, key='matrix_metric',
+                          format_func=MATRIX_METRICS.get)
 
-def generate_summary(stats, analysis):
-    """خلاصه گزارش"""
-    summary = []
-    
-    mean = stats['mean']
-    if mean >= 16:
-        summary.append("🎉 **عملکرد عالی**: میانگین کلاس در سطح ممتاز")
-    elif mean >= 14:
-        summary.append("✅ **عملکرد خوب**: میانگین کلاس قابل قبول")
-    elif mean >= 12:
-        summary.append("⚠️ **نیاز به بهبود**: میانگین کلاس نیاز به ارتقا دارد")
+    classes = cube['classes']
+    if len(classes) > MAX_HEATMAP_CLASSES:
+        classes = st.multiselect(f"کلاس‌های نقشه حرارتی (حداکثر {MAX_HEATMAP_CLASSES}):", cube['classes'],
+                                 default=cube['classes'][:MAX_HEATMAP_CLASSES],
+                                 max_selections=MAX_HEATMAP_CLASSES, key='matrix_classes')
+    matrix = cache.get_or_compute(make_key(file_hash, 'class_matrix', subject, tuple(classes)),
+                                  lambda: class_matrix(cube, subject, classes))
+    if matrix and len(matrix['classes']) >= 2:
+        values = matrix_frame(matrix, metric)
+        fig = px.imshow(values.round(2), text_auto=len(values) <= 20, aspect='auto',
+                        color_continuous_scale='RdBu', color_continuous_midpoint=0,
+                        labels={'x': 'کلاس دوم', 'y': 'کلاس اول', 'color': MATRIX_METRICS[metric]},
+                        title=f'{MATRIX_METRICS[metric]} (کلاس ستون منهای کلاس سطر) در {subject}')
+        show_chart(fig, 'class_matrix')
+
+    k = st.number_input("تعداد جفت‌های پراختلاف:", min_value=1, max_value=50, value=10, key='matrix_top_k')
+    rank_metric = metric if metric in RANK_METRICS else 'cohen_d'
+    pairs = cache.get_or_compute(make_key(file_hash, 'divergent_pairs', subject, rank_metric, int(k)),
+                                 lambda: top_divergent_pairs(cube, subject, int(k), rank_metric))
+    st.dataframe(pairs, use_container_width=True)
+    if not exact_pvalues():
+        st.caption("p-value با تقریب نرمال محاسبه شده است (scipy نصب نیست)")
+
+def render_rankings(ctx):
+    """بخش رتبه‌بندی: جدول برترین‌ها و کارنامه رتبه هر دانش‌آموز"""
+    df, cache, file_hash = ctx['df'], ctx['cache'], ctx['file_hash']
+    cube = get_stats_cube(cache, file_hash, df)
+    ranks = get_rank_index(cache, file_hash, df)
+    st.markdown('<h3 class="sub-title">رتبه‌بندی دانش‌آموزان</h3>', unsafe_allow_html=True)
+    if not ranks['columns']:
+        st.warning("ستون نمره‌ای در فایل یافت نشد")
+        return
+
+    # جدول برترین‌ها از ترتیب از پیش محاسبه‌شده
+    st.markdown('<h4 class="sub-title">🏆 برترین‌ها</h4>', unsafe_allow_html=True)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        columns = ranks['columns']
+        column = st.selectbox("درس یا معدل:", columns,
+                              index=columns.index(GPA_COLUMN) if GPA_COLUMN in columns else 0,
+                              key='leaderboard_column')
+    with col2:
+        scope = st.selectbox("محدوده:", ["کل مدرسه"] + ranks['classes'], key='leaderboard_scope')
+    with col3:
+        k = st.number_input("تعداد:", min_value=1, max_value=100, value=10, key='leaderboard_k')
+    st.dataframe(leaderboard(ranks, df, column, int(k), None if scope == "کل مدرسه" else scope),
+                 use_container_width=True, hide_index=True)
+
+    # کارنامه رتبه یک دانش‌آموز
+    st.markdown('<h4 class="sub-title">🎓 کارنامه رتبه دانش‌آموز</h4>', unsafe_allow_html=True)
+    col1, col2 = st.columns(2)
+    with col1:
+        if ranks['classes']:
+            class_name = st.selectbox("کلاس:", ranks['classes'], key='profile_class')
+            rows = class_rows(cube, class_name)
+        else:
+            rows = np.arange(len(df))
+    names = dict(zip(rows.tolist(), student_names(df, rows)))
+    with col2:
+        row = st.selectbox("دانش‌آموز:", list(names), format_func=names.get, key='profile_student')
+    if row is None:
+        return
+
+    student = student_ranks(ranks, row)
+    if GPA_COLUMN in ranks['column_index']:
+        j = ranks['column_index'][GPA_COLUMN]
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("رتبه معدل در کلاس", f"{student['class_rank'][j]} از {student['class_count'][j]}"
+                      if student['class_rank'][j] else "-")
+        with col2:
+            st.metric("رتبه معدل در مدرسه", f"{student['school_rank'][j]} از {student['school_count'][j]}"
+                      if student['school_rank'][j] else "-")
+        with col3:
+            st.metric("صدک معدل در مدرسه", f"{student['school_percentile'][j]:.1f}")
+
+    profile = student_profile(ranks, df, row)
+    st.dataframe(profile, use_container_width=True, hide_index=True)
+    fig = px.bar(profile, x='درس', y=['صدک در کلاس', 'صدک در مدرسه'], barmode='group',
+                 title=f'صدک‌های {names[row]}', labels={'value': 'صدک', 'variable': ''})
+    show_chart(fig, 'student_percentiles')
+
+def render_student_search(ctx):
+    """بخش جستجوی دانش‌آموز: یافتن با نام یا کد و کارت وضعیت دانش‌آموز"""
+    df, cache, file_hash = ctx['df'], ctx['cache'], ctx['file_hash']
+    st.markdown('<h3 class="sub-title">جستجوی دانش‌آموز</h3>', unsafe_allow_html=True)
+    index = get_search_index(cache, file_hash, df)
+    query = st.text_input("نام، نام خانوادگی یا کد دانش‌آموز:", key='student_query',
+                          placeholder="مثلاً: محمدرضا کریمی")
+    if not query.strip():
+        st.info("بخشی از نام یا کد دانش‌آموز را وارد کنید؛ غلط‌های تایپی کوچک هم پیدا می‌شوند")
+        return
+
+    started = time.perf_counter()
+    result = search_students(index, query)
+    elapsed = time.perf_counter() - started
+    if not len(result['rows']):
+        st.warning("دانش‌آموزی با این مشخصات یافت نشد")
+        return
+    st.dataframe(search_table(df, result), use_container_width=True, hide_index=True)
+    st.caption(f"{len(result['rows'])} نتیجه در {elapsed * 1000:.1f} میلی‌ثانیه")
+
+    rows = result['rows'].tolist()
+    names = dict(zip(rows, student_names(df, result['rows'])))
+    row = st.selectbox("دانش‌آموز:", rows, format_func=names.get, key='search_student')
+    if row is None:
+        return
+
+    # کارت دانش‌آموز: نشانه‌های خطر با آستانه‌های بخش شناسایی مشکلات و رتبه‌ها
+    subject_columns = get_subject_columns(df)
+    min_score, min_weak_subjects = get_risk_thresholds(subject_columns)
+    flags = student_risk_flags(df, row, subject_columns, min_score, min_weak_subjects)
+    st.markdown(f'<h4 class="sub-title">🎓 {names[row]}</h4>', unsafe_allow_html=True)
+    if flags['at_risk']:
+        st.error(f"نیازمند حمایت ویژه: {flags['weak_count']} درس کمتر از {min_score:g} "
+                 f"({'، '.join(flags['weak_subjects'])})")
+    elif flags['weak_subjects']:
+        st.warning(f"دروس ضعیف: {'، '.join(flags['weak_subjects'])}")
     else:
-        summary.append("🚨 **نیاز به مداخله فوری**: میانگین کلاس بسیار پایین")
-    
-    if stats['outlier_percent'] > 20:
-        summary.append(f"⚠️ **تعداد زیاد outlier**: {stats['outlier_percent']:.1f}% دانش‌آموزان خارج از محدوده عادی")
-    
-    if stats['std'] > 6:
-        summary.append("📊 **پراکندگی بالا**: اختلاف سطح دانش‌آموزان زیاد است")
-    
-    return summary
+        st.success("در هیچ درسی نمره ضعیف ندارد")
+    if flags['zero_subjects']:
+        st.warning(f"نمره صفر: {'، '.join(flags['zero_subjects'])}")
+    if flags['missing_subjects']:
+        st.info(f"بدون نمره: {'، '.join(flags['missing_subjects'])}")
 
-def generate_action_items(stats, analysis):
-    """اقدامات لازم"""
-    actions = []
-    
-    # اقدامات بر اساس میانگین
-    if stats['mean'] < 12:
-        actions.append({
-            'priority': 'بالا',
-            'action': 'برگزاری کلاس جبرانی فشرده',
-            'deadline': 'فوری',
-            'responsible': 'معلم'
-        })
-    
-    # اقدامات برای outliers
-    if stats['outlier_count'] > 0:
-        actions.append({
-            'priority': 'متوسط',
-            'action': 'جلسات مشاوره فردی با دانش‌آموزان outlier',
-            'deadline': '۲ هفته',
-            'responsible': 'معلم + مشاور'
-        })
-    
-    # اقدامات برای پراکندگی
-    if stats['std'] > 5:
-        actions.append({
-            'priority': 'متوسط',
-            'action': 'تدریس تفکیکی و گروه‌بندی',
-            'deadline': '۱ ماه',
-            'responsible': 'معلم'
-        })
-    
-    return actions
+    ranks = get_rank_index(cache, file_hash, df)
+    if ranks['columns']:
+        st.dataframe(student_profile(ranks, df, row), use_container_width=True, hide_index=True)
 
-def identify_success_stories(df, subject_column):
-    """شناسایی موفقیت‌ها"""
-    success = []
-    df_sorted = df.sort_values(subject_column, ascending=False)
-    
-    # برترین دانش‌آموزان
-    top_students = df_sorted.head(3)[['نام', 'نام خانوادگی', subject_column]].to_dict('records')
-    if top_students:
-        success.append(f"**برترین دانش‌آموزان**: {', '.join([f'{s['نام']} {s['نام خانوادگی']} ({s[subject_column]})' for s in top_students])}")
-    
-    # بیشترین پیشرفت (اگر داده تاریخی داریم)
-    if 'معدل' in df.columns:
-        high_gpa = df[df[subject_column] >= 18]
-        if len(high_gpa) > 0:
-            success.append(f"**هماهنگی با معدل**: {len(high_gpa)} دانش‌آموز هم در این درس و هم در معدل عالی هستند")
-    
-    return success
+def render_problems(ctx):
+    """بخش شناسایی مشکلات"""
+    df, cache, file_hash = ctx['df'], ctx['cache'], ctx['file_hash']
+    st.markdown('<h3 class="sub-title">شناسایی سیستماتیک مشکلات</h3>', unsafe_allow_html=True)
 
-def identify_concerns(df, subject_column):
-    """شناسایی نگرانی‌ها"""
-    concerns = []
-    
-    # دانش‌آموزان با نمره زیر ۱۰
-    weak_students = df[df[subject_column] < 10][['نام', 'نام خانوادگی', subject_column, 'کلاس']]
-    if len(weak_students) > 3:
-        concerns.append(f"**تعداد زیاد ضعیف**: {len(weak_students)} دانش‌آموز نمره زیر ۱۰ دارند")
-    
-    # نمرات صفر
-    zero_scores = df[df[subject_column] == 0]
-    if len(zero_scores) > 0:
-        concerns.append(f"**نمره صفر**: {len(zero_scores)} دانش‌آموز نمره صفر گرفته‌اند")
-    
-    # عدم مشارکت (اگر ستون حضور داریم)
-    if 'انضباط' in df.columns:
-        low_discipline = df[(df[subject_column] < 10) & (df['انضباط'] < 15)]
-        if len(low_discipline) > 0:
-            concerns.append(f"**مشکل انضباطی و درسی**: {len(low_discipline)} دانش‌آموز هم نمره پایین و هم انضباط ضعیف دارند")
-    
-    return concerns
+    # شناسایی دروس مشکل‌دار (تحلیل همه دروس در پس‌زمینه)
+    subject_columns = get_subject_columns(df)
+    problem_subjects = background_job(
+        'problems', make_key(file_hash, 'problem_scan', load_rules()['fingerprint']),
+        "بررسی همه دروس", lambda progress: scan_problems(ctx, progress), auto=True)
+    if problem_subjects is None:
+        return
+
+    if problem_subjects:
+        st.markdown('<div class="danger-card rtl-text">', unsafe_allow_html=True)
+        st.write("### 🚨 دروس نیازمند توجه فوری")
+        problems_df = pd.DataFrame(problem_subjects)
+        st.dataframe(problems_df, use_container_width=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+
+        # شناسایی دانش‌آموزان مشکل‌دار
+        st.markdown('<h4 class="sub-title">👥 دانش‌آموزان نیازمند حمایت ویژه</h4>', unsafe_allow_html=True)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            risk_min_score = st.number_input("نمره زیر این مقدار ضعیف است:", 0.0, 20.0,
+                                             float(WEAK_SCORE), step=0.5, key='risk_min_score')
+        with col2:
+            risk_min_subjects = st.number_input("حداقل تعداد دروس ضعیف:", 1, max(len(subject_columns), 1),
+                                                min(MIN_WEAK_SUBJECTS, max(len(subject_columns), 1)),
+                                                key='risk_min_subjects')
+
+        weak_df = get_at_risk_students(cache, file_hash, df, subject_columns,
+                                       risk_min_score, risk_min_subjects)
+
+        if len(weak_df):
+            st.dataframe(weak_df, use_container_width=True)
+        else:
+            st.info("✅ دانش‌آموز با مشکل جدی شناسایی نشد")
+    else:
+        st.success("🎉 هیچ درس مشکل‌داری شناسایی نشد!")
+
+def render_export(ctx):
+    """بخش خروجی گزارش"""
+    df, cache, file_hash = ctx['df'], ctx['cache'], ctx['file_hash']
+    cube = get_stats_cube(cache, file_hash, df)
+    subject_columns = get_subject_columns(df)
+    st.markdown('<h3 class="sub-title">خروجی گزارش‌ها</h3>', unsafe_allow_html=True)
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        report_type = st.selectbox(
+            "نوع گزارش:",
+            ["گزارش کلی مدرسه", "گزارش درسی خاص", "گزارش مقایسه کلاس‌ها", "گزارش مشکلات"]
+        )
+
+    with col2:
+        if report_type == "گزارش درسی خاص":
+            report_subject = st.selectbox(
+                "درس:",
+                options=get_subject_columns(df)
+            )
+        elif report_type == "گزارش مقایسه کلاس‌ها":
+            if 'کلاس' in df.columns:
+                classes = cube['classes']
+                report_class1 = st.selectbox("کلاس اول:", classes)
+                report_class2 = st.selectbox("کلاس دوم:", [c for c in classes if c != report_class1])
+
+    # گزارش از قالب‌های از پیش ساخته و آمار کش‌شده؛ PDF اگر weasyprint نصب باشد وگرنه HTML
+    fingerprint = load_rules()['fingerprint']
+    pdf_notice()
+    if report_type == "گزارش درسی خاص":
+        params, file_name = (report_subject,), f"subject_report_{report_subject}"
+        build_html = lambda: subject_report_html(
+            report_subject, get_all_analyses(ctx).get(report_subject),
+            {class_name: get_subject_analysis(cache, file_hash, cube, report_subject, class_name)
+             for class_name in cube['classes']})
+    elif report_type == "گزارش مقایسه کلاس‌ها" and len(cube['classes']) >= 2:
+        params, file_name = (report_class1, report_class2), "class_comparison_report"
+        build_html = lambda: comparison_report_html(
+            report_class1, report_class2,
+            {subject: compare_classes(df, report_class1, report_class2, subject, cube=cube)
+             for subject in subject_columns})
+    elif report_type == "گزارش مشکلات":
+        risk_min_score, risk_min_subjects = get_risk_thresholds(subject_columns)
+        params, file_name = (risk_min_score, risk_min_subjects), "problems_report"
+        build_html = lambda: problems_report_html(
+            find_problem_subjects(get_all_analyses(ctx)),
+            get_at_risk_students(cache, file_hash, df, subject_columns,
+                                 risk_min_score, risk_min_subjects))
+    else:
+        params, file_name = (), "school_report"
+        build_html = lambda: school_report_html(get_all_analyses(ctx))
+
+    def build_document(progress):
+        progress(0.0, "تحلیل دروس")
+        document = build_html()
+        progress(0.6, "ساخت فایل")
+        return render_document(document)
+
+    today = datetime.now().strftime("%Y/%m/%d")
+    document_key = make_key(file_hash, 'document', report_type, *params, fingerprint, today)
+    button_label = "📄 تولید گزارش PDF" if pdf_available() else "📄 تولید گزارش HTML"
+    document = background_job(
+        'document', document_key, report_type,
+        build_document,
+        start=st.button(button_label))
+    if document:
+        st.download_button(
+            label="📥 دانلود گزارش",
+            data=document['data'],
+            file_name=file_name + document['extension'],
+            mime=document['mime']
+        )
+
+    # خروجی کامل اکسل از آمار کش‌شده؛ فایل در پس‌زمینه آماده می‌شود و با اولین کلیک دانلود می‌شود
+    risk_min_score, risk_min_subjects = get_risk_thresholds(subject_columns)
+
+    def build_excel(progress):
+        progress(0.0, "تحلیل دروس")
+        all_analyses = get_all_analyses(ctx)
+        progress(0.4, "دانش‌آموزان نیازمند حمایت")
+        at_risk = get_at_risk_students(cache, file_hash, df, subject_columns,
+                                       risk_min_score, risk_min_subjects)
+        progress(0.6, "نوشتن فایل اکسل")
+        return export_workbook(df, cube, all_analyses, BytesIO(), at_risk).getvalue()
+
+    excel_key = make_key(file_hash, 'excel', fingerprint, risk_min_score, risk_min_subjects)
+    excel_data = background_job(
+        'excel', excel_key, "فایل اکسل",
+        build_excel,
+        auto=True)
+    if excel_data is not None:
+        st.download_button(
+            label="📊 دانلود آمار کامل در اکسل",
+            data=excel_data,
+            file_name="school_statistics.xlsx",
+            mime=XLSX_MIME,
+            help="آمار دروس، آمار هر کلاس، دانش‌آموزان نیازمند حمایت و نمرات پرت در شیت‌های جدا"
+        )
+
+def render_history(ctx):
+    """بخش روند چندترمی از انبار تاریخی نمرات"""
+    df, file_hash = ctx['df'], ctx['file_hash']
+    store = get_history_store()
+    st.markdown('<h3 class="sub-title">روند نمرات در ترم‌های مختلف</h3>', unsafe_allow_html=True)
+
+    # ثبت فایل فعلی به عنوان یک ترم
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        term_name = st.text_input("نام ترم فایل فعلی (مثلاً ۱۴۰۳-ترم اول):", value="")
+    with col2:
+        st.write("")
+        if st.button("💾 ثبت ترم", disabled=not term_name.strip()):
+            result = store.ingest_term(df, term_name.strip(), file_hash=file_hash)
+            st.success(f"{result['students']} دانش‌آموز و {result['scores']} نمره ثبت شد")
+            if result['duplicates']:
+                st.warning(f"{result['duplicates']} ردیف تکراری (همان دانش‌آموز) نادیده گرفته شد")
+            if result['missing_keys']:
+                st.warning(f"{result['missing_keys']} ردیف بدون شناسه دانش‌آموز ثبت نشد")
+
+    terms = store.terms()
+    st.dataframe(terms, use_container_width=True)
+    if len(terms) < 2:
+        st.info("برای مقایسه روند، حداقل دو ترم ثبت کنید")
+        return
+
+    term_names = terms['name'].tolist()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        term_from = st.selectbox("از ترم:", term_names, index=len(term_names) - 2)
+    with col2:
+        term_to = st.selectbox("تا ترم:", term_names, index=len(term_names) - 1)
+    with col3:
+        trend_subject = st.selectbox("درس:", ["همه دروس"] + get_subject_columns(df))
+    subject = None if trend_subject == "همه دروس" else trend_subject
+
+    st.markdown('<h4 class="sub-title">📉 کلاس‌ها با بیشترین افت میانگین</h4>', unsafe_allow_html=True)
+    st.dataframe(store.class_drops(term_from, term_to, subject), use_container_width=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.write("### 🔻 بیشترین افت دانش‌آموزان")
+        st.dataframe(store.student_deltas(term_from, term_to, subject, limit=20),
+                     use_container_width=True)
+    with col2:
+        st.write("### 🔺 بیشترین پیشرفت دانش‌آموزان")
+        st.dataframe(store.student_deltas(term_from, term_to, subject, limit=20, ascending=False),
+                     use_container_width=True)
+
+    # پیشرفت یک گروه کلاسی در طول ترم‌ها
+    st.markdown('<h4 class="sub-title">👥 روند گروه کلاسی</h4>', unsafe_allow_html=True)
+    col1, col2 = st.columns(2)
+    with col1:
+        base_term = st.selectbox("ترم پایه:", term_names, key='cohort_base_term')
+    with col2:
+        cohort_class = st.selectbox("کلاس:", store.classes(base_term))
+    if cohort_class:
+        progression = store.cohort_progression(cohort_class, base_term, subject)
+        if not progression.empty:
+            fig = px.line(progression, markers=True,
+                          title=f'میانگین دانش‌آموزان کلاس {cohort_class} ({base_term}) در ترم‌ها',
+                          labels={'value': 'میانگین', 'term': 'ترم', 'subject': 'درس'})
+            show_chart(fig, 'cohort_progression')
+
+    # سابقه یک دانش‌آموز
+    student_key = st.text_input("کد دانش‌آموز یا «نام|نام خانوادگی|کلاس»:", value="")
+    if student_key.strip():
+        student_history = store.student_history(student_key.strip())
+        if student_history.empty:
+            st.info("دانش‌آموزی با این مشخصات ثبت نشده است")
+        else:
+            st.dataframe(student_history, use_container_width=True)
+
+# بخش‌های رابط کاربری به ترتیب نمایش
+VIEWS = {
+    "📊 تحلیل کلی": render_overview,
+    "👨‍🏫 گزارش معلم": render_teacher_report,
+    "📈 مقایسه کلاس‌ها": render_class_comparison,
+    "🏅 رتبه‌بندی": render_rankings,
+    "🔎 جستجوی دانش‌آموز": render_student_search,
+    "🎯 شناسایی مشکلات": render_problems,
+    "💾 خروجی گزارش": render_export,
+    "📚 روند ترم‌ها": render_history,
+}
 
 # رابط کاربری اصلی
 def main():
+    profiling.start_run('app')
     # هدر اصلی
     st.markdown("""
     <div class="main-title">
@@ -458,14 +1124,46 @@ def main():
         
         # آپلود فایل
         uploaded_file = st.file_uploader("📁 فایل اکسل نمرات را آپلود کنید", 
-                                        type=['xlsx', 'xls'])
+                                        type=['xlsx', 'xls', 'csv'])
         
         if uploaded_file:
             try:
-                df = pd.read_excel(uploaded_file)
+                cache = get_analysis_cache()
+                data = uploaded_file.getvalue()
+                file_hash = content_hash(data)
+                ingest = cache.get_or_compute(
+                    make_key(file_hash, 'frame'),
+                    lambda: ingest_upload(data, uploaded_file.name, file_hash=file_hash))
+                df = ingest['frame']
                 st.success(f"✅ فایل با موفقیت خوانده شد")
                 st.info(f"تعداد رکوردها: {len(df)}")
                 
+                # زمان‌بندی مراحل خواندن فایل
+                stage_names = {'hash': 'هش', 'parse': 'خواندن فایل', 'normalize': 'نرمال‌سازی',
+                               'snapshot_write': 'ذخیره snapshot', 'snapshot_read': 'خواندن snapshot'}
+                source = 'snapshot ستونی' if ingest['source'] == 'snapshot' else 'فایل اصلی'
+                st.caption(f"منبع: {source} | " + " | ".join(
+                    f"{stage_names.get(stage, stage)}: {seconds * 1000:.0f}ms"
+                    for stage, seconds in ingest['timings'].items()))
+                
+                # تغییرات نسبت به بارگذاری قبلی همین فایل
+                changes = get_upload_changes(cache, uploaded_file.name, file_hash, df)
+                if changes is not None:
+                    render_upload_changes(changes, df)
+                
+                if st.button("🔄 بازخوانی فایل و پاک کردن کش"):
+                    cache.invalidate(file_hash)
+                    remove_snapshot(file_hash)
+                    st.rerun()
+                
+                cache_info = cache.info()
+                st.caption(f"کش: {cache_info['entries']} مورد | "
+                           f"{cache_info['bytes'] / 1024 / 1024:.1f} از "
+                           f"{cache_info['max_bytes'] / 1024 / 1024:.0f} مگابایت")
+                
+                lazy_views = st.toggle("⚡ فقط محاسبه بخش فعال", value=True,
+                                       help="به جای اجرای همه تب‌ها در هر بار اجرا، فقط بخش انتخاب‌شده محاسبه می‌شود")
+                
                 # نمایش ستون‌ها
                 if st.checkbox("نمایش ستون‌های فایل"):
                     st.write(df.columns.tolist())
@@ -481,394 +1179,18 @@ def main():
     
     # اگر فایل آپلود شده
     if 'df' in locals() and df is not None:
-        # تب‌های مختلف
-        tab1, tab2, tab3, tab4, tab5 = st.tabs([
-            "📊 تحلیل کلی", 
-            "👨‍🏫 گزارش معلم", 
-            "📈 مقایسه کلاس‌ها", 
-            "🎯 شناسایی مشکلات", 
-            "💾 خروجی گزارش"
-        ])
-        
-        with tab1:
-            st.markdown('<h3 class="sub-title">تحلیل کلی تمام دروس</h3>', unsafe_allow_html=True)
-            
-            # انتخاب دروس برای تحلیل
-            subject_columns = st.multiselect(
-                "دروس مورد نظر برای تحلیل را انتخاب کنید:",
-                options=[col for col in df.columns if col not in ['ردیف', 'کلاس', 'نام', 'نام خانوادگی', 'معدل', 'متنمعدل', 'حروفی', 'انضباط', 'جمع']],
-                default=['ریاضی', 'علوم', 'ادبیات فارسی']
-            )
-            
-            if subject_columns:
-                cols = st.columns(len(subject_columns))
-                for idx, subject in enumerate(subject_columns):
-                    with cols[idx]:
-                        analysis = analyze_subject_scores(df, subject)
-                        if analysis:
-                            stats = analysis['stats']
-                            
-                            # کارت متریک
-                            card_class = "success-card" if stats['mean'] >= 15 else "warning-card" if stats['mean'] >= 12 else "danger-card"
-                            st.markdown(f'<div class="metric-card {card_class} rtl-text">', unsafe_allow_html=True)
-                            st.metric(subject, f"{stats['mean']:.1f}", 
-                                    f"±{stats['std']:.1f} STD")
-                            st.caption(f"تعداد: {stats['count']} | میانه: {stats['median']:.1f}")
-                            st.caption(f"ضعیف: {analysis['grade_distribution']['ضعیف (0-9)']} نفر")
-                            st.markdown('</div>', unsafe_allow_html=True)
-                
-                # نمودار مقایسه‌ای
-                st.markdown('<h4 class="sub-title">مقایسه دروس</h4>', unsafe_allow_html=True)
-                
-                fig_data = []
-                for subject in subject_columns:
-                    scores = df[subject].dropna().tolist()
-                    if scores:
-                        fig_data.append({
-                            'درس': subject,
-                            'میانگین': np.mean(scores),
-                            'میانه': np.median(scores),
-                            'انحراف معیار': np.std(scores),
-                            'حداقل': min(scores),
-                            'حداکثر': max(scores)
-                        })
-                
-                if fig_data:
-                    df_compare = pd.DataFrame(fig_data)
-                    fig = px.bar(df_compare, x='درس', y='میانگین',
-                                title='میانگین نمرات دروس مختلف',
-                                color='میانگین',
-                                color_continuous_scale='viridis')
-                    st.plotly_chart(fig, use_container_width=True)
-        
-        with tab2:
-            st.markdown('<h3 class="sub-title">گزارش تخصصی برای معلم</h3>', unsafe_allow_html=True)
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                selected_subject = st.selectbox(
-                    "درس مورد نظر:",
-                    options=[col for col in df.columns if col not in ['ردیف', 'کلاس', 'نام', 'نام خانوادگی', 'معدل', 'متنمعدل', 'حروفی', 'انضباط', 'جمع']]
-                )
-            
-            with col2:
-                teacher_name = st.text_input("نام معلم:", value="")
-            
-            if selected_subject:
-                report = generate_teacher_report(df, selected_subject, teacher_name)
-                
-                if report:
-                    # نمایش گزارش در کارت‌های زیبا
-                    st.markdown('<div class="teacher-report rtl-text">', unsafe_allow_html=True)
-                    st.subheader(f"📋 گزارش درس {selected_subject}")
-                    if teacher_name:
-                        st.write(f"**معلم:** {teacher_name}")
-                    st.write(f"**تاریخ گزارش:** {report['date']}")
-                    st.markdown('</div>', unsafe_allow_html=True)
-                    
-                    # خلاصه
-                    st.markdown('<div class="highlight-box rtl-text">', unsafe_allow_html=True)
-                    st.write("### 📊 خلاصه عملکرد")
-                    for item in report['summary']:
-                        st.write(f"- {item}")
-                    st.markdown('</div>', unsafe_allow_html=True)
-                    
-                    # آمار دقیق
-                    col1, col2, col3 = st.columns(3)
-                    with col1:
-                        st.metric("میانگین", f"{report['detailed_analysis']['stats']['mean']:.2f}")
-                        st.metric("حداقل", f"{report['detailed_analysis']['stats']['min']:.2f}")
-                    with col2:
-                        st.metric("میانه", f"{report['detailed_analysis']['stats']['median']:.2f}")
-                        st.metric("حداکثر", f"{report['detailed_analysis']['stats']['max']:.2f}")
-                    with col3:
-                        st.metric("انحراف معیار", f"{report['detailed_analysis']['stats']['std']:.2f}")
-                        st.metric("IQR", f"{report['detailed_analysis']['stats']['iqr']:.2f}")
-                    
-                    # توزیع نمرات
-                    st.markdown('<h4 class="sub-title">توزیع نمرات</h4>', unsafe_allow_html=True)
-                    dist_df = pd.DataFrame.from_dict(
-                        report['detailed_analysis']['grade_distribution'], 
-                        orient='index', 
-                        columns=['تعداد']
-                    )
-                    dist_df['درصد'] = (dist_df['تعداد'] / report['detailed_analysis']['stats']['count'] * 100).round(1)
-                    st.dataframe(dist_df, use_container_width=True)
-                    
-                    # نمودار هیستوگرام
-                    scores = df[selected_subject].dropna().tolist()
-                    fig = px.histogram(x=scores, nbins=20, 
-                                      title=f'توزیع نمرات درس {selected_subject}',
-                                      labels={'x': 'نمره', 'y': 'تعداد دانش‌آموز'})
-                    st.plotly_chart(fig, use_container_width=True)
-                    
-                    # اقدامات لازم
-                    st.markdown('<h4 class="sub-title">📝 اقدامات پیشنهادی</h4>', unsafe_allow_html=True)
-                    actions_df = pd.DataFrame(report['action_items'])
-                    st.dataframe(actions_df, use_container_width=True)
-                    
-                    # موفقیت‌ها و نگرانی‌ها
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.markdown('<div class="success-card rtl-text">', unsafe_allow_html=True)
-                        st.write("### 🎉 نقاط قوت")
-                        for item in report['success_stories']:
-                            st.write(f"- {item}")
-                        st.markdown('</div>', unsafe_allow_html=True)
-                    
-                    with col2:
-                        st.markdown('<div class="warning-card rtl-text">', unsafe_allow_html=True)
-                        st.write("### ⚠️ نقاط ضعف")
-                        for item in report['concerns']:
-                            st.write(f"- {item}")
-                        for weakness in report['detailed_analysis']['weaknesses']:
-                            st.write(f"- {weakness}")
-                        st.markdown('</div>', unsafe_allow_html=True)
-        
-        with tab3:
-            st.markdown('<h3 class="sub-title">مقایسه عملکرد کلاس‌ها</h3>', unsafe_allow_html=True)
-            
-            # اگر ستون کلاس وجود دارد
-            if 'کلاس' in df.columns:
-                classes = df['کلاس'].unique().tolist()
-                
-                if len(classes) >= 2:
-                    col1, col2, col3 = st.columns(3)
-                    with col1:
-                        class1 = st.selectbox("کلاس اول:", classes)
-                    with col2:
-                        class2 = st.selectbox("کلاس دوم:", [c for c in classes if c != class1])
-                    with col3:
-                        compare_subject = st.selectbox(
-                            "درس مورد مقایسه:",
-                            options=[col for col in df.columns if col not in ['ردیف', 'کلاس', 'نام', 'نام خانوادگی', 'معدل', 'متنمعدل', 'حروفی', 'انضباط', 'جمع']]
-                        )
-                    
-                    if class1 and class2 and compare_subject:
-                        comparison = compare_classes(df, class1, class2, compare_subject)
-                        
-                        if comparison:
-                            # نمایش نتایج مقایسه
-                            st.markdown('<div class="info-card rtl-text">', unsafe_allow_html=True)
-                            st.write(f"### 📊 مقایسه {class1} و {class2} در {compare_subject}")
-                            
-                            col1, col2 = st.columns(2)
-                            with col1:
-                                st.write(f"**{class1}:**")
-                                st.metric("میانگین", f"{comparison['class1']['stats']['mean']:.2f}")
-                                st.metric("میانه", f"{comparison['class1']['stats']['median']:.2f}")
-                                st.metric("انحراف معیار", f"{comparison['class1']['stats']['std']:.2f}")
-                            
-                            with col2:
-                                st.write(f"**{class2}:**")
-                                st.metric("میانگین", f"{comparison['class2']['stats']['mean']:.2f}")
-                                st.metric("میانه", f"{comparison['class2']['stats']['median']:.2f}")
-                                st.metric("انحراف معیار", f"{comparison['class2']['stats']['std']:.2f}")
-                            
-                            st.markdown('</div>', unsafe_allow_html=True)
-                            
-                            # نکات مقایسه
-                            st.markdown('<div class="highlight-box rtl-text">', unsafe_allow_html=True)
-                            st.write("### 🔍 نتایج مقایسه")
-                            for point in comparison['comparison_points']:
-                                st.write(f"- {point}")
-                            st.markdown('</div>', unsafe_allow_html=True)
-                            
-                            # نمودار مقایسه‌ای
-                            fig = go.Figure()
-                            
-                            # Boxplot برای کلاس اول
-                            scores1 = df[df['کلاس'] == class1][compare_subject].dropna().tolist()
-                            fig.add_trace(go.Box(
-                                y=scores1,
-                                name=class1,
-                                boxpoints='outliers',
-                                marker_color='blue'
-                            ))
-                            
-                            # Boxplot برای کلاس دوم
-                            scores2 = df[df['کلاس'] == class2][compare_subject].dropna().tolist()
-                            fig.add_trace(go.Box(
-                                y=scores2,
-                                name=class2,
-                                boxpoints='outliers',
-                                marker_color='red'
-                            ))
-                            
-                            fig.update_layout(
-                                title=f'مقایسه Boxplot {compare_subject}',
-                                yaxis_title='نمره',
-                                showlegend=True
-                            )
-                            
-                            st.plotly_chart(fig, use_container_width=True)
-                else:
-                    st.warning("حداقل دو کلاس برای مقایسه نیاز است")
-            else:
-                st.warning("ستون 'کلاس' در فایل یافت نشد")
-        
-        with tab4:
-            st.markdown('<h3 class="sub-title">شناسایی سیستماتیک مشکلات</h3>', unsafe_allow_html=True)
-            
-            # شناسایی دروس مشکل‌دار
-            problem_subjects = []
-            subject_columns = [col for col in df.columns if col not in ['ردیف', 'کلاس', 'نام', 'نام خانوادگی', 'معدل', 'متنمعدل', 'حروفی', 'انضباط', 'جمع']]
-            
-            for subject in subject_columns:
-                analysis = analyze_subject_scores(df, subject)
-                if analysis:
-                    stats = analysis['stats']
-                    weaknesses = analysis['weaknesses']
-                    
-                    if stats['mean'] < 12 or len(weaknesses) > 2:
-                        problem_subjects.append({
-                            'درس': subject,
-                            'میانگین': stats['mean'],
-                            'مشکلات': weaknesses,
-                            'تعداد ضعیف': analysis['grade_distribution']['ضعیف (0-9)'],
-                            'اولویت': 'بالا' if stats['mean'] < 10 else 'متوسط'
-                        })
-            
-            if problem_subjects:
-                st.markdown('<div class="danger-card rtl-text">', unsafe_allow_html=True)
-                st.write("### 🚨 دروس نیازمند توجه فوری")
-                problems_df = pd.DataFrame(problem_subjects)
-                st.dataframe(problems_df.sort_values('میانگین'), use_container_width=True)
-                st.markdown('</div>', unsafe_allow_html=True)
-                
-                # شناسایی دانش‌آموزان مشکل‌دار
-                st.markdown('<h4 class="sub-title">👥 دانش‌آموزان نیازمند حمایت ویژه</h4>', unsafe_allow_html=True)
-                
-                weak_students = []
-                for _, row in df.iterrows():
-                    low_scores = []
-                    for subject in subject_columns:
-                        if pd.notna(row[subject]) and row[subject] < 10:
-                            low_scores.append(f"{subject}: {row[subject]}")
-                    
-                    if len(low_scores) >= 3:  # اگر در ۳ درس یا بیشتر ضعیف باشد
-                        weak_students.append({
-                            'نام': f"{row['نام']} {row['نام خانوادگی']}",
-                            'کلاس': row['کلاس'] if 'کلاس' in row else '-',
-                            'تعداد دروس ضعیف': len(low_scores),
-                            'دروس ضعیف': ', '.join(low_scores[:3]) + ('...' if len(low_scores) > 3 else '')
-                        })
-                
-                if weak_students:
-                    weak_df = pd.DataFrame(weak_students)
-                    st.dataframe(weak_df.sort_values('تعداد دروس ضعیف', ascending=False), 
-                                use_container_width=True)
-                else:
-                    st.info("✅ دانش‌آموز با مشکل جدی شناسایی نشد")
-            else:
-                st.success("🎉 هیچ درس مشکل‌داری شناسایی نشد!")
-        
-        with tab5:
-            st.markdown('<h3 class="sub-title">خروجی گزارش‌ها</h3>', unsafe_allow_html=True)
-            
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                report_type = st.selectbox(
-                    "نوع گزارش:",
-                    ["گزارش کلی مدرسه", "گزارش درسی خاص", "گزارش مقایسه کلاس‌ها", "گزارش مشکلات"]
-                )
-            
-            with col2:
-                if report_type == "گزارش درسی خاص":
-                    report_subject = st.selectbox(
-                        "درس:",
-                        options=[col for col in df.columns if col not in ['ردیف', 'کلاس', 'نام', 'نام خانوادگی', 'معدل', 'متنمعدل', 'حروفی', 'انضباط', 'جمع']]
-                    )
-                elif report_type == "گزارش مقایسه کلاس‌ها":
-                    if 'کلاس' in df.columns:
-                        classes = df['کلاس'].unique().tolist()
-                        report_class1 = st.selectbox("کلاس اول:", classes)
-                        report_class2 = st.selectbox("کلاس دوم:", [c for c in classes if c != report_class1])
-            
-            if st.button("📄 تولید گزارش PDF"):
-                # اینجا می‌توانید از کتابخانه‌هایی مثل reportlab یا weasyprint استفاده کنید
-                # برای سادگی، یک خروجی HTML ایجاد می‌کنیم
-                
-                import base64
-                
-                # ایجاد گزارش HTML ساده
-                html_report = """
-                <!DOCTYPE html>
-                <html dir="rtl">
-                <head>
-                    <meta charset="UTF-8">
-                    <title>گزارش تحلیلی نمرات</title>
-                    <style>
-                        body { font-family: 'Vazirmatn', sans-serif; padding: 20px; }
-                        .header { text-align: center; background: #1E3C72; color: white; padding: 20px; border-radius: 10px; }
-                        .metric { background: #f8f9fa; padding: 15px; margin: 10px 0; border-right: 5px solid #007bff; }
-                        .warning { background: #fff3cd; border-color: #ffc107; }
-                        .danger { background: #f8d7da; border-color: #dc3545; }
-                    </style>
-                </head>
-                <body>
-                    <div class="header">
-                        <h1>گزارش تحلیلی نمرات مدرسه</h1>
-                        <p>تاریخ تولید: """ + datetime.now().strftime("%Y/%m/%d") + """</p>
-                    </div>
-                    <h2>خلاصه آماری</h2>
-                """
-                
-                # اضافه کردن آمار
-                for subject in subject_columns[:5]:  # فقط ۵ درس اول
-                    analysis = analyze_subject_scores(df, subject)
-                    if analysis:
-                        stats = analysis['stats']
-                        html_report += f"""
-                        <div class="metric">
-                            <h3>{subject}</h3>
-                            <p>میانگین: {stats['mean']:.2f} | میانه: {stats['median']:.2f}</p>
-                            <p>تعداد دانش‌آموز: {stats['count']} | انحراف معیار: {stats['std']:.2f}</p>
-                        </div>
-                        """
-                
-                html_report += "</body></html>"
-                
-                # ایجاد فایل HTML قابل دانلود
-                b64 = base64.b64encode(html_report.encode()).decode()
-                href = f'<a href="data:text/html;base64,{b64}" download="school_report.html">📥 دانلود گزارش HTML</a>'
-                st.markdown(href, unsafe_allow_html=True)
-                
-                # همچنین امکان ذخیره در اکسل
-                if st.button("📊 ذخیره آمار در اکسل"):
-                    # ایجاد DataFrame از آمار
-                    stats_list = []
-                    for subject in subject_columns:
-                        analysis = analyze_subject_scores(df, subject)
-                        if analysis:
-                            stats = analysis['stats']
-                            stats_list.append({
-                                'درس': subject,
-                                'میانگین': stats['mean'],
-                                'میانه': stats['median'],
-                                'انحراف معیار': stats['std'],
-                                'حداقل': stats['min'],
-                                'حداکثر': stats['max'],
-                                'تعداد': stats['count']
-                            })
-                    
-                    stats_df = pd.DataFrame(stats_list)
-                    
-                    # ایجاد خروجی Excel
-                    output = BytesIO()
-                    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                        stats_df.to_excel(writer, sheet_name='آمار دروس', index=False)
-                    
-                    output.seek(0)
-                    
-                    # دکمه دانلود
-                    st.download_button(
-                        label="📥 دانلود فایل اکسل",
-                        data=output,
-                        file_name="school_statistics.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                    )
+        # بخش‌های مختلف
+        ctx = {'df': df, 'cache': cache, 'file_hash': file_hash, 'changes': changes}
+        if lazy_views:
+            # فقط بخش انتخاب‌شده اجرا می‌شود
+            active_view = st.radio("بخش:", list(VIEWS), horizontal=True, key='active_view')
+            with span(f'view.{active_view}'):
+                VIEWS[active_view](ctx)
+        else:
+            tabs = st.tabs(list(VIEWS))
+            for (name, render), tab in zip(VIEWS.items(), tabs):
+                with tab, span(f'view.{name}'):
+                    render(ctx)
     
     else:
         # صفحه راهنمای اولیه
@@ -890,6 +1212,7 @@ def main():
         - نمایش آمار توصیفی همه دروس
         - نمودارهای مقایسه‌ای
         - شناسایی دروس قوی و ضعیف
+        - نقشه حرارتی همبستگی دروس و هماهنگی هر درس با معدل و انضباط
         
         #### 👨‍🏫 گزارش معلم
         - گزارش تخصصی برای هر معلم
@@ -901,6 +1224,14 @@ def main():
         - شناسایی بهترین روش‌های تدریس
         - اشتراک‌گذاری تجربیات موفق
         
+        #### 🏅 رتبه‌بندی
+        - جدول برترین‌های هر درس و معدل در کلاس و مدرسه
+        - رتبه و صدک هر دانش‌آموز در همه دروس
+        
+        #### 🔎 جستجوی دانش‌آموز
+        - جستجوی سریع با نام یا کد، مستقل از ی/ك عربی، نیم‌فاصله و غلط تایپی
+        - کارت دانش‌آموز با نشانه‌های خطر و رتبه‌ها
+        
         #### 🎯 شناسایی مشکلات
         - شناسایی سیستماتیک دانش‌آموزان نیازمند حمایت
         - کشف دروس مشکل‌دار
@@ -927,6 +1258,10 @@ def main():
         st.dataframe(sample_df, use_container_width=True)
         
         st.markdown('</div>', unsafe_allow_html=True)
+    
+    render_jobs_panel()
+    if profiling.ENABLED:
+        render_profile_panel()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,173 @@
+"""بنچمارک مسیرهای پرمصرف تحلیل نمرات
+
+نمونه:
+    python -m benchmarks.run_benchmarks --sizes 1000 10000
+    python -m benchmarks.run_benchmarks --compare benchmarks/results/old.json
+
+نتیجه هر اجرا به صورت JSON در benchmarks/results ذخیره می‌شود تا اجراهای
+نسخه‌های مختلف با هم مقایسه شوند.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from grade_analyzer.analysis import analyze_subject_scores, compare_classes, cube_analyses
+from grade_analyzer.correlation import build_correlations
+from grade_analyzer.cube import build_stats_cube
+from grade_analyzer.export import export_workbook
+from grade_analyzer.parallel import default_workers
+from grade_analyzer.ranking import build_rank_index, leaderboard, student_profile
+from grade_analyzer.reports import generate_all_reports, generate_teacher_report
+from grade_analyzer.risk import detect_at_risk_students
+from grade_analyzer.search import build_search_index, search_students
+from grade_analyzer.stats import calculate_iqr_statistics, get_subject_columns
+
+from .synthetic import generate_grade_sheet
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+# نسبت کندتر شدن که پسرفت حساب می‌شود
+REGRESSION_RATIO = 1.2
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True, cwd=os.path.dirname(__file__)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_cases(df, excel_max_rows):
+    """فهرست (نام، تابع) مسیرهای مورد سنجش روی یک DataFrame"""
+    subjects = get_subject_columns(df)
+    classes = df['کلاس'].unique().tolist()
+    columns = [df[subject].dropna().tolist() for subject in subjects]
+    cube = build_stats_cube(df)
+    ranks = build_rank_index(df, cube)
+    search_index = build_search_index(df)
+    workers = default_workers()
+
+    cases = [
+        ('calculate_iqr_statistics', lambda: [calculate_iqr_statistics(c) for c in columns]),
+        ('analyze_subject_scores', lambda: [analyze_subject_scores(df, s) for s in subjects]),
+        ('build_stats_cube', lambda: build_stats_cube(df)),
+        ('build_stats_cube_parallel', lambda: build_stats_cube(df, workers=workers)),
+        ('compare_classes', lambda: compare_classes(df, classes[0], classes[1], subjects[0])),
+        ('compare_classes_cached_cube',
+         lambda: compare_classes(df, classes[0], classes[1], subjects[0], cube=cube)),
+        ('generate_teacher_report', lambda: generate_teacher_report(df, subjects[0])),
+        ('at_risk_scan', lambda: detect_at_risk_students(df, subjects)),
+        ('build_rank_index', lambda: build_rank_index(df, cube)),
+        ('leaderboard_and_profile',
+         lambda: (leaderboard(ranks, df, subjects[0]), student_profile(ranks, df, len(df) // 2))),
+        ('build_correlations', lambda: build_correlations(df, cube)),
+        ('build_search_index', lambda: build_search_index(df)),
+        ('student_search',
+         lambda: [search_students(search_index, query) for query in ('محمد', 'زهرا کریمی', 'محمدرزا')]),
+    ]
+    if workers > 1:
+        cases.append(('generate_all_reports_parallel',
+                      lambda: generate_all_reports(df, workers=workers, cube=cube)))
+    if len(df) <= excel_max_rows:
+        # همان مسیر خروجی برنامه: همه شیت‌ها از مکعب و تحلیل‌های آماده
+        analyses = cube_analyses(cube)
+        at_risk = detect_at_risk_students(df, subjects)
+        cases.append(('excel_export', lambda: export_workbook(df, cube, analyses, BytesIO(), at_risk)))
+    return cases
+
+
+def time_case(func, repeat):
+    """زمان اجرای یک تابع در چند تکرار (ثانیه)، پس از یک اجرای گرم‌کردن"""
+    func()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return {'min': min(durations), 'median': statistics.median(durations), 'repeat': repeat}
+
+
+def run(sizes, repeat, subjects, excel_max_rows, seed):
+    results = {}
+    for size in sizes:
+        df = generate_grade_sheet(size, subjects, seed)
+        results[str(size)] = {}
+        for name, func in build_cases(df, excel_max_rows):
+            timing = time_case(func, repeat)
+            results[str(size)][name] = timing
+            print(f"{size:>9} {name:<30} {timing['min'] * 1000:10.2f} ms")
+    return {
+        'revision': _git_revision(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'subjects': subjects,
+        'seed': seed,
+        'results': results,
+    }
+
+
+def compare(current, previous):
+    """مقایسه با اجرای قبلی؛ فهرست پسرفت‌ها را برمی‌گرداند"""
+    regressions = []
+    print(f"\nمقایسه با {previous.get('revision')} ({previous.get('timestamp')})")
+    for size, cases in current['results'].items():
+        for name, timing in cases.items():
+            old = previous.get('results', {}).get(size, {}).get(name)
+            if not old:
+                continue
+            ratio = timing['min'] / old['min'] if old['min'] else float('inf')
+            flag = ' ⚠' if ratio > REGRESSION_RATIO else ''
+            print(f"{size:>9} {name:<30} {ratio:6.2f}x{flag}")
+            if flag:
+                regressions.append((size, name, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='بنچمارک تحلیل نمرات')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--subjects', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--excel-max-rows', type=int, default=100_000,
+                        help='خروجی اکسل برای فایل‌های بزرگ‌تر سنجیده نمی‌شود')
+    parser.add_argument('--out', help='مسیر فایل JSON نتیجه (پیش‌فرض: benchmarks/results)')
+    parser.add_argument('--compare', help='فایل JSON اجرای قبلی برای مقایسه')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args(argv)
+
+    current = run(args.sizes, args.repeat, args.subjects, args.excel_max_rows, args.seed)
+
+    out = args.out
+    if out is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        out = os.path.join(RESULTS_DIR, f"{current['revision'] or 'local'}-{stamp}.json")
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(current, f, ensure_ascii=False, indent=2)
+    print(f"\nنتیجه: {out}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(current, json.load(f))
+        if regressions and args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
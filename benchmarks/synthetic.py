@@ -0,0 +1,75 @@
+"""تولید فایل نمرات مصنوعی با ساختار فایل نمونه برای بنچمارک
+
+نمونه:
+    python -m benchmarks.synthetic 10000 grades.xlsx
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+SUBJECTS = [
+    'ریاضی', 'علوم', 'ادبیات فارسی', 'عربی', 'زبان انگلیسی', 'مطالعات اجتماعی',
+    'قرآن', 'پیام‌های آسمان', 'فناوری', 'تفکر', 'ورزش', 'هنر',
+]
+FIRST_NAMES = ['علی', 'رضا', 'سارا', 'نازنین', 'مریم', 'حسین', 'زهرا', 'محمد',
+               'فاطمه', 'امیر', 'یاسمن', 'مهدی', 'کیان', 'هستی', 'آرمان', 'نیلوفر']
+LAST_NAMES = ['محمدی', 'احمدی', 'کریمی', 'حسینی', 'رضایی', 'موسوی', 'جعفری',
+              'کاظمی', 'صادقی', 'رحیمی', 'نوری', 'اکبری', 'قاسمی', 'حیدری']
+GRADES = ['هفتم', 'هشتم', 'نهم']
+
+# تعداد تقریبی دانش‌آموز هر کلاس
+CLASS_SIZE = 30
+
+
+def generate_grade_sheet(n_rows, n_subjects=len(SUBJECTS), seed=0, missing_rate=0.03):
+    """DataFrame نمرات با ستون‌های کلاس، نام، نام خانوادگی، دروس، معدل و انضباط
+
+    نمرات هر دانش‌آموز از توان فردی و سطح کلاس ساخته می‌شوند، به مضرب ۰٫۲۵
+    گرد شده و بین ۰ تا ۲۰ محدود می‌شوند. درصدی از نمرات خالی است.
+    """
+    rng = np.random.default_rng(seed)
+    subjects = list(SUBJECTS[:n_subjects])
+    subjects += [f'درس {i + 1}' for i in range(len(subjects), n_subjects)]
+
+    n_classes = max(n_rows // CLASS_SIZE, 2)
+    class_names = np.array([f'{GRADES[c % len(GRADES)]}/{c // len(GRADES) + 1}' for c in range(n_classes)])
+    class_codes = rng.integers(0, n_classes, n_rows)
+    class_level = rng.normal(0, 1.5, n_classes)[class_codes]
+    ability = rng.normal(13.5, 3, n_rows) + class_level
+
+    difficulty = rng.normal(0, 1.5, n_subjects)
+    noise = rng.normal(0, 2.5, (n_rows, n_subjects)).astype(np.float32)
+    scores = np.clip(np.round((ability[:, None] + difficulty + noise) * 4) / 4, 0, 20)
+    scores[rng.random(scores.shape) < missing_rate] = np.nan
+
+    df = pd.DataFrame({
+        'ردیف': np.arange(1, n_rows + 1),
+        'کلاس': class_names[class_codes],
+        'نام': np.array(FIRST_NAMES)[rng.integers(0, len(FIRST_NAMES), n_rows)],
+        'نام خانوادگی': np.array(LAST_NAMES)[rng.integers(0, len(LAST_NAMES), n_rows)],
+    })
+    for j, subject in enumerate(subjects):
+        df[subject] = scores[:, j]
+    df['معدل'] = np.round(np.nanmean(scores, axis=1), 2)
+    df['انضباط'] = np.clip(np.round(rng.normal(18, 1.5, n_rows) * 4) / 4, 0, 20)
+    return df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='تولید فایل نمرات مصنوعی')
+    parser.add_argument('rows', type=int)
+    parser.add_argument('out', help='مسیر خروجی (.xlsx یا .csv)')
+    parser.add_argument('--subjects', type=int, default=len(SUBJECTS))
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    df = generate_grade_sheet(args.rows, args.subjects, args.seed)
+    if args.out.lower().endswith('.csv'):
+        df.to_csv(args.out, index=False, encoding='utf-8-sig')
+    else:
+        df.to_excel(args.out, index=False)
+
+
+if __name__ == '__main__':
+    main()
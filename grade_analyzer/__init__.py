@@ -0,0 +1,79 @@
+"""موتور تحلیل نمرات مدرسه (مستقل از رابط کاربری)"""
+
+from .analysis import (
+    analyze_batch,
+    analyze_subject_scores,
+    analyze_subjects,
+    compare_classes,
+    compare_statistics,
+    cube_analyses,
+    cube_analysis,
+    find_problem_subjects,
+    statistics_table,
+)
+from .cache import AnalysisCache, content_hash, make_key
+from .charts import box_summary, cube_box, cube_histogram, histogram_bins
+from .comparison import class_matrix, matrix_frame, top_divergent_pairs, top_divergent_pairs_all
+from .correlation import (
+    alignment_table,
+    build_correlations,
+    class_alignment_table,
+    correlation_columns,
+    correlation_frame,
+    strongest_pairs,
+)
+from .cube import (
+    assemble_cube,
+    build_stats_cube,
+    class_rows,
+    cube_scores,
+    cube_stats,
+    group_rows,
+)
+from .export import class_statistics_table, export_workbook, outlier_roster, statistics_excel
+from .history import HistoryStore, student_keys
+from .incremental import changed_cells_table, diff_frames, has_changes, update_cube
+from .ingest import ingest_upload, normalize_frame, read_csv_stream
+from .jobs import JobCancelled, JobQueue, stage_progress
+from .parallel import SharedArrays, attach_arrays, default_workers, parallel_map
+from .profiling import profiled, span
+from .ranking import build_rank_index, leaderboard, student_names, student_profile, student_ranks, top_rows
+from .render import (
+    comparison_report_html,
+    problems_report_html,
+    render_document,
+    render_teacher_reports,
+    school_report_html,
+    subject_report_html,
+    teacher_report_html,
+    write_rendered,
+)
+from .reports import generate_all_reports, generate_teacher_report, write_reports
+from .risk import detect_at_risk_students, student_risk_flags, weak_score_matrix
+from .rules import DEFAULT_RULES, compile_rules, evaluate_batch, evaluate_stats, load_rules
+from .search import build_search_index, normalize_text, search_key, search_students, search_table
+from .service import AnalysisService, create_app, encode_response
+from .sketch import (
+    QuantileSketch,
+    load_sketches,
+    merge_sketches,
+    save_sketches,
+    sketch_file,
+    sketch_frame,
+    sketch_statistics,
+    sketch_table,
+)
+from .stats import (
+    CLASS_COLUMN,
+    NON_SUBJECT_COLUMNS,
+    STUDENT_ID_COLUMNS,
+    batch_columns,
+    batch_iqr_statistics,
+    calculate_iqr_statistics,
+    get_subject_columns,
+    score_dtype,
+    score_matrix,
+    stats_view,
+    subject_statistics,
+    subject_view,
+)
@@ -0,0 +1,183 @@
+import pandas as pd
+
+from .cube import build_stats_cube, cube_scores, cube_stats
+from .profiling import profiled
+from .rules import evaluate_batch, evaluate_stats
+from .stats import batch_columns, batch_iqr_statistics, stats_view, subject_statistics
+
+
+def analyze_subject_scores(df, subject_name):
+    """تحلیل نمرات یک درس خاص"""
+    return analyze_subjects(df, [subject_name]).get(subject_name)
+
+
+@profiled()
+def analyze_subjects(df, subjects):
+    """تحلیل چند درس با یک محاسبه آماری و یک ارزیابی قوانین مشترک"""
+    return analyze_batch(subject_statistics(df, subjects), subjects)
+
+
+def _cube_batch(cube, class_name):
+    """دسته آماری کل مدرسه یا یک کلاس در مکعب"""
+    if class_name is None:
+        return cube['overall']
+    c = cube['class_index'].get(class_name)
+    return None if c is None else cube['batches'][c]
+
+
+@profiled()
+def cube_analyses(cube, class_name=None):
+    """تحلیل همه دروس (در کل مدرسه یا یک کلاس) از روی مکعب آمار"""
+    batch = _cube_batch(cube, class_name)
+    if batch is None:
+        return {}
+    return analyze_batch(batch, cube['subjects'])
+
+
+def cube_analysis(cube, subject_name, class_name=None):
+    """تحلیل یک درس (در کل مدرسه یا یک کلاس) از روی مکعب آمار
+
+    قوانین فقط روی ستون همین درس ارزیابی می‌شوند، پس هزینه هر فراخوانی به
+    تعداد دروس بستگی ندارد.
+    """
+    batch = _cube_batch(cube, class_name)
+    j = cube['subject_index'].get(subject_name)
+    if batch is None or j is None:
+        return None
+    return analyze_batch(batch_columns(batch, [j]), [subject_name])[subject_name]
+
+
+def analyze_batch(batch, subjects):
+    """ساخت تحلیل کیفیت تدریس همه دروس یک دسته آماری"""
+    evaluations = evaluate_batch(batch)
+    analyses = {}
+    for j, subject in enumerate(subjects):
+        stats = stats_view(batch, j)
+        analyses[subject] = None if stats is None else {'stats': stats, **evaluations[j]}
+    return analyses
+
+
+def categorize_scores(scores):
+    """دسته‌بندی نمرات به ضعیف، متوسط، خوب، عالی"""
+    return evaluate_batch(batch_iqr_statistics(scores))[0]['grade_distribution']
+
+
+def identify_weaknesses(scores, subject_name):
+    """شناسایی نقاط ضعف"""
+    return evaluate_batch(batch_iqr_statistics(scores))[0]['weaknesses']
+
+
+def identify_strengths(scores, subject_name):
+    """شناسایی نقاط قوت"""
+    return evaluate_batch(batch_iqr_statistics(scores))[0]['strengths']
+
+
+def generate_recommendations(stats, subject_name):
+    """تولید توصیه‌های آموزشی"""
+    return evaluate_stats(stats, 'recommendations')
+
+
+@profiled()
+def compare_classes(df, class1, class2, subject_name, cube=None):
+    """مقایسه دو کلاس در یک درس"""
+    if cube is None:
+        # فقط ردیف‌های همین دو کلاس گروه‌بندی می‌شوند
+        pair = df[df['کلاس'].isin([class1, class2])]
+        cube = build_stats_cube(pair, [subject_name])
+    analysis1 = cube_analysis(cube, subject_name, class1)
+    analysis2 = cube_analysis(cube, subject_name, class2)
+
+    if not analysis1 or not analysis2:
+        return None
+
+    stats1 = analysis1['stats']
+    stats2 = analysis2['stats']
+
+    comparison = {
+        'class1': {
+            'name': class1,
+            'stats': stats1,
+            'analysis': analysis1
+        },
+        'class2': {
+            'name': class2,
+            'stats': stats2,
+            'analysis': analysis2
+        },
+        'comparison_points': compare_statistics(stats1, stats2)
+    }
+
+    return comparison
+
+
+def compare_statistics(stats1, stats2):
+    """مقایسه آماری دو مجموعه داده"""
+    points = []
+
+    # مقایسه میانگین
+    diff_mean = stats2['mean'] - stats1['mean']
+    if diff_mean > 2:
+        points.append(f"کلاس دوم به طور قابل توجهی میانگین بالاتری دارد (+{diff_mean:.1f})")
+    elif diff_mean < -2:
+        points.append(f"کلاس اول میانگین بالاتری دارد ({abs(diff_mean):.1f} واحد)")
+    else:
+        points.append("تفاوت معنی‌داری در میانگین وجود ندارد")
+
+    # مقایسه پراکندگی
+    if stats2['std'] < stats1['std'] - 1:
+        points.append(f"کلاس دوم همگن‌تر است (انحراف معیار کمتر)")
+    elif stats2['std'] > stats1['std'] + 1:
+        points.append(f"کلاس اول همگن‌تر است")
+
+    # مقایسه میانه
+    diff_median = stats2['median'] - stats1['median']
+    if abs(diff_median) > 2:
+        points.append(f"تفاوت قابل توجه در میانه: {diff_median:.1f} واحد")
+
+    # مقایسه تعداد ضعیف‌ها
+    weak1 = stats1['mean'] < 10
+    weak2 = stats2['mean'] < 10
+    if weak1 and not weak2:
+        points.append("کلاس اول نیاز فوری به مداخله دارد")
+    elif not weak1 and weak2:
+        points.append("کلاس دوم نیاز فوری به مداخله دارد")
+
+    return points
+
+
+def find_problem_subjects(analyses):
+    """شناسایی دروس مشکل‌دار، مرتب‌شده بر اساس میانگین (صعودی)"""
+    problem_subjects = []
+    for subject, analysis in analyses.items():
+        if not analysis:
+            continue
+        stats = analysis['stats']
+        weaknesses = analysis['weaknesses']
+
+        if stats['mean'] < 12 or len(weaknesses) > 2:
+            problem_subjects.append({
+                'درس': subject,
+                'میانگین': stats['mean'],
+                'مشکلات': weaknesses,
+                'تعداد ضعیف': analysis['grade_distribution'].get('ضعیف (0-9)', 0),
+                'اولویت': 'بالا' if stats['mean'] < 10 else 'متوسط'
+            })
+    return sorted(problem_subjects, key=lambda item: item['میانگین'])
+
+
+def statistics_table(analyses):
+    """جدول خلاصه آمار دروس برای خروجی"""
+    rows = []
+    for subject, analysis in analyses.items():
+        if analysis:
+            stats = analysis['stats']
+            rows.append({
+                'درس': subject,
+                'میانگین': stats['mean'],
+                'میانه': stats['median'],
+                'انحراف معیار': stats['std'],
+                'حداقل': stats['min'],
+                'حداکثر': stats['max'],
+                'تعداد': stats['count']
+            })
+    return pd.DataFrame(rows, columns=['درس', 'میانگین', 'میانه', 'انحراف معیار', 'حداقل', 'حداکثر', 'تعداد'])
@@ -0,0 +1,144 @@
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# سقف پیش‌فرض حافظه کش (مگابایت)
+DEFAULT_MAX_MB = int(os.environ.get('GRADE_ANALYZER_CACHE_MB', '512'))
+
+
+def content_hash(data):
+    """هش محتوای فایل بارگذاری‌شده"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def make_key(file_hash, kind, *params):
+    """کلید کش: هش فایل + نوع نتیجه + پارامترهای تحلیل"""
+    return (file_hash, kind) + tuple(params)
+
+
+def estimate_size(value, _seen=None):
+    """تخمین حجم حافظه یک نتیجه (بایت)"""
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(k, _seen) + estimate_size(v, _seen) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_size(v, _seen) for v in value)
+    return sys.getsizeof(value)
+
+
+class AnalysisCache:
+    """کش LRU با سقف حافظه، قابل اشتراک بین نشست‌های هم‌زمان
+
+    هر کلید با هش محتوای فایل شروع می‌شود تا باطل کردن همه نتایج یک فایل
+    ممکن باشد. محاسبه هر کلید فقط یک بار انجام می‌شود و نشست‌های دیگری که
+    همان کلید را هم‌زمان بخواهند منتظر نتیجه می‌مانند.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_MB * 1024 * 1024, max_entries=1024):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """خواندن یک نتیجه و به‌روزرسانی ترتیب LRU"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def put(self, key, value, size=None):
+        """ذخیره یک نتیجه و حذف قدیمی‌ترین موارد در صورت عبور از سقف"""
+        if size is None:
+            size = estimate_size(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            if size > self.max_bytes:
+                return value
+            self._entries[key] = (value, size)
+            self.total_bytes += size
+            self._evict()
+        return value
+
+    def get_or_compute(self, key, compute):
+        """نتیجه کش‌شده یا محاسبه آن (فقط یک بار برای هر کلید)"""
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            return value
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            # ممکن است نشست دیگری در این فاصله محاسبه را تمام کرده باشد
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    return entry[0]
+            try:
+                return self.put(key, compute())
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+
+    def invalidate(self, file_hash=None):
+        """حذف همه نتایج یک فایل (یا کل کش وقتی هشی داده نشود)"""
+        with self._lock:
+            if file_hash is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                self.total_bytes = 0
+                return removed
+            keys = [key for key in self._entries if key[0] == file_hash]
+            for key in keys:
+                self.total_bytes -= self._entries.pop(key)[1]
+            return len(keys)
+
+    def info(self):
+        """وضعیت فعلی کش"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+    def _evict(self):
+        while self._entries and (self.total_bytes > self.max_bytes
+                                 or len(self._entries) > self.max_entries):
+            _, (_, size) = self._entries.popitem(last=False)
+            self.total_bytes -= size
@@ -0,0 +1,103 @@
+"""داده‌های تجمیع‌شده نمودارها
+
+به جای فرستادن همه نمرات به مرورگر، هیستوگرام در NumPy دسته‌بندی می‌شود و
+نمودار جعبه‌ای از چارک‌ها و حدود از پیش محاسبه‌شده مکعب ساخته می‌شود. فقط
+نمرات پرت (حداکثر MAX_OUTLIER_POINTS نقطه) جداگانه فرستاده می‌شوند، پس
+حجم داده نمودار به تعداد دانش‌آموزان بستگی ندارد.
+"""
+import numpy as np
+
+from .cube import _locate
+from .profiling import profiled
+
+HISTOGRAM_BINS = 20
+MAX_OUTLIER_POINTS = 200
+
+
+def histogram_bins(sorted_scores, nbins=HISTOGRAM_BINS, score_range=None):
+    """شمارش نمرات مرتب‌شده در nbins بازه هم‌اندازه
+
+    خروجی: {'edges', 'centers', 'widths', 'counts', 'total'}. چون نمرات
+    مرتب‌اند شمارش هر بازه با searchsorted و بدون گذر روی همه نمرات است.
+    """
+    n = len(sorted_scores)
+    if score_range is None:
+        score_range = (float(sorted_scores[0]), float(sorted_scores[-1])) if n else (0.0, 20.0)
+    low, high = score_range
+    if high <= low:
+        low, high = low - 0.5, low + 0.5
+    edges = np.linspace(low, high, nbins + 1)
+    # بازه آخر مثل np.histogram از دو طرف بسته است
+    positions = np.searchsorted(sorted_scores, edges, side='left')
+    positions[-1] = np.searchsorted(sorted_scores, high, side='right')
+    counts = np.diff(positions)
+    return {
+        'edges': edges,
+        'centers': (edges[:-1] + edges[1:]) / 2,
+        'widths': np.diff(edges),
+        'counts': counts,
+        'total': int(counts.sum()),
+    }
+
+
+def _thin(values, limit):
+    """حداکثر limit مقدار با فاصله یکنواخت از یک آرایه مرتب"""
+    if limit is None or len(values) <= limit:
+        return values
+    return values[np.linspace(0, len(values) - 1, limit).round().astype(int)]
+
+
+def box_summary(sorted_scores, stats, max_outliers=MAX_OUTLIER_POINTS):
+    """خلاصه نمودار جعبه‌ای از چارک‌ها و حدود IQR
+
+    سبیل‌ها تا دورترین نمره داخل حدود ادامه دارند (مثل plotly). از نمرات
+    پرت حداکثر max_outliers نقطه با فاصله یکنواخت نگه داشته می‌شود.
+    """
+    lower, upper = stats['lower_bound'], stats['upper_bound']
+    inside_start = np.searchsorted(sorted_scores, lower, side='left')
+    inside_end = np.searchsorted(sorted_scores, upper, side='right')
+    outliers = np.concatenate([sorted_scores[:inside_start], sorted_scores[inside_end:]])
+    if inside_end > inside_start:
+        lower_fence = float(sorted_scores[inside_start])
+        upper_fence = float(sorted_scores[inside_end - 1])
+    else:
+        lower_fence, upper_fence = stats['q1'], stats['q3']
+    return {
+        'q1': stats['q1'],
+        'median': stats['median'],
+        'q3': stats['q3'],
+        'mean': stats['mean'],
+        'lower_fence': lower_fence,
+        'upper_fence': upper_fence,
+        'outliers': _thin(outliers, max_outliers),
+        'outlier_count': len(outliers),
+        'count': stats['count'],
+    }
+
+
+def _batch_column(cube, subject, class_name):
+    batch, j = _locate(cube, subject, class_name)
+    if batch is None or not batch['valid'][j]:
+        return None, None
+    return batch, j
+
+
+@profiled()
+def cube_histogram(cube, subject, class_name=None, nbins=HISTOGRAM_BINS, score_range=None):
+    """هیستوگرام یک درس از نمرات مرتب مکعب"""
+    batch, j = _batch_column(cube, subject, class_name)
+    if batch is None:
+        return None
+    return histogram_bins(batch['sorted'][:int(batch['count'][j]), j], nbins, score_range)
+
+
+@profiled()
+def cube_box(cube, subject, class_name=None, max_outliers=MAX_OUTLIER_POINTS):
+    """خلاصه نمودار جعبه‌ای یک درس در یک کلاس (یا کل مدرسه)"""
+    batch, j = _batch_column(cube, subject, class_name)
+    if batch is None:
+        return None
+    stats = {key: float(batch[key][j]) for key in ('q1', 'median', 'q3', 'mean',
+                                                    'lower_bound', 'upper_bound')}
+    stats['count'] = int(batch['count'][j])
+    return box_summary(batch['sorted'][:stats['count'], j], stats, max_outliers)
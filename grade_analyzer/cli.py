@@ -0,0 +1,319 @@
+"""رابط خط فرمان تحلیل نمرات (بدون نیاز به streamlit و plotly)
+
+نمونه:
+    python -m grade_analyzer analyze grades.xlsx --out report/
+    python -m grade_analyzer batch schools/*.xlsx --out region/ --workers 16
+    python -m grade_analyzer import-term grades.xlsx --term 1403-1
+    python -m grade_analyzer trends --from 1403-1 --to 1403-2
+    python -m grade_analyzer sketch school1.csv school2.csv --out sketches/
+    python -m grade_analyzer rollup sketches/*.json --out region.csv
+    python -m grade_analyzer serve --port 8600
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+from .analysis import cube_analyses, find_problem_subjects, statistics_table
+from .cube import build_stats_cube
+from .export import export_workbook
+from .history import HISTORY_DB, HistoryStore
+from .ingest import ingest_upload
+from .parallel import POOL_KINDS, default_pool_kind, default_workers, parallel_map
+from .render import render_teacher_reports, write_rendered
+from .reports import generate_all_reports, write_reports
+from .risk import MIN_WEAK_SUBJECTS, WEAK_SCORE, detect_at_risk_students
+from .service import DEFAULT_CONCURRENCY, MAX_PENDING_REQUESTS, AnalysisService
+from .sketch import SKETCH_K, load_sketches, merge_sketches, save_sketches, sketch_file, sketch_table
+from .stats import get_subject_columns
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='grade-analyzer', description='تحلیل آماری نمرات مدرسه')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    analyze = commands.add_parser('analyze', help='تحلیل یک فایل نمرات و ذخیره خروجی‌ها')
+    analyze.add_argument('file', help='فایل xlsx یا csv نمرات')
+    analyze.add_argument('--out', required=True, help='پوشه خروجی')
+    analyze.add_argument('--subjects', nargs='+', help='دروس مورد تحلیل (پیش‌فرض: همه دروس)')
+    analyze.add_argument('--min-score', type=float, default=WEAK_SCORE,
+                         help='نمره کمتر از این مقدار ضعیف است')
+    analyze.add_argument('--min-weak-subjects', type=int, default=MIN_WEAK_SUBJECTS,
+                         help='حداقل تعداد دروس ضعیف برای نیاز به حمایت')
+    analyze.add_argument('--workers', type=int, default=1,
+                         help='تعداد پردازه‌ها برای گزارش‌های معلمان')
+    analyze.add_argument('--report-format', choices=['json', 'pdf', 'html'], default='json',
+                         help='قالب گزارش معلمان (PDF در نبود weasyprint به HTML برمی‌گردد)')
+    analyze.add_argument('--no-reports', action='store_true', help='گزارش معلمان تولید نشود')
+    analyze.set_defaults(handler=run_analyze)
+
+    batch = commands.add_parser('batch', help='تحلیل موازی فایل‌های چند مدرسه')
+    batch.add_argument('files', nargs='+', help='فایل‌های xlsx یا csv نمرات (هر مدرسه یک فایل)')
+    batch.add_argument('--out', required=True, help='پوشه خروجی (هر مدرسه یک زیرپوشه)')
+    batch.add_argument('--workers', type=int, default=default_workers(),
+                       help='تعداد کارگرها (پیش‌فرض: GRADE_ANALYZER_WORKERS یا تعداد هسته‌ها)')
+    batch.add_argument('--pool', choices=POOL_KINDS, default=default_pool_kind())
+    batch.add_argument('--report-format', choices=['json', 'pdf', 'html'], default='json')
+    batch.add_argument('--no-reports', action='store_true', help='گزارش معلمان تولید نشود')
+    batch.set_defaults(handler=run_batch)
+
+    import_term = commands.add_parser('import-term', help='ثبت نمرات یک ترم در انبار تاریخی')
+    import_term.add_argument('file', help='فایل xlsx یا csv نمرات')
+    import_term.add_argument('--term', required=True, help='نام ترم')
+    import_term.add_argument('--ordinal', type=int, help='ترتیب زمانی ترم (پیش‌فرض: بعد از آخرین ترم)')
+    import_term.add_argument('--db', default=HISTORY_DB, help='فایل پایگاه داده SQLite')
+    import_term.set_defaults(handler=run_import_term)
+
+    trends = commands.add_parser('trends', help='مقایسه دو ترم از انبار تاریخی')
+    trends.add_argument('--from', dest='term_from', required=True, help='ترم مبدأ')
+    trends.add_argument('--to', dest='term_to', required=True, help='ترم مقصد')
+    trends.add_argument('--subject', help='فقط یک درس')
+    trends.add_argument('--limit', type=int, default=20)
+    trends.add_argument('--db', default=HISTORY_DB, help='فایل پایگاه داده SQLite')
+    trends.add_argument('--out', help='پوشه خروجی CSV (پیش‌فرض: فقط چاپ)')
+    trends.set_defaults(handler=run_trends)
+
+    sketch = commands.add_parser('sketch', help='ساخت خلاصه چارکی ادغام‌پذیر از فایل‌های نمرات')
+    sketch.add_argument('files', nargs='+', help='فایل‌های xlsx یا csv نمرات (مثلاً هر مدرسه یک فایل)')
+    sketch.add_argument('--out', required=True, help='پوشه فایل‌های خلاصه')
+    sketch.add_argument('--k', type=int, default=SKETCH_K, help='اندازه خلاصه (بزرگ‌تر: دقیق‌تر)')
+    sketch.set_defaults(handler=run_sketch)
+
+    rollup = commands.add_parser('rollup', help='آمار تقریبی تجمیعی از خلاصه‌ها یا فایل‌های نمرات')
+    rollup.add_argument('inputs', nargs='+', help='فایل‌های خلاصه (json) یا نمرات (xlsx/csv)')
+    rollup.add_argument('--k', type=int, default=SKETCH_K, help='اندازه خلاصه برای فایل‌های نمرات')
+    rollup.add_argument('--out', help='فایل CSV خروجی (پیش‌فرض: فقط چاپ)')
+    rollup.add_argument('--save', help='ذخیره خلاصه ادغام‌شده در این فایل json')
+    rollup.set_defaults(handler=run_rollup)
+
+    serve = commands.add_parser('serve', help='سرویس HTTP/JSON محلی برای سامانه‌های دیگر (نیاز به uvicorn)')
+    serve.add_argument('--host', default='127.0.0.1', help='نشانی (پیش‌فرض فقط همین رایانه)')
+    serve.add_argument('--port', type=int, default=8600)
+    serve.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                       help='تعداد محاسبه‌های هم‌زمان (GRADE_ANALYZER_SERVICE_CONCURRENCY)')
+    serve.add_argument('--queue', type=int, default=MAX_PENDING_REQUESTS,
+                       help='حداکثر درخواست‌های منتظر پیش از پاسخ 503')
+    serve.set_defaults(handler=run_serve)
+    return parser
+
+
+def _write_json(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def analyze_file(path, out, subjects=None, min_score=WEAK_SCORE, min_weak_subjects=MIN_WEAK_SUBJECTS,
+                 report_format='json', reports=True, workers=1):
+    """تحلیل یک فایل و نوشتن آمار، دروس مشکل‌دار، دانش‌آموزان در معرض خطر و گزارش‌ها
+
+    خلاصه نتیجه را برمی‌گرداند؛ اگر درسی در فایل نباشد KeyError می‌دهد.
+    """
+    start = time.perf_counter()
+    with open(path, 'rb') as f:
+        data = f.read()
+    ingest = ingest_upload(data, os.path.basename(path))
+    df = ingest['frame']
+    subjects = subjects or get_subject_columns(df)
+    missing = [subject for subject in subjects if subject not in df.columns]
+    if missing:
+        raise KeyError(f"ستون‌های یافت‌نشده: {', '.join(missing)}")
+
+    os.makedirs(out, exist_ok=True)
+    cube = build_stats_cube(df, subjects, workers=workers)
+    analyses = cube_analyses(cube)
+
+    _write_json(os.path.join(out, 'analyses.json'), analyses)
+    statistics_table(analyses).to_csv(os.path.join(out, 'subject_statistics.csv'),
+                                      index=False, encoding='utf-8-sig')
+
+    problems = find_problem_subjects(analyses)
+    pd.DataFrame(problems).to_csv(os.path.join(out, 'problem_subjects.csv'),
+                                  index=False, encoding='utf-8-sig')
+
+    at_risk = detect_at_risk_students(df, subjects, min_score, min_weak_subjects)
+    at_risk.to_csv(os.path.join(out, 'at_risk_students.csv'), encoding='utf-8-sig')
+    export_workbook(df, cube, analyses, os.path.join(out, 'school_statistics.xlsx'), at_risk)
+
+    report_count = 0
+    if reports:
+        all_reports = generate_all_reports(df, workers=workers, cube=cube)
+        if report_format == 'json':
+            write_reports(all_reports, os.path.join(out, 'reports'))
+        else:
+            rendered = render_teacher_reports(all_reports, report_format, workers=workers)
+            write_rendered(rendered, os.path.join(out, 'reports'))
+        report_count = len(all_reports)
+
+    return {
+        'file': path,
+        'out': out,
+        'rows': len(df),
+        'subjects': len(subjects),
+        'problems': len(problems),
+        'at_risk': len(at_risk),
+        'reports': report_count,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def _print_summary(summary):
+    print(f"{summary['rows']} ردیف، {summary['subjects']} درس، {summary['problems']} درس مشکل‌دار، "
+          f"{summary['at_risk']} دانش‌آموز نیازمند حمایت، {summary['reports']} گزارش معلم "
+          f"({summary['seconds']:.2f} ثانیه) → {summary['out']}")
+
+
+def run_analyze(args):
+    """تحلیل یک فایل"""
+    try:
+        summary = analyze_file(args.file, args.out, args.subjects, args.min_score, args.min_weak_subjects,
+                               args.report_format, not args.no_reports, args.workers)
+    except KeyError as e:
+        print(e.args[0], file=sys.stderr)
+        return 2
+    _print_summary(summary)
+    return 0
+
+
+def output_names(paths):
+    """نام یکتای خروجی هر فایل: مسیر نسبی به پوشه مشترک فایل‌ها بدون پسوند
+
+    فایل‌های هم‌نام در پوشه‌های مختلف (north/school.xlsx و south/school.xlsx)
+    خروجی جدا می‌گیرند؛ اگر دو فایل باز هم به یک نام برسند ValueError.
+    """
+    full = [os.path.abspath(path) for path in paths]
+    if not full:
+        return []
+    root = os.path.commonpath([os.path.dirname(path) for path in full])
+    names = [os.path.splitext(os.path.relpath(path, root))[0] for path in full]
+    seen = {}
+    for path, name in zip(paths, names):
+        key = os.path.normcase(name).casefold()
+        if key in seen:
+            raise ValueError(f"خروجی «{seen[key]}» و «{path}» هر دو در «{name}» نوشته می‌شوند")
+        seen[key] = path
+    return names
+
+
+def _analyze_school(shared, item):
+    """کار یک کارگر دسته‌ای: تحلیل کامل یک فایل مدرسه در پوشه خودش"""
+    path, name = item
+    out = os.path.join(shared['out'], name)
+    try:
+        return analyze_file(path, out, reports=shared['reports'], report_format=shared['report_format'])
+    except Exception as e:
+        return {'file': path, 'out': out, 'error': str(e)}
+
+
+def run_batch(args):
+    """تحلیل فایل‌های چند مدرسه؛ هر فایل یک کار مستقل در pool موازی"""
+    start = time.perf_counter()
+    try:
+        names = output_names(args.files)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    os.makedirs(args.out, exist_ok=True)
+    shared = {'out': args.out, 'reports': not args.no_reports, 'report_format': args.report_format}
+    summaries = parallel_map(_analyze_school, list(zip(args.files, names)), shared, args.workers, args.pool)
+    failed = [summary for summary in summaries if 'error' in summary]
+    for summary in summaries:
+        if 'error' in summary:
+            print(f"{summary['file']}: خطا: {summary['error']}", file=sys.stderr)
+        else:
+            _print_summary(summary)
+    pd.DataFrame(summaries).to_csv(os.path.join(args.out, 'batch_summary.csv'),
+                                   index=False, encoding='utf-8-sig')
+    print(f"{len(summaries) - len(failed)} از {len(summaries)} فایل "
+          f"({time.perf_counter() - start:.2f} ثانیه) → {args.out}")
+    return 1 if failed else 0
+
+
+def run_import_term(args):
+    """ثبت یک فایل نمرات به عنوان یک ترم"""
+    with open(args.file, 'rb') as f:
+        data = f.read()
+    ingest = ingest_upload(data, os.path.basename(args.file))
+    with HistoryStore(args.db) as store:
+        result = store.ingest_term(ingest['frame'], args.term, args.ordinal, ingest['hash'])
+    print(f"{result['term']}: {result['students']} دانش‌آموز، {result['scores']} نمره، "
+          f"{result['duplicates']} ردیف تکراری، {result['missing_keys']} ردیف بدون شناسه → {args.db}")
+    return 0
+
+
+def run_trends(args):
+    """کلاس‌ها و دانش‌آموزان با بیشترین افت بین دو ترم"""
+    with HistoryStore(args.db) as store:
+        tables = {
+            'class_drops': store.class_drops(args.term_from, args.term_to, args.subject, args.limit),
+            'student_drops': store.student_deltas(args.term_from, args.term_to, args.subject,
+                                                  limit=args.limit),
+            'student_gains': store.student_deltas(args.term_from, args.term_to, args.subject,
+                                                  limit=args.limit, ascending=False),
+        }
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+        for name, table in tables.items():
+            table.to_csv(os.path.join(args.out, f'{name}.csv'), index=False, encoding='utf-8-sig')
+    else:
+        for name, table in tables.items():
+            print(f"\n{name}\n{table.to_string(index=False)}")
+    return 0
+
+
+def sketch_names(paths):
+    """نام یکتای فایل خلاصه هر ورودی در یک پوشه (north/school.csv → north__school.sketch.json)"""
+    names = [name.replace(os.sep, '__') + '.sketch.json' for name in output_names(paths)]
+    if len({name.casefold() for name in names}) < len(names):
+        raise ValueError("نام فایل‌های خلاصه تکراری است: " + '، '.join(names))
+    return names
+
+
+def run_sketch(args):
+    """یک فایل خلاصه برای هر فایل نمرات"""
+    try:
+        names = sketch_names(args.files)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    os.makedirs(args.out, exist_ok=True)
+    for path, name in zip(args.files, names):
+        sketches = sketch_file(path, k=args.k)
+        out = save_sketches(sketches, os.path.join(args.out, name), source=path)
+        count = max((sketch.count for sketch in sketches.values()), default=0)
+        print(f"{path}: {len(sketches)} درس، حداکثر {count} نمره → {out}")
+    return 0
+
+
+def run_rollup(args):
+    """ادغام خلاصه‌ها و چاپ یا ذخیره آمار تقریبی هر درس"""
+    sketch_sets = [load_sketches(path) if path.lower().endswith('.json') else sketch_file(path, k=args.k)
+                   for path in args.inputs]
+    merged = merge_sketches(sketch_sets)
+    if args.save:
+        save_sketches(merged, args.save, source=args.inputs)
+    table = sketch_table(merged)
+    if args.out:
+        table.to_csv(args.out, index=False, encoding='utf-8-sig')
+    else:
+        print(table.to_string(index=False))
+    return 0
+
+
+def run_serve(args):
+    """اجرای سرویس ASGI با uvicorn"""
+    try:
+        import uvicorn
+    except ImportError:
+        print("برای فرمان serve کتابخانه uvicorn لازم است (pip install uvicorn)", file=sys.stderr)
+        return 2
+    app = AnalysisService(concurrency=args.concurrency, max_pending=args.queue)
+    uvicorn.run(app, host=args.host, port=args.port, log_level='warning', access_log=False)
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
@@ -0,0 +1,205 @@
+"""مقایسه همه کلاس‌ها با هم در یک محاسبه برداری
+
+همه اختلاف‌های دوبه‌دو از آرایه‌های (کلاس، درس) مکعب آمار با broadcasting
+ساخته می‌شوند و DataFrame دوباره پیمایش نمی‌شود. درایه [i, j] هر ماتریس
+مثل compare_statistics «کلاس j منهای کلاس i» است.
+"""
+import math
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from .profiling import profiled
+
+DIFF_METRICS = ['mean', 'median', 'std', 'iqr']
+RANK_METRICS = ['mean_diff', 'cohen_d', 'welch_t']
+TOP_PAIRS = 10
+
+# حداکثر تعداد درایه‌های ماتریس که در هر مرحله جست‌وجوی جفت‌ها ساخته می‌شود
+PAIR_BLOCK = 2_000_000
+
+
+def _class_columns(cube, subject, classes=None):
+    """شاخص کلاس‌های معتبر و ستون‌های آمار یک درس در مکعب"""
+    j = cube['subject_index'].get(subject)
+    if j is None:
+        return None
+    if classes is None:
+        codes = np.arange(len(cube['classes']))
+    else:
+        codes = np.array([cube['class_index'][c] for c in classes if c in cube['class_index']],
+                         dtype=np.intp)
+    codes = codes[cube['valid'][codes, j]]
+    columns = {metric: cube[metric][codes, j].astype(float) for metric in DIFF_METRICS}
+    columns['count'] = cube['count'][codes, j].astype(float)
+    # واریانس نمونه (مکعب انحراف معیار جامعه را نگه می‌دارد)
+    n = columns['count']
+    columns['var'] = np.where(n > 1, columns['std'] ** 2 * n / np.maximum(n - 1, 1), 0.0)
+    return codes, columns
+
+
+@lru_cache(maxsize=1)
+def exact_pvalues():
+    """آیا scipy برای p-value دقیق توزیع t در دسترس است"""
+    try:
+        import scipy.special  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _t_pvalue(t, dof):
+    """p-value دوطرفه آزمون t؛ بدون scipy تقریب نرمال استفاده می‌شود"""
+    if exact_pvalues():
+        from scipy.special import stdtr
+
+        return 2 * stdtr(dof, -np.abs(t))
+    erfc = np.frompyfunc(math.erfc, 1, 1)
+    return erfc(np.abs(t) / math.sqrt(2)).astype(float)
+
+
+def _cohen_d(diff, n1, v1, n2, v2):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pooled = np.sqrt(((n1 - 1) * v1 + (n2 - 1) * v2) / (n1 + n2 - 2))
+        return np.where(pooled > 0, diff / pooled, 0.0)
+
+
+def _welch_t(diff, n1, v1, n2, v2):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        se = np.sqrt(v1 / n1 + v2 / n2)
+        return np.where(se > 0, diff / se, 0.0)
+
+
+def _welch_df(n1, v1, n2, v2):
+    a, b = v1 / n1, v2 / n2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dof = (a + b) ** 2 / (a ** 2 / np.maximum(n1 - 1, 1) + b ** 2 / np.maximum(n2 - 1, 1))
+    return np.where(np.isfinite(dof), dof, 1.0)
+
+
+def _pair_statistics(rows, cols, effect_size, significance):
+    """ماتریس‌های اختلاف بین کلاس‌های rows (سطر) و cols (ستون)"""
+    result = {f'{metric}_diff': cols[metric][None, :] - rows[metric][:, None]
+              for metric in DIFF_METRICS}
+    args = (rows['count'][:, None], rows['var'][:, None], cols['count'][None, :], cols['var'][None, :])
+    if effect_size:
+        result['cohen_d'] = _cohen_d(result['mean_diff'], *args)
+    if significance:
+        result['welch_t'] = _welch_t(result['mean_diff'], *args)
+        result['welch_df'] = _welch_df(*args)
+    return result
+
+
+def _rank_scores(rows, cols, metric):
+    """قدر مطلق فقط همان معیاری که جفت‌ها بر اساس آن مرتب می‌شوند"""
+    diff = cols['mean'][None, :] - rows['mean'][:, None]
+    if metric == 'mean_diff':
+        return np.abs(diff)
+    args = (rows['count'][:, None], rows['var'][:, None], cols['count'][None, :], cols['var'][None, :])
+    if metric == 'cohen_d':
+        return np.abs(_cohen_d(diff, *args))
+    return np.abs(_welch_t(diff, *args))
+
+
+def _add_pvalues(result):
+    result['p_value'] = np.where(result['welch_t'] != 0,
+                                 _t_pvalue(result['welch_t'], result['welch_df']), 1.0)
+    return result
+
+
+@profiled()
+def class_matrix(cube, subject, classes=None, effect_size=True, significance=True):
+    """ماتریس مقایسه همه کلاس‌ها در یک درس
+
+    خروجی شامل 'classes' (کلاس‌های دارای داده)، آمار هر کلاس و ماتریس‌های
+    mean_diff، median_diff، std_diff و iqr_diff است؛ در صورت درخواست
+    cohen_d (با انحراف معیار ادغام‌شده) و welch_t، welch_df و p_value
+    آزمون t ولش هم اضافه می‌شوند. اندازه ماتریس‌ها مربع تعداد کلاس‌هاست،
+    پس برای نقشه حرارتی تعداد محدودی کلاس مناسب است.
+    """
+    located = _class_columns(cube, subject, classes)
+    if located is None:
+        return None
+    codes, columns = located
+    result = _pair_statistics(columns, columns, effect_size, significance)
+    if significance:
+        _add_pvalues(result)
+    result['classes'] = [cube['classes'][c] for c in codes]
+    result['subject'] = subject
+    for metric in DIFF_METRICS + ['count']:
+        result[metric] = columns[metric]
+    return result
+
+
+def matrix_frame(matrix, key='mean_diff'):
+    """یک ماتریس مقایسه به صورت DataFrame با برچسب کلاس‌ها"""
+    return pd.DataFrame(matrix[key], index=matrix['classes'], columns=matrix['classes'])
+
+
+@profiled()
+def top_divergent_pairs(cube, subject, k=TOP_PAIRS, metric='cohen_d', classes=None,
+                        block=PAIR_BLOCK):
+    """k جفت کلاس با بیشترین اختلاف در یک درس
+
+    metric یکی از RANK_METRICS است و بر اساس قدر مطلق مرتب می‌شود. ماتریس
+    در بلوک‌های block سطری ساخته می‌شود تا حافظه برای هزاران کلاس محدود
+    بماند و در هر بلوک فقط k جفت برتر نگه داشته می‌شود.
+    """
+    if metric not in RANK_METRICS:
+        raise ValueError(f"معیار نامعتبر: {metric} (یکی از {', '.join(RANK_METRICS)})")
+    located = _class_columns(cube, subject, classes)
+    if located is None:
+        return pd.DataFrame()
+    codes, columns = located
+    size = len(codes)
+    step = max(1, block // max(size, 1))
+    best_rows = np.empty(0, dtype=np.intp)
+    best_cols = np.empty(0, dtype=np.intp)
+    best_scores = np.empty(0)
+    for start in range(0, size - 1, step):
+        # فقط ستون‌های بعد از start؛ بالای قطر اصلی در هر بلوک جدا حذف می‌شود
+        stop = min(start + step, size)
+        rows = {name: values[start:stop] for name, values in columns.items()}
+        cols = {name: values[start + 1:] for name, values in columns.items()}
+        scores = _rank_scores(rows, cols, metric)
+        scores[np.arange(stop - start)[:, None] > np.arange(size - start - 1)[None, :]] = -1.0
+        flat = scores.ravel()
+        keep = np.argpartition(-flat, k)[:k] if len(flat) > k else np.arange(len(flat))
+        keep = keep[flat[keep] >= 0]
+        r, c = np.divmod(keep, scores.shape[1])
+        best_rows = np.concatenate([best_rows, r + start])
+        best_cols = np.concatenate([best_cols, c + start + 1])
+        best_scores = np.concatenate([best_scores, flat[keep]])
+        if len(best_scores) > k:
+            keep = np.argpartition(-best_scores, k)[:k]
+            best_rows, best_cols, best_scores = best_rows[keep], best_cols[keep], best_scores[keep]
+
+    order = np.argsort(-best_scores, kind='stable')
+    best_rows, best_cols = best_rows[order], best_cols[order]
+    first = {name: values[best_rows] for name, values in columns.items()}
+    second = {name: values[best_cols] for name, values in columns.items()}
+    pairs = _add_pvalues(_pair_statistics(first, second, True, True))
+    diagonal = np.arange(len(best_rows))
+    classes = np.array(cube['classes'], dtype=object)
+    return pd.DataFrame({
+        'درس': subject,
+        'کلاس اول': classes[codes[best_rows]],
+        'کلاس دوم': classes[codes[best_cols]],
+        'میانگین اول': np.round(first['mean'], 2),
+        'میانگین دوم': np.round(second['mean'], 2),
+        'اختلاف میانگین': np.round(pairs['mean_diff'][diagonal, diagonal], 2),
+        'اختلاف انحراف معیار': np.round(pairs['std_diff'][diagonal, diagonal], 2),
+        'اختلاف IQR': np.round(pairs['iqr_diff'][diagonal, diagonal], 2),
+        "d کوهن": np.round(pairs['cohen_d'][diagonal, diagonal], 2),
+        'p-value': pairs['p_value'][diagonal, diagonal],
+    })
+
+
+def top_divergent_pairs_all(cube, subjects=None, k=TOP_PAIRS, metric='cohen_d', classes=None):
+    """k جفت پراختلاف هر درس در یک جدول"""
+    if subjects is None:
+        subjects = cube['subjects']
+    frames = [top_divergent_pairs(cube, subject, k, metric, classes) for subject in subjects]
+    frames = [frame for frame in frames if len(frame)]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
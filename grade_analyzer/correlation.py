@@ -0,0 +1,188 @@
+"""همبستگی نمرات دروس با یکدیگر، با معدل و با انضباط
+
+همه ضریب‌های پیرسون (درس × درس، در کل مدرسه و هر کلاس) از چند مجموع روی
+ماتریس نمرات به دست می‌آیند: برای هر جفت ستون تعداد ردیف‌هایی که هر دو نمره
+را دارند، مجموع‌ها و مجموع مربعات روی همان ردیف‌ها و مجموع حاصل‌ضرب‌ها.
+نمرات خالی به صورت دوبه‌دو کنار گذاشته می‌شوند (هر جفت فقط ردیف‌های مشترک
+خودش را می‌بیند). مجموع‌های هر کلاس با np.add.reduceat روی ردیف‌های مرتب
+بر اساس کلاس و بدون حلقه روی کلاس‌ها محاسبه می‌شوند.
+"""
+import numpy as np
+import pandas as pd
+
+from .cube import group_rows
+from .profiling import profiled
+from .ranking import GPA_COLUMN
+from .stats import CLASS_COLUMN, get_subject_columns, score_matrix
+
+DISCIPLINE_COLUMN = 'انضباط'
+
+# حداقل تعداد ردیف‌های مشترک برای گزارش ضریب همبستگی
+MIN_PAIRS = 5
+
+# تعداد ردیف‌های هر تکه در محاسبه مجموع‌های کلاس‌ها
+CHUNK_ROWS = 4096
+
+TARGET_COLUMNS = [GPA_COLUMN, DISCIPLINE_COLUMN]
+
+
+def correlation_columns(df):
+    """ستون‌های تحلیل همبستگی: دروس و در صورت وجود معدل و انضباط"""
+    columns = get_subject_columns(df)
+    return columns + [column for column in TARGET_COLUMNS if column in df.columns]
+
+
+def _segment_sums(present, filled, boundaries, sums, offset):
+    """مجموع‌های دوبه‌دو بخش‌های یک تکه از ردیف‌ها در sums از بخش offset به بعد"""
+    segments = slice(offset, offset + len(boundaries))
+    for i in range(present.shape[1]):
+        x = filled[:, i:i + 1]
+        sums['n'][segments, i] = np.add.reduceat(present[:, i:i + 1] * present, boundaries)
+        sums['sx'][segments, i] = np.add.reduceat(x * present, boundaries)
+        sums['sxx'][segments, i] = np.add.reduceat(x * x * present, boundaries)
+        sums['sxy'][segments, i] = np.add.reduceat(x * filled, boundaries)
+
+
+def _pair_sums(values, boundaries=None, chunk_rows=CHUNK_ROWS):
+    """مجموع‌های دوبه‌دو هر بخش از ردیف‌ها (بخش s از boundaries[s] تا بخش بعد)
+
+    خروجی آرایه‌های (بخش × ستون × ستون): n تعداد ردیف‌های مشترک، sx و sxx
+    مجموع و مجموع مربعات ستون i روی ردیف‌هایی که ستون j هم نمره دارد و sxy
+    مجموع حاصل‌ضرب‌ها. بدون boundaries همه ردیف‌ها یک بخش‌اند و مجموع‌ها با
+    ضرب ماتریسی به دست می‌آیند؛ در غیر این صورت ردیف‌ها در تکه‌هایی به اندازه
+    حدود chunk_rows (هم‌مرز با بخش‌ها) پردازش می‌شوند تا آرایه‌های موقت در
+    حافظه نهان پردازنده بمانند.
+    """
+    valid = ~np.isnan(values)
+    present = valid.astype(np.float64)
+    filled = np.where(valid, values, 0.0)
+    if boundaries is None:
+        return {
+            'n': (present.T @ present)[None],
+            'sx': (filled.T @ present)[None],
+            'sxx': ((filled * filled).T @ present)[None],
+            'sxy': (filled.T @ filled)[None],
+        }
+    n, m = values.shape
+    sums = {name: np.empty((len(boundaries), m, m)) for name in ('n', 'sx', 'sxx', 'sxy')}
+    cuts = np.unique(np.append(np.searchsorted(boundaries, np.arange(0, n, chunk_rows)), len(boundaries)))
+    for first, last in zip(cuts[:-1], cuts[1:]):
+        lo = boundaries[first]
+        hi = boundaries[last] if last < len(boundaries) else n
+        _segment_sums(present[lo:hi], filled[lo:hi], boundaries[first:last] - lo, sums, first)
+    return sums
+
+
+def _pearson(sums, min_pairs=MIN_PAIRS):
+    """ضریب پیرسون از مجموع‌های دوبه‌دو؛ NaN برای جفت‌های کم‌نمونه یا بدون پراکندگی"""
+    n, sx, sxx, sxy = sums['n'], sums['sx'], sums['sxx'], sums['sxy']
+    sy, syy = np.swapaxes(sx, 1, 2), np.swapaxes(sxx, 1, 2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = sxy - sx * sy / n
+        var_x = sxx - sx * sx / n
+        var_y = syy - sy * sy / n
+        r = cov / np.sqrt(var_x * var_y)
+    spread = (var_x > 1e-9 * np.maximum(sxx, 1)) & (var_y > 1e-9 * np.maximum(syy, 1))
+    return np.where((n >= min_pairs) & spread, np.clip(r, -1.0, 1.0), np.nan)
+
+
+@profiled()
+def build_correlations(df, cube=None, columns=None, min_pairs=MIN_PAIRS, class_column=CLASS_COLUMN):
+    """ماتریس‌های همبستگی کل مدرسه و هر کلاس
+
+    خروجی: 'columns'، 'classes'، 'school' (ستون × ستون)، 'class' (کلاس ×
+    ستون × ستون) و تعداد ردیف‌های مشترک هر جفت ('school_pairs' و
+    'class_pairs'). اگر مکعب آمار داده شود گروه‌بندی کلاس‌ها از آن خوانده
+    می‌شود.
+    """
+    if columns is None:
+        columns = correlation_columns(df)
+    columns = list(columns)
+    groups = cube if cube is not None else group_rows(df, class_column)
+    classes = list(groups['classes'])
+
+    matrix = score_matrix(df, columns)
+    # مرکز کردن ستون‌ها خطای گرد کردن مجموع مربعات را کم می‌کند
+    counts = np.count_nonzero(~np.isnan(matrix), axis=0)
+    matrix = matrix - np.nansum(matrix, axis=0) / np.maximum(counts, 1)
+
+    school = _pair_sums(matrix) if len(matrix) else None
+    rows = np.concatenate([groups['order'][start:end] for start, end in zip(groups['starts'], groups['ends'])]
+                          + [np.empty(0, dtype=np.intp)])
+    lengths = np.asarray(groups['ends']) - np.asarray(groups['starts'])
+    per_class = _pair_sums(matrix[rows], np.concatenate([[0], np.cumsum(lengths)[:-1]])) if classes else None
+
+    m = len(columns)
+    return {
+        'columns': columns,
+        'column_index': {column: j for j, column in enumerate(columns)},
+        'classes': classes,
+        'class_index': {name: c for c, name in enumerate(classes)},
+        'school': _pearson(school, min_pairs)[0] if school is not None else np.full((m, m), np.nan),
+        'school_pairs': school['n'][0].astype(np.int64) if school is not None else np.zeros((m, m), dtype=np.int64),
+        'class': _pearson(per_class, min_pairs) if classes else np.empty((0, m, m)),
+        'class_pairs': per_class['n'].astype(np.int64) if classes else np.empty((0, m, m), dtype=np.int64),
+    }
+
+
+def _scope(correlations, class_name):
+    if class_name is None:
+        return correlations['school'], correlations['school_pairs']
+    c = correlations['class_index'].get(class_name)
+    if c is None:
+        return None, None
+    return correlations['class'][c], correlations['class_pairs'][c]
+
+
+def correlation_frame(correlations, class_name=None):
+    """ماتریس همبستگی (کل مدرسه یا یک کلاس) به صورت DataFrame"""
+    values, _ = _scope(correlations, class_name)
+    if values is None:
+        return pd.DataFrame()
+    return pd.DataFrame(values, index=correlations['columns'], columns=correlations['columns'])
+
+
+def alignment_table(correlations, class_name=None, targets=TARGET_COLUMNS):
+    """همبستگی هر درس با معدل و انضباط و تعداد نمرات مشترک"""
+    values, pairs = _scope(correlations, class_name)
+    index = correlations['column_index']
+    targets = [target for target in targets if target in index]
+    subjects = [column for column in correlations['columns'] if column not in targets]
+    table = {'درس': subjects}
+    if values is not None:
+        rows = [index[subject] for subject in subjects]
+        for target in targets:
+            table[f'همبستگی با {target}'] = np.round(values[rows, index[target]], 3)
+            table[f'تعداد مشترک با {target}'] = pairs[rows, index[target]]
+    return pd.DataFrame(table)
+
+
+def class_alignment_table(correlations, column, target=GPA_COLUMN):
+    """همبستگی یک درس با معدل (یا ستون دیگر) در هر کلاس"""
+    index = correlations['column_index']
+    if column not in index or target not in index:
+        return pd.DataFrame(columns=['کلاس', 'همبستگی', 'تعداد مشترک'])
+    i, j = index[column], index[target]
+    return pd.DataFrame({
+        'کلاس': correlations['classes'],
+        'همبستگی': np.round(correlations['class'][:, i, j], 3),
+        'تعداد مشترک': correlations['class_pairs'][:, i, j],
+    })
+
+
+def strongest_pairs(correlations, k=10, class_name=None):
+    """k جفت درس با بیشترین همبستگی (قدر مطلق) در کل مدرسه یا یک کلاس"""
+    values, pairs = _scope(correlations, class_name)
+    columns = correlations['columns']
+    if values is None:
+        return pd.DataFrame(columns=['درس اول', 'درس دوم', 'همبستگی', 'تعداد مشترک'])
+    upper_i, upper_j = np.triu_indices(len(columns), 1)
+    r = values[upper_i, upper_j]
+    keep = np.flatnonzero(~np.isnan(r))
+    keep = keep[np.argsort(-np.abs(r[keep]), kind='stable')][:k]
+    return pd.DataFrame({
+        'درس اول': [columns[i] for i in upper_i[keep]],
+        'درس دوم': [columns[j] for j in upper_j[keep]],
+        'همبستگی': np.round(r[keep], 3),
+        'تعداد مشترک': pairs[upper_i[keep], upper_j[keep]],
+    })
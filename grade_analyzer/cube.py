@@ -0,0 +1,168 @@
+import numpy as np
+import pandas as pd
+
+from .parallel import balanced_ranges, parallel_map
+from .profiling import profiled
+from .stats import (
+    CLASS_COLUMN,
+    batch_iqr_statistics,
+    get_subject_columns,
+    score_dtype,
+    score_matrix,
+    stats_view,
+)
+
+# شاخص‌هایی که برای هر (کلاس، درس) به صورت آرایه دوبعدی نگه داشته می‌شوند
+CUBE_METRICS = ['count', 'mean', 'median', 'std', 'min', 'max', 'q1', 'q3', 'iqr',
+                'lower_bound', 'upper_bound', 'outlier_count', 'outlier_percent', 'valid']
+
+# فایل‌های کوچک‌تر از این تعداد ردیف موازی پردازش نمی‌شوند (هزینه راه‌اندازی کارگرها)
+PARALLEL_MIN_ROWS = 200_000
+
+
+def group_rows(df, class_column=CLASS_COLUMN):
+    """کد کلاس هر ردیف و بازه ردیف‌های هر کلاس پس از مرتب‌سازی پایدار"""
+    if class_column in df.columns:
+        codes, uniques = pd.factorize(df[class_column])
+        classes = uniques.tolist()
+    else:
+        codes, classes = np.full(len(df), -1), []
+
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    class_ids = np.arange(len(classes))
+    starts = np.searchsorted(sorted_codes, class_ids, side='left')
+    ends = np.searchsorted(sorted_codes, class_ids, side='right')
+    return {'codes': codes, 'classes': classes, 'order': order, 'starts': starts, 'ends': ends}
+
+
+def assemble_cube(subjects, groups, batches, overall, packed=None):
+    """ساخت دیکشنری مکعب از دسته‌های آماری هر کلاس و کل مدرسه
+
+    اگر دسته‌ها view روی آرایه‌های بسته‌بندی‌شده packed باشند همان آرایه‌ها
+    بدون کپی دوباره آرایه‌های مکعب می‌شوند.
+    """
+    classes = groups['classes']
+    cube = {
+        'subjects': subjects,
+        'classes': classes,
+        'subject_index': {subject: j for j, subject in enumerate(subjects)},
+        'class_index': {name: c for c, name in enumerate(classes)},
+        'order': groups['order'],
+        'starts': groups['starts'],
+        'ends': groups['ends'],
+        'batches': batches,
+        'overall': overall,
+    }
+    for metric in CUBE_METRICS:
+        if packed is not None:
+            cube[metric] = packed[metric]
+        elif batches:
+            cube[metric] = np.stack([batch[metric] for batch in batches])
+        else:
+            cube[metric] = np.empty((0, len(subjects)))
+    return cube
+
+
+# کلیدهای دسته آماری که برای هر ردیف (نه هر درس) مقدار دارند
+ROW_KEYS = ['sorted', 'outlier_mask']
+
+
+def pack_batches(batches):
+    """دسته‌های چند کلاس در چند آرایه پیوسته (برای فرستادن از کارگر با هزینه کم)"""
+    packed = {'sizes': np.array([len(batch['sorted']) for batch in batches], dtype=np.intp)}
+    for key in batches[0]:
+        stack = np.concatenate if key in ROW_KEYS else np.stack
+        packed[key] = stack([batch[key] for batch in batches])
+    return packed
+
+
+def concat_packed(chunks):
+    """ادغام چند مجموعه دسته بسته‌بندی‌شده (به ترتیب کلاس‌ها)"""
+    return {key: np.concatenate([packed[key] for packed in chunks]) for key in chunks[0]}
+
+
+def unpack_batches(packed):
+    """بازسازی دسته‌های هر کلاس به صورت view روی آرایه‌های پیوسته"""
+    bounds = np.concatenate([[0], np.cumsum(packed['sizes'])])
+    keys = [key for key in packed if key != 'sizes']
+    return [{key: packed[key][bounds[c]:bounds[c + 1]] if key in ROW_KEYS else packed[key][c]
+             for key in keys}
+            for c in range(len(packed['sizes']))]
+
+
+def _class_batches(shared, task):
+    """آمار بسته‌بندی‌شده کلاس‌های first تا last (کار یک کارگر موازی)"""
+    first, last = task
+    grouped, starts, ends = shared['grouped'], shared['starts'], shared['ends']
+    return pack_batches([batch_iqr_statistics(grouped[starts[c]:ends[c]]) for c in range(first, last)])
+
+
+@profiled()
+def build_stats_cube(df, subjects=None, class_column=CLASS_COLUMN, workers=1, kind=None):
+    """ساخت مکعب آمار (کلاس × درس) با یک مرتب‌سازی و یک گذر گروه‌بندی
+
+    ردیف‌ها یک بار بر اساس کد کلاس مرتب می‌شوند و آمار هر کلاس روی
+    بلوک پیوسته همان کلاس برای همه دروس با هم محاسبه می‌شود. با workers > 1
+    و فایل‌های بزرگ (حداقل PARALLEL_MIN_ROWS ردیف) کلاس‌ها در بازه‌های هم‌حجم
+    بین کارگرها تقسیم می‌شوند و ماتریس گروه‌بندی‌شده از حافظه مشترک خوانده
+    می‌شود.
+
+    برای کم کردن حافظه، نمرات float32 برگه (خروجی normalize_frame) با همان
+    نوع نگه داشته می‌شوند و دسته‌های کلاس‌ها در چند آرایه پیوسته بسته‌بندی
+    می‌شوند؛ آمار هر کلاس view روی سطر همان کلاس در آرایه‌های مکعب است.
+    """
+    if subjects is None:
+        subjects = get_subject_columns(df)
+    subjects = list(subjects)
+    matrix = score_matrix(df, subjects, score_dtype(df, subjects))
+    groups = group_rows(df, class_column)
+    grouped = np.asfortranarray(matrix[groups['order']])
+
+    if workers and workers > 1 and len(df) >= PARALLEL_MIN_ROWS:
+        shared = {'grouped': grouped, 'starts': groups['starts'], 'ends': groups['ends']}
+        ranges = balanced_ranges(groups['ends'] - groups['starts'], workers * 4)
+        packed = concat_packed(parallel_map(_class_batches, ranges, shared, workers, kind)) if ranges else None
+    else:
+        packed = _class_batches({'grouped': grouped, 'starts': groups['starts'], 'ends': groups['ends']},
+                                (0, len(groups['classes']))) if groups['classes'] else None
+    del grouped
+    batches = unpack_batches(packed) if packed is not None else []
+    return assemble_cube(subjects, groups, batches, batch_iqr_statistics(matrix), packed)
+
+
+def _locate(cube, subject, class_name=None):
+    """اندیس دسته آمار و ستون درس در مکعب"""
+    j = cube['subject_index'].get(subject)
+    if j is None:
+        return None, None
+    if class_name is None:
+        return cube['overall'], j
+    c = cube['class_index'].get(class_name)
+    if c is None:
+        return None, None
+    return cube['batches'][c], j
+
+
+def cube_stats(cube, subject, class_name=None):
+    """آمار یک درس در یک کلاس (یا کل مدرسه وقتی کلاس داده نشود)"""
+    batch, j = _locate(cube, subject, class_name)
+    if batch is None:
+        return None
+    return stats_view(batch, j)
+
+
+def cube_scores(cube, subject, class_name=None):
+    """نمرات مرتب‌شده و بدون مقدار خالی یک درس در یک کلاس"""
+    batch, j = _locate(cube, subject, class_name)
+    if batch is None:
+        return np.empty(0)
+    return batch['sorted'][:int(batch['count'][j]), j]
+
+
+def class_rows(cube, class_name):
+    """شماره ردیف‌های (موقعیتی) دانش‌آموزان یک کلاس"""
+    c = cube['class_index'].get(class_name)
+    if c is None:
+        return np.empty(0, dtype=np.intp)
+    return cube['order'][cube['starts'][c]:cube['ends'][c]]
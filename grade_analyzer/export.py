@@ -0,0 +1,192 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from .analysis import statistics_table
+from .profiling import profiled
+from .risk import _student_names
+
+XLSX_MIME = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# عنوان فارسی ستون‌های آمار هر (کلاس، درس)
+CLASS_STAT_COLUMNS = {
+    'count': 'تعداد',
+    'mean': 'میانگین',
+    'median': 'میانه',
+    'std': 'انحراف معیار',
+    'min': 'حداقل',
+    'max': 'حداکثر',
+    'q1': 'چارک اول',
+    'q3': 'چارک سوم',
+    'iqr': 'IQR',
+    'lower_bound': 'حد پایین',
+    'upper_bound': 'حد بالا',
+    'outlier_count': 'تعداد پرت',
+    'outlier_percent': 'درصد پرت',
+}
+OUTLIER_COLUMNS = ['نام', 'کلاس', 'درس', 'نمره', 'حد پایین', 'حد بالا', 'نوع']
+
+# حداکثر تعداد سطر هر شیت اکسل (با سطر عنوان)؛ جدول‌های بزرگ‌تر در چند شیت نوشته می‌شوند
+EXCEL_MAX_ROWS = 1_048_576
+
+
+def _column_values(series):
+    """مقادیر پایتونی یک ستون برای نوشتن در اکسل (خالی به جای NaN)"""
+    missing = series.isna().to_numpy()
+    values = series.tolist()
+    if missing.any():
+        for i in np.flatnonzero(missing):
+            values[i] = None
+    return values
+
+
+def _rows(frame):
+    """سطرهای یک DataFrame به صورت لیست مقادیر پایتونی"""
+    return zip(*[_column_values(frame[column]) for column in frame.columns])
+
+
+def _sheet_parts(sheets):
+    """تقسیم جدول‌های بزرگ‌تر از ظرفیت یک شیت به چند شیت با شماره بخش"""
+    rows_per_sheet = EXCEL_MAX_ROWS - 1
+    for title, frame in sheets:
+        parts = max(1, -(-len(frame) // rows_per_sheet))
+        for part in range(parts):
+            name = title if part == 0 else f'{title} ({part + 1})'
+            yield name, frame.iloc[part * rows_per_sheet:(part + 1) * rows_per_sheet]
+
+
+def _write_workbook(sheets, path):
+    """نوشتن جریانی شیت‌ها در فایل اکسل روی دیسک
+
+    با xlsxwriter در حالت constant_memory هر سطر بلافاصله روی دیسک نوشته
+    می‌شود (این حالت فقط با مسیر فایل کار می‌کند)؛ اگر نصب نباشد از حالت
+    write_only کتابخانه openpyxl استفاده می‌شود.
+    """
+    try:
+        import xlsxwriter
+    except ImportError:
+        xlsxwriter = None
+
+    if xlsxwriter is not None:
+        workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+        for title, frame in _sheet_parts(sheets):
+            sheet = workbook.add_worksheet(title)
+            sheet.right_to_left()
+            sheet.freeze_panes(1, 0)
+            sheet.write_row(0, 0, [str(column) for column in frame.columns])
+            for r, row in enumerate(_rows(frame), start=1):
+                sheet.write_row(r, 0, row)
+        workbook.close()
+        return
+
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for title, frame in _sheet_parts(sheets):
+        sheet = workbook.create_sheet(title=title)
+        sheet.sheet_view.rightToLeft = True
+        sheet.freeze_panes = 'A2'
+        sheet.append([str(column) for column in frame.columns])
+        for row in _rows(frame):
+            sheet.append(row)
+    workbook.save(path)
+
+
+def _write_sheets(sheets, out):
+    """نوشتن چند DataFrame در شیت‌های یک فایل اکسل (مسیر یا شیء فایل باینری)
+
+    برای شیء فایل (مثلاً BytesIO) کتاب ابتدا در یک فایل موقت نوشته و سپس
+    تکه‌تکه در out کپی می‌شود تا نوشتن سطرها جریانی بماند.
+    """
+    if isinstance(out, (str, os.PathLike)):
+        _write_workbook(sheets, out)
+        return out
+
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        _write_workbook(sheets, path)
+        with open(path, 'rb') as f:
+            shutil.copyfileobj(f, out)
+    finally:
+        os.remove(path)
+    return out
+
+
+def class_statistics_table(cube):
+    """جدول بلند آمار هر (کلاس، درس) از آرایه‌های مکعب"""
+    n_classes, n_subjects = len(cube['classes']), len(cube['subjects'])
+    columns = {
+        'کلاس': np.repeat(np.array(cube['classes'], dtype=object), n_subjects),
+        'درس': np.tile(np.array(cube['subjects'], dtype=object), n_classes),
+    }
+    valid = cube['valid'].ravel()
+    for metric, label in CLASS_STAT_COLUMNS.items():
+        values = cube[metric].ravel().astype(float)
+        if metric not in ('count', 'outlier_count', 'outlier_percent'):
+            values = np.where(valid, values, np.nan)
+        columns[label] = np.round(values, 2)
+    return pd.DataFrame(columns)
+
+
+def outlier_roster(df, cube):
+    """فهرست نمرات پرت هر دانش‌آموز نسبت به حدود IQR کلاس خودش"""
+    batches = cube['batches']
+    if not batches:
+        return pd.DataFrame(columns=OUTLIER_COLUMNS)
+    # ردیف‌های بلوک گروه‌بندی‌شده همه کلاس‌ها به ترتیب مکعب
+    mask = np.concatenate([batch['outlier_mask'] for batch in batches])
+    grouped_rows = np.concatenate([cube['order'][start:end]
+                                   for start, end in zip(cube['starts'], cube['ends'])])
+    class_codes = np.repeat(np.arange(len(batches)), cube['ends'] - cube['starts'])
+
+    positions, columns = np.nonzero(mask)
+    rows = grouped_rows[positions]
+    codes = class_codes[positions]
+    # فقط نمره‌های پرت از DataFrame خوانده می‌شوند
+    scores = np.empty(len(rows))
+    for j, subject in enumerate(cube['subjects']):
+        selected = columns == j
+        if selected.any():
+            scores[selected] = pd.to_numeric(df[subject].iloc[rows[selected]], errors='coerce')
+    lower = cube['lower_bound'][codes, columns]
+    upper = cube['upper_bound'][codes, columns]
+
+    order = np.lexsort((scores, columns, codes))
+    rows, codes, columns = rows[order], codes[order], columns[order]
+    scores, lower, upper = scores[order], lower[order], upper[order]
+    return pd.DataFrame({
+        'نام': _student_names(df, rows),
+        'کلاس': np.array(cube['classes'], dtype=object)[codes],
+        'درس': np.array(cube['subjects'], dtype=object)[columns],
+        'نمره': scores,
+        'حد پایین': np.round(lower, 2),
+        'حد بالا': np.round(upper, 2),
+        'نوع': np.where(scores < lower, 'کمتر از حد پایین', 'بیشتر از حد بالا'),
+    }, columns=OUTLIER_COLUMNS)
+
+
+@profiled()
+def statistics_excel(analyses, out):
+    """نوشتن جدول آمار دروس در یک فایل اکسل (مسیر یا شیء فایل باینری)"""
+    return _write_sheets([('آمار دروس', statistics_table(analyses))], out)
+
+
+@profiled()
+def export_workbook(df, cube, analyses, out, at_risk=None):
+    """خروجی کامل اکسل در چند شیت از آمار از پیش محاسبه‌شده
+
+    آمار از مکعب و تحلیل‌های کش‌شده خوانده می‌شود و چیزی دوباره محاسبه
+    نمی‌شود. شیت‌ها: آمار دروس، آمار کلاس‌ها، دانش‌آموزان نیازمند حمایت
+    (اگر داده شود) و نمرات پرت هر کلاس.
+    """
+    sheets = [('آمار دروس', statistics_table(analyses))]
+    if cube['classes']:
+        sheets.append(('آمار کلاس‌ها', class_statistics_table(cube)))
+    if at_risk is not None:
+        sheets.append(('نیازمند حمایت', at_risk))
+    sheets.append(('نمرات پرت', outlier_roster(df, cube)))
+    return _write_sheets(sheets, out)
@@ -0,0 +1,356 @@
+"""انبار چندترمی نمرات در SQLite برای پرسش‌های روند
+
+هر ترم یک بار وارد می‌شود و نمرات به صورت (دانش‌آموز، درس، ترم) با کلید
+اصلی و اندیس‌های کلاس/ترم نگه داشته می‌شوند. آمار هر (ترم، کلاس، درس)
+هنگام ورود از مکعب آمار محاسبه و ذخیره می‌شود تا مقایسه کلاس‌ها بدون
+پیمایش نمرات خام انجام شود.
+"""
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .cube import build_stats_cube
+from .ingest import SCORE_LIKE_COLUMNS
+from .stats import CLASS_COLUMN, STUDENT_ID_COLUMNS, get_subject_columns, score_matrix
+
+# مسیر پیش‌فرض فایل پایگاه داده
+HISTORY_DB = os.environ.get('GRADE_ANALYZER_HISTORY_DB', 'grade_history.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS terms (
+    term_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    ordinal INTEGER NOT NULL,
+    file_hash TEXT,
+    imported_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS students (
+    student_id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    first_name TEXT,
+    last_name TEXT
+);
+CREATE TABLE IF NOT EXISTS classes (
+    class_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS subjects (
+    subject_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS enrollments (
+    term_id INTEGER NOT NULL,
+    student_id INTEGER NOT NULL,
+    class_id INTEGER,
+    PRIMARY KEY (term_id, student_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS scores (
+    student_id INTEGER NOT NULL,
+    subject_id INTEGER NOT NULL,
+    term_id INTEGER NOT NULL,
+    class_id INTEGER,
+    score REAL NOT NULL,
+    PRIMARY KEY (student_id, subject_id, term_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS scores_term_class ON scores (term_id, class_id, subject_id);
+CREATE INDEX IF NOT EXISTS scores_term_subject ON scores (term_id, subject_id);
+CREATE INDEX IF NOT EXISTS enrollments_class ON enrollments (class_id, term_id);
+CREATE TABLE IF NOT EXISTS class_stats (
+    term_id INTEGER NOT NULL,
+    class_id INTEGER NOT NULL,
+    subject_id INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    mean REAL,
+    median REAL,
+    std REAL,
+    PRIMARY KEY (term_id, class_id, subject_id)
+) WITHOUT ROWID;
+"""
+
+
+def _key_value(value):
+    if value is None or (np.isscalar(value) and pd.isna(value)):
+        return None
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    text = str(value).strip()
+    return text or None
+
+
+def key_text(series):
+    """متن یکسان یک ستون شناسه یا کلاس در همه ترم‌ها (آرایه object)
+
+    عدد صحیحی که pandas به خاطر یک خانه خالی float خوانده (1234.0) همان
+    '1234' می‌شود و خانه‌های خالی None هستند؛ متن‌ها (مثل کد ملی با صفر
+    ابتدایی) دست نمی‌خورند.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = np.append(key_text(pd.Series(series.cat.categories)), None)
+        # کد ‎-1 (خانه خالی) به None آخر آرایه می‌رسد
+        return categories[series.cat.codes.to_numpy()]
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return series.astype(str).to_numpy(dtype=object)
+    return np.array([_key_value(value) for value in series.to_numpy(dtype=object)], dtype=object)
+
+
+def student_keys(df):
+    """کلید یکتای هر ردیف: شناسه دانش‌آموز یا در نبود آن «نام|نام خانوادگی|کلاس»
+
+    بدون ستون شناسه، دانش‌آموز فقط تا وقتی کلاسش عوض نشده (مثلاً ترم‌های
+    یک سال تحصیلی) قابل پیگیری است. ردیف بدون شناسه (یا بدون نام) کلید
+    None دارد.
+    """
+    for column in STUDENT_ID_COLUMNS:
+        if column in df.columns:
+            return key_text(df[column])
+    first, last = key_text(df['نام']), key_text(df['نام خانوادگی'])
+    parts = [first, last]
+    if CLASS_COLUMN in df.columns:
+        parts.append(key_text(df[CLASS_COLUMN]))
+    keys = np.array(['|'.join(part or '' for part in row) for row in zip(*parts)], dtype=object)
+    keys[pd.isna(first) & pd.isna(last)] = None
+    return keys
+
+
+class HistoryStore:
+    """انبار نمرات ترم‌ها روی یک فایل SQLite (قابل استفاده از چند thread)"""
+
+    def __init__(self, path=None):
+        self.path = path or HISTORY_DB
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _ids(self, table, id_column, names):
+        """شناسه عددی نام‌ها در یک جدول مرجع (با درج نام‌های جدید)"""
+        names = list(dict.fromkeys(names))
+        self._conn.executemany(f'INSERT OR IGNORE INTO {table} (name) VALUES (?)',
+                               [(name,) for name in names])
+        rows = self._conn.execute(f'SELECT name, {id_column} FROM {table}').fetchall()
+        return dict(rows)
+
+    def ingest_term(self, df, term, ordinal=None, file_hash=None):
+        """ورود نمرات یک ترم؛ ورود دوباره همان ترم جایگزین داده قبلی می‌شود
+
+        ordinal ترتیب زمانی ترم‌هاست (پیش‌فرض: بعد از آخرین ترم). خروجی
+        تعداد دانش‌آموز، نمره، کلیدهای تکراری و ردیف‌های بدون شناسه (که ثبت
+        نمی‌شوند) این ترم است.
+        """
+        subjects = get_subject_columns(df) + [c for c in SCORE_LIKE_COLUMNS if c in df.columns]
+        keys = student_keys(df)
+        present = np.flatnonzero(pd.notna(keys))
+        # از کلیدهای تکراری فقط آخرین ردیف نگه داشته می‌شود
+        _, last = np.unique(keys[present][::-1].astype(str), return_index=True)
+        rows = np.sort(present[len(present) - 1 - last])
+        duplicates = len(present) - len(rows)
+
+        matrix = score_matrix(df, subjects)[rows]
+        class_names = (key_text(df[CLASS_COLUMN])[rows]
+                       if CLASS_COLUMN in df.columns else np.full(len(rows), None, dtype=object))
+        cube = build_stats_cube(df.iloc[rows], subjects)
+
+        with self._lock, self._conn:
+            conn = self._conn
+            existing = conn.execute('SELECT term_id, ordinal FROM terms WHERE name = ?', (term,)).fetchone()
+            if ordinal is None:
+                ordinal = existing[1] if existing else conn.execute(
+                    'SELECT COALESCE(MAX(ordinal), 0) + 1 FROM terms').fetchone()[0]
+            if existing:
+                term_id = existing[0]
+                for table in ('scores', 'enrollments', 'class_stats'):
+                    conn.execute(f'DELETE FROM {table} WHERE term_id = ?', (term_id,))
+                conn.execute('UPDATE terms SET ordinal = ?, file_hash = ?, imported_at = ? WHERE term_id = ?',
+                             (ordinal, file_hash, datetime.now().isoformat(timespec='seconds'), term_id))
+            else:
+                term_id = conn.execute(
+                    'INSERT INTO terms (name, ordinal, file_hash, imported_at) VALUES (?, ?, ?, ?)',
+                    (term, ordinal, file_hash, datetime.now().isoformat(timespec='seconds'))).lastrowid
+
+            first = df['نام'].astype(str).to_numpy()[rows] if 'نام' in df.columns else keys[rows]
+            last_names = (df['نام خانوادگی'].astype(str).to_numpy()[rows]
+                          if 'نام خانوادگی' in df.columns else np.full(len(rows), ''))
+            conn.executemany('INSERT OR IGNORE INTO students (key, first_name, last_name) VALUES (?, ?, ?)',
+                             zip(keys[rows].tolist(), first.tolist(), last_names.tolist()))
+            student_map = dict(conn.execute('SELECT key, student_id FROM students'))
+            student_ids = np.array([student_map[key] for key in keys[rows]], dtype=np.int64)
+            subject_map = self._ids('subjects', 'subject_id', subjects)
+            class_map = self._ids('classes', 'class_id', [c for c in class_names if c is not None])
+            class_ids = np.array([class_map.get(c) for c in class_names], dtype=object)
+
+            conn.executemany('INSERT INTO enrollments (term_id, student_id, class_id) VALUES (?, ?, ?)',
+                             ((term_id, s, c) for s, c in zip(student_ids.tolist(), class_ids.tolist())))
+
+            r, j = np.nonzero(~np.isnan(matrix))
+            subject_ids = np.array([subject_map[s] for s in subjects], dtype=np.int64)
+            conn.executemany(
+                'INSERT INTO scores (student_id, subject_id, term_id, class_id, score) VALUES (?, ?, ?, ?, ?)',
+                zip(student_ids[r].tolist(), subject_ids[j].tolist(), [term_id] * len(r),
+                    class_ids[r].tolist(), matrix[r, j].tolist()))
+
+            stats_rows = []
+            cube_classes = key_text(pd.Series(cube['classes'], dtype=object))
+            for c, class_name in enumerate(cube_classes):
+                if class_name not in class_map:
+                    continue
+                for jj, subject in enumerate(subjects):
+                    count = int(cube['count'][c, jj])
+                    if count:
+                        valid = bool(cube['valid'][c, jj])
+                        stats_rows.append((term_id, class_map[class_name], subject_map[subject], count,
+                                           float(cube['mean'][c, jj]),
+                                           float(cube['median'][c, jj]) if valid else None,
+                                           float(cube['std'][c, jj]) if valid else None))
+            conn.executemany('INSERT INTO class_stats VALUES (?, ?, ?, ?, ?, ?, ?)', stats_rows)
+
+        return {'term': term, 'students': len(rows), 'scores': len(r), 'duplicates': duplicates,
+                'missing_keys': len(keys) - len(present)}
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=params)
+
+    def terms(self):
+        """فهرست ترم‌ها به ترتیب زمانی"""
+        return self._query('SELECT name, ordinal, file_hash, imported_at FROM terms ORDER BY ordinal')
+
+    def delete_term(self, term):
+        with self._lock, self._conn:
+            row = self._conn.execute('SELECT term_id FROM terms WHERE name = ?', (term,)).fetchone()
+            if row is None:
+                return False
+            for table in ('scores', 'enrollments', 'class_stats', 'terms'):
+                self._conn.execute(f'DELETE FROM {table} WHERE term_id = ?', row)
+            return True
+
+    def student_history(self, student_key):
+        """نمرات یک دانش‌آموز در همه ترم‌ها (سطر: درس، ستون: ترم)"""
+        df = self._query("""
+            SELECT t.name AS term, t.ordinal, sub.name AS subject, s.score
+            FROM scores s
+            JOIN students st ON st.student_id = s.student_id
+            JOIN terms t ON t.term_id = s.term_id
+            JOIN subjects sub ON sub.subject_id = s.subject_id
+            WHERE st.key = ?
+        """, (student_key,))
+        if df.empty:
+            return pd.DataFrame()
+        order = df.drop_duplicates('term').sort_values('ordinal')['term'].tolist()
+        return df.pivot(index='subject', columns='term', values='score')[order]
+
+    def classes(self, term=None):
+        """نام کلاس‌های ثبت‌شده (همه ترم‌ها یا یک ترم)"""
+        if term is None:
+            df = self._query('SELECT name FROM classes ORDER BY name')
+        else:
+            df = self._query("""
+                SELECT DISTINCT c.name FROM enrollments e
+                JOIN terms t ON t.term_id = e.term_id AND t.name = ?
+                JOIN classes c ON c.class_id = e.class_id
+                ORDER BY c.name
+            """, (term,))
+        return df['name'].tolist()
+
+    def student_deltas(self, term_from, term_to, subject=None, class_name=None, limit=None,
+                       ascending=True):
+        """تغییر نمره هر دانش‌آموز بین دو ترم، مرتب از بیشترین افت
+
+        با subject فقط یک درس و با class_name فقط دانش‌آموزان آن کلاس در
+        ترم مقصد بررسی می‌شوند. با ascending=False بیشترین پیشرفت اول است.
+        """
+        filters, params = [], [term_to, term_from]
+        if subject is not None:
+            filters.append('sub.name = ?')
+            params.append(subject)
+        if class_name is not None:
+            filters.append('c.name = ?')
+            params.append(class_name)
+        where = ''.join(f' AND {condition}' for condition in filters)
+        sql = f"""
+            SELECT st.first_name || ' ' || st.last_name AS name, st.key AS student_key,
+                   c.name AS class, sub.name AS subject,
+                   a.score AS score_from, b.score AS score_to, b.score - a.score AS delta
+            FROM terms ta
+            JOIN terms tb ON tb.name = ?
+            JOIN scores a ON a.term_id = ta.term_id
+            JOIN scores b ON b.student_id = a.student_id AND b.subject_id = a.subject_id
+                          AND b.term_id = tb.term_id
+            JOIN students st ON st.student_id = a.student_id
+            JOIN subjects sub ON sub.subject_id = a.subject_id
+            LEFT JOIN classes c ON c.class_id = b.class_id
+            WHERE ta.name = ?{where}
+            ORDER BY delta {'ASC' if ascending else 'DESC'}
+        """
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(int(limit))
+        return self._query(sql, params)
+
+    def cohort_progression(self, class_name, base_term, subject=None):
+        """میانگین نمرات دانش‌آموزان یک کلاس (در ترم پایه) در همه ترم‌ها
+
+        گروه با دانش‌آموزان کلاس در ترم پایه ثابت می‌ماند، حتی اگر بعداً
+        کلاسشان عوض شود. خروجی: سطر ترم، ستون درس.
+        """
+        sql = """
+            SELECT t.name AS term, t.ordinal, sub.name AS subject,
+                   AVG(s.score) AS mean, COUNT(*) AS count
+            FROM enrollments e
+            JOIN terms bt ON bt.term_id = e.term_id AND bt.name = ?
+            JOIN classes c ON c.class_id = e.class_id AND c.name = ?
+            JOIN scores s ON s.student_id = e.student_id
+            JOIN terms t ON t.term_id = s.term_id
+            JOIN subjects sub ON sub.subject_id = s.subject_id
+        """
+        params = [base_term, class_name]
+        if subject is not None:
+            sql += ' WHERE sub.name = ?'
+            params.append(subject)
+        sql += ' GROUP BY s.term_id, s.subject_id'
+        df = self._query(sql, params)
+        if df.empty:
+            return pd.DataFrame()
+        order = df.drop_duplicates('term').sort_values('ordinal')['term'].tolist()
+        return df.pivot(index='term', columns='subject', values='mean').loc[order]
+
+    def class_drops(self, term_from, term_to, subject=None, limit=10):
+        """کلاس‌هایی که بیشترین افت میانگین را بین دو ترم داشته‌اند
+
+        از آمار ذخیره‌شده هر (ترم، کلاس، درس) استفاده می‌شود؛ کلاس‌ها با نام
+        یکسان در دو ترم تطبیق داده می‌شوند.
+        """
+        sql = """
+            SELECT c.name AS class, sub.name AS subject,
+                   a.mean AS mean_from, b.mean AS mean_to, b.mean - a.mean AS delta,
+                   a.count AS count_from, b.count AS count_to
+            FROM terms ta
+            JOIN terms tb ON tb.name = ?
+            JOIN class_stats a ON a.term_id = ta.term_id
+            JOIN class_stats b ON b.term_id = tb.term_id AND b.class_id = a.class_id
+                               AND b.subject_id = a.subject_id
+            JOIN classes c ON c.class_id = a.class_id
+            JOIN subjects sub ON sub.subject_id = a.subject_id
+            WHERE ta.name = ?
+        """
+        params = [term_to, term_from]
+        if subject is not None:
+            sql += ' AND sub.name = ?'
+            params.append(subject)
+        sql += ' ORDER BY delta ASC LIMIT ?'
+        params.append(int(limit))
+        return self._query(sql, params)
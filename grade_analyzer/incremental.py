@@ -0,0 +1,280 @@
+"""به‌روزرسانی افزایشی مکعب آمار وقتی نسخه اصلاح‌شده همان فایل بارگذاری شود
+
+ردیف‌های دو نسخه با هش ستون‌های شناسه دانش‌آموز (و شماره تکرار همان
+شناسه) تطبیق داده می‌شوند. برای هر (کلاس، درس) که فقط چند نمره‌اش عوض شده، میانگین و
+واریانس با جمع‌های جاری و چارک‌ها با درج/حذف در ستون مرتب‌شده به‌روز
+می‌شوند؛ کلاس‌هایی که ترکیب ردیف‌هایشان عوض شده دوباره محاسبه می‌شوند و
+بقیه بدون تغییر از مکعب قبلی برداشته می‌شوند.
+"""
+import numpy as np
+import pandas as pd
+
+from .cube import CUBE_METRICS, assemble_cube, build_stats_cube, group_rows
+from .profiling import profiled
+from .stats import (
+    CLASS_COLUMN,
+    MIN_COUNT,
+    STUDENT_ID_COLUMNS,
+    _half_median,
+    batch_iqr_statistics,
+    score_dtype,
+    score_matrix,
+)
+
+# اگر بیش از این نسبت از ردیف‌ها عوض شده باشد، مکعب از ابتدا ساخته می‌شود
+MAX_CHANGED_SHARE = 0.5
+
+
+def _identity_columns(df):
+    """ستون‌هایی که یک دانش‌آموز را مشخص می‌کنند (همان منطق student_keys)"""
+    for column in STUDENT_ID_COLUMNS:
+        if column in df.columns:
+            return [column]
+    return [c for c in ('نام', 'نام خانوادگی', CLASS_COLUMN) if c in df.columns]
+
+
+def _row_hashes(df, columns):
+    """هش ۶۴ بیتی ستون‌های شناسه هر ردیف"""
+    if not columns:
+        return np.arange(len(df), dtype=np.uint64)
+    return pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+
+
+def _align_rows(old_hashes, new_hashes):
+    """شماره ردیف قدیمی هر ردیف جدید (‎-1 برای ردیف اضافه‌شده)
+
+    ردیف‌های با شناسه تکراری به ترتیب تکرارشان با هم تطبیق داده می‌شوند.
+    """
+    if np.array_equal(old_hashes, new_hashes):
+        return np.arange(len(new_hashes))
+    old_keys, new_keys = pd.Series(old_hashes), pd.Series(new_hashes)
+    old_index = pd.MultiIndex.from_arrays([old_keys, old_keys.groupby(old_keys).cumcount()])
+    new_index = pd.MultiIndex.from_arrays([new_keys, new_keys.groupby(new_keys).cumcount()])
+    return old_index.get_indexer(new_index)
+
+
+def _class_values(df):
+    if CLASS_COLUMN in df.columns:
+        return df[CLASS_COLUMN].to_numpy(dtype=object)
+    return np.full(len(df), '', dtype=object)
+
+
+@profiled()
+def diff_frames(old_df, new_df, subjects):
+    """تفاوت سطری و سلولی دو نسخه یک فایل نمرات
+
+    خروجی شامل نگاشت ردیف‌های جدید به ردیف‌های قدیمی (‎-1 برای ردیف اضافه‌شده)،
+    ردیف‌های حذف‌شده، ردیف‌هایی که کلاسشان عوض شده، سلول‌های تغییرکرده و
+    نام دروس و کلاس‌های متأثر است.
+    """
+    subjects = list(subjects)
+    schema_changed = list(old_df.columns) != list(new_df.columns)
+    columns = _identity_columns(new_df)
+    if columns != _identity_columns(old_df):
+        row_map = np.full(len(new_df), -1)
+    else:
+        row_map = _align_rows(_row_hashes(old_df, columns), _row_hashes(new_df, columns))
+    matched = np.flatnonzero(row_map >= 0)
+    unmatched = np.ones(len(old_df), dtype=bool)
+    unmatched[row_map[matched]] = False
+    removed = np.flatnonzero(unmatched)
+    added = np.flatnonzero(row_map < 0)
+
+    old_classes, new_classes = _class_values(old_df), _class_values(new_df)
+    moved = matched[old_classes[row_map[matched]] != new_classes[matched]]
+
+    cell_rows = cell_cols = np.empty(0, dtype=np.intp)
+    old_values = new_values = np.empty(0)
+    if not schema_changed and len(matched):
+        old_block = score_matrix(old_df, subjects)[row_map[matched]]
+        new_block = score_matrix(new_df, subjects)[matched]
+        both_nan = np.isnan(old_block) & np.isnan(new_block)
+        changed = (old_block != new_block) & ~both_nan
+        r, cell_cols = np.nonzero(changed)
+        cell_rows = matched[r]
+        old_values, new_values = old_block[r, cell_cols], new_block[r, cell_cols]
+
+    changed_subjects = subjects if schema_changed else sorted({subjects[j] for j in cell_cols.tolist()})
+    affected = np.concatenate([new_classes[cell_rows], new_classes[added], new_classes[moved],
+                               old_classes[removed], old_classes[row_map[moved]]])
+    return {
+        'subjects': subjects,
+        'schema_changed': schema_changed,
+        'row_map': row_map,
+        'added': added,
+        'removed': removed,
+        'moved': moved,
+        'cell_rows': cell_rows,
+        'cell_cols': cell_cols,
+        'old_values': old_values,
+        'new_values': new_values,
+        'changed_subjects': changed_subjects,
+        'changed_classes': sorted({str(name) for name in affected.tolist()} - {''}),
+    }
+
+
+def has_changes(diff):
+    return bool(diff['schema_changed'] or len(diff['added']) or len(diff['removed'])
+                or len(diff['moved']) or len(diff['cell_rows']))
+
+
+def changed_cells_table(diff, new_df, limit=None):
+    """جدول سلول‌های تغییرکرده: نام، کلاس، درس، نمره قبلی و نمره جدید"""
+    rows = diff['cell_rows'][:limit]
+    if 'نام' in new_df.columns and 'نام خانوادگی' in new_df.columns:
+        names = (new_df['نام'].astype(str).iloc[rows].to_numpy() + ' '
+                 + new_df['نام خانوادگی'].astype(str).iloc[rows].to_numpy())
+    else:
+        names = np.full(len(rows), '-', dtype=object)
+    return pd.DataFrame({
+        'نام': names,
+        'کلاس': _class_values(new_df)[rows],
+        'درس': np.array(diff['subjects'], dtype=object)[diff['cell_cols'][:limit]],
+        'نمره قبلی': diff['old_values'][:limit],
+        'نمره جدید': diff['new_values'][:limit],
+    })
+
+
+def _running_sums(batch):
+    """جمع و جمع مربعات هر ستون (یک بار از ستون‌های مرتب‌شده محاسبه می‌شود)"""
+    if 'sum' not in batch:
+        sorted_matrix = batch['sorted'].astype(np.float64)
+        batch['sum'] = np.nansum(sorted_matrix, axis=0)
+        batch['sumsq'] = np.nansum(sorted_matrix ** 2, axis=0)
+    return batch['sum'], batch['sumsq']
+
+
+def _patch_column(batch, j, block_column, old_values, new_values):
+    """به‌روزرسانی آمار ستون j یک دسته پس از تغییر چند نمره
+
+    batch باید کپی قابل تغییر باشد. block_column نمرات جدید همان ردیف‌های
+    دسته به ترتیب دسته است و فقط برای ماسک نمرات پرت استفاده می‌شود.
+    """
+    total, total_sq = _running_sums(batch)
+    n = int(batch['count'][j])
+    column = batch['sorted'][:n, j]
+
+    # ستون مرتب‌شده به عنوان ساختار آماره ترتیبی: حذف و درج با جستجوی دودویی
+    removed = np.sort(old_values[~np.isnan(old_values)])
+    inserted = np.sort(new_values[~np.isnan(new_values)])
+    if len(removed):
+        # مقادیر تکراری به خانه‌های پشت سر هم همان مقدار نگاشت می‌شوند
+        repeat = np.arange(len(removed)) - np.searchsorted(removed, removed, side='left')
+        column = np.delete(column, np.searchsorted(column, removed, side='left') + repeat)
+    column = np.insert(column, np.searchsorted(column, inserted), inserted)
+    total[j] += inserted.sum() - removed.sum()
+    total_sq[j] += (inserted ** 2).sum() - (removed ** 2).sum()
+
+    n = len(column)
+    batch['sorted'][:, j] = np.nan
+    batch['sorted'][:n, j] = column
+    count = np.array([n])
+    sorted_col = batch['sorted'][:, [j]]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total[j] / max(n, 1)
+        variance = max(total_sq[j] / max(n, 1) - mean * mean, 0.0)
+        half = count // 2
+        median = _half_median(sorted_col, 0, count)[0]
+        q1 = _half_median(sorted_col, 0, half)[0]
+        q3 = _half_median(sorted_col, count - half, half)[0]
+        iqr = q3 - q1
+        lower, upper = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+        outliers = ~np.isnan(block_column) & ((block_column < lower) | (block_column > upper))
+
+    ok = n >= MIN_COUNT
+    batch['valid'][j] = ok
+    batch['count'][j] = n
+    batch['mean'][j] = mean
+    batch['std'][j] = np.sqrt(variance)
+    batch['median'][j] = median
+    batch['q1'][j], batch['q3'][j], batch['iqr'][j] = q1, q3, iqr
+    batch['lower_bound'][j], batch['upper_bound'][j] = lower, upper
+    batch['min'][j] = column[0] if n else np.nan
+    batch['max'][j] = column[-1] if n else np.nan
+    batch['outlier_mask'][:, j] = outliers & ok
+    outlier_count = int(outliers.sum())
+    batch['outlier_count'][j] = outlier_count if ok else 0
+    batch['outlier_percent'][j] = outlier_count / max(n, 1) * 100 if ok else 0.0
+
+
+def _patched_batch(batch, block, cols, old_values, new_values):
+    """کپی یک دسته با ستون‌های تغییرکرده به‌روزشده (block نمرات جدید ردیف‌های دسته)"""
+    batch = {key: value.copy() for key, value in batch.items()}
+    # نمره‌ای که در float32 دقیق نمی‌گنجد ستون‌های مرتب‌شده را float64 می‌کند
+    sorted_dtype = batch['sorted'].dtype
+    if sorted_dtype != np.float64 and not np.array_equal(
+            new_values.astype(sorted_dtype).astype(np.float64), new_values, equal_nan=True):
+        batch['sorted'] = batch['sorted'].astype(np.float64)
+    for j in np.unique(cols):
+        selected = cols == j
+        _patch_column(batch, j, block[:, j], old_values[selected], new_values[selected])
+    return batch
+
+
+@profiled()
+def update_cube(cube, new_df, diff):
+    """مکعب آمار نسخه جدید با بازمحاسبه فقط کلاس‌ها و دروس تغییرکرده
+
+    خروجی (مکعب، آمار کار انجام‌شده) است. اگر ستون‌ها عوض شده باشند یا
+    بیشتر ردیف‌ها تغییر کرده باشند مکعب از ابتدا ساخته می‌شود.
+    """
+    subjects = cube['subjects']
+    row_map = diff['row_map']
+    changed_rows = (len(diff['added']) + len(diff['removed']) + len(diff['moved'])
+                    + len(np.unique(diff['cell_rows'])))
+    if diff['schema_changed'] or changed_rows > MAX_CHANGED_SHARE * max(len(new_df), 1):
+        new_cube = build_stats_cube(new_df, None if diff['schema_changed'] else subjects)
+        return new_cube, {'rebuilt': True, 'reused': 0, 'patched': 0,
+                          'recomputed': len(new_cube['classes'])}
+
+    matrix = score_matrix(new_df, subjects, score_dtype(new_df, subjects))
+    # اگر هیچ ردیفی اضافه، حذف یا جابه‌جا نشده باشد گروه‌بندی قبلی معتبر است
+    same_layout = (len(row_map) == len(cube['overall']['outlier_mask'])
+                   and np.array_equal(row_map, np.arange(len(row_map)))
+                   and not len(diff['moved']))
+    if same_layout:
+        groups = {key: cube[key] for key in ('classes', 'order', 'starts', 'ends')}
+        codes = np.full(len(new_df), -1, dtype=np.intp)
+        for c in range(len(groups['classes'])):
+            codes[groups['order'][groups['starts'][c]:groups['ends'][c]]] = c
+    else:
+        groups = group_rows(new_df)
+        codes = groups['codes']
+
+    # سلول‌های تغییرکرده به تفکیک کلاس نسخه جدید
+    cells_by_class = pd.Series(np.arange(len(diff['cell_rows']))).groupby(
+        codes[diff['cell_rows']]).indices
+
+    batches, patched = [], []
+    work = {'rebuilt': False, 'reused': 0, 'patched': 0, 'recomputed': 0}
+    for c, class_name in enumerate(groups['classes']):
+        rows = groups['order'][groups['starts'][c]:groups['ends'][c]]
+        old_c = c if same_layout else cube['class_index'].get(class_name)
+        if not same_layout and (old_c is None or not np.array_equal(
+                row_map[rows], cube['order'][cube['starts'][old_c]:cube['ends'][old_c]])):
+            batches.append(batch_iqr_statistics(np.asfortranarray(matrix[rows])))
+            patched.append(c)
+            work['recomputed'] += 1
+            continue
+
+        cells = cells_by_class.get(c)
+        if cells is None:
+            batches.append(cube['batches'][old_c])
+            work['reused'] += 1
+            continue
+        batches.append(_patched_batch(cube['batches'][old_c], matrix[rows], diff['cell_cols'][cells],
+                                      diff['old_values'][cells], diff['new_values'][cells]))
+        patched.append(c)
+        work['patched'] += 1
+
+    if same_layout:
+        overall = _patched_batch(cube['overall'], matrix, diff['cell_cols'],
+                                 diff['old_values'], diff['new_values'])
+        # فقط سطرهای کلاس‌های تغییرکرده در آرایه‌های مکعب بازنویسی می‌شوند
+        new_cube = dict(cube, batches=batches, overall=overall)
+        for metric in CUBE_METRICS:
+            new_cube[metric] = cube[metric].copy()
+            for c in patched:
+                new_cube[metric][c] = batches[c][metric]
+        return new_cube, work
+    return assemble_cube(subjects, groups, batches, batch_iqr_statistics(matrix)), work
@@ -0,0 +1,239 @@
+import logging
+import os
+import tempfile
+import time
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from .cache import content_hash
+from .profiling import profiled, record
+from .stats import NON_SUBJECT_COLUMNS
+
+# محل نگهداری snapshot های ستونی فایل‌های بارگذاری‌شده
+SNAPSHOT_DIR = os.environ.get(
+    'GRADE_ANALYZER_SNAPSHOT_DIR',
+    os.path.join(tempfile.gettempdir(), 'grade_analyzer_snapshots'),
+)
+
+# حداکثر حجم کل snapshot ها (مگابایت)؛ snapshot هایی که مدت بیشتری استفاده نشده‌اند حذف می‌شوند
+SNAPSHOT_MAX_MB = int(os.environ.get('GRADE_ANALYZER_SNAPSHOT_MB', '1024'))
+
+# فایل‌های موقت نیمه‌کاره قدیمی‌تر از این (ثانیه) حذف می‌شوند
+STALE_TMP_SECONDS = 3600
+
+# ستون‌های متنی تکراری که به صورت categorical نگه داشته می‌شوند
+CATEGORICAL_COLUMNS = ['کلاس', 'نام', 'نام خانوادگی', 'حروفی', 'متنمعدل']
+
+# ستون‌های عددی غیر درسی که مثل نمره ذخیره می‌شوند
+SCORE_LIKE_COLUMNS = ['معدل', 'انضباط', 'جمع']
+
+# تعداد ردیف هر تکه در خواندن جریانی CSV
+CSV_CHUNK_ROWS = 50_000
+
+logger = logging.getLogger(__name__)
+
+
+def _feather():
+    """ماژول feather از pyarrow (در صورت نصب بودن)"""
+    try:
+        from pyarrow import feather
+    except ImportError:
+        return None
+    return feather
+
+
+def _is_score_column(col):
+    return col not in NON_SUBJECT_COLUMNS or col in SCORE_LIKE_COLUMNS
+
+
+def _to_float32(series):
+    """تبدیل ستون نمره به float32 وقتی بدون از دست رفتن دقت ممکن باشد"""
+    if not pd.api.types.is_numeric_dtype(series):
+        numeric = pd.to_numeric(series, errors='coerce')
+        if numeric.notna().sum() != series.notna().sum():
+            # ستون واقعاً متنی است؛ فقط نوع آن یکدست می‌شود
+            return series.astype('string')
+        series = numeric
+    values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    compact = values.astype(np.float32)
+    lossless = np.array_equal(compact.astype(np.float64), values, equal_nan=True)
+    return pd.Series(compact if lossless else values, index=series.index, name=series.name)
+
+
+def normalize_frame(df):
+    """یکسان‌سازی نوع ستون‌ها: نمرات float32 و ستون‌های متنی categorical"""
+    df = df.copy()
+    for col in df.columns:
+        if col in CATEGORICAL_COLUMNS:
+            df[col] = df[col].astype('category')
+        elif _is_score_column(col):
+            df[col] = _to_float32(df[col])
+    return df
+
+
+def read_csv_stream(buffer, chunk_rows=CSV_CHUNK_ROWS):
+    """خواندن جریانی CSV به صورت تکه‌تکه"""
+    chunks = []
+    for chunk in pd.read_csv(buffer, chunksize=chunk_rows, encoding='utf-8-sig'):
+        # کاهش حجم هر تکه پیش از نگه داشتن آن در حافظه
+        for col in chunk.columns:
+            if _is_score_column(col) and col not in CATEGORICAL_COLUMNS:
+                if pd.api.types.is_float_dtype(chunk[col]):
+                    chunk[col] = _to_float32(chunk[col])
+        chunks.append(chunk)
+    if not chunks:
+        return pd.DataFrame()
+    return pd.concat(chunks, ignore_index=True)
+
+
+def parse_upload(data, filename):
+    """تبدیل محتوای فایل بارگذاری‌شده به DataFrame"""
+    if filename.lower().endswith('.csv'):
+        return read_csv_stream(BytesIO(data))
+    return pd.read_excel(BytesIO(data))
+
+
+def snapshot_path(file_hash, snapshot_dir=None):
+    """مسیر snapshot ستونی یک فایل"""
+    return os.path.join(snapshot_dir or SNAPSHOT_DIR, f'{file_hash}.feather')
+
+
+def write_snapshot(df, path):
+    """نوشتن snapshot با فرمت Feather (Arrow IPC) بدون فشرده‌سازی تا خواندن آن بدون رمزگشایی باشد"""
+    feather = _feather()
+    if feather is None:
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        feather.write_feather(df, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return True
+
+
+def read_snapshot(path):
+    """بارگذاری سریع snapshot در یک DataFrame مستقل
+
+    ستون‌ها در حافظه pandas کپی می‌شوند (نمای صفرکپی روی فایل نیست): memory-map
+    فقط خواندن فایل را بدون بافر میانی انجام می‌دهد. DataFrame حاصل قابل
+    تغییر است و به باز ماندن فایل وابسته نیست، پس prune_snapshots می‌تواند
+    فایل را پاک کند.
+    """
+    feather = _feather()
+    if feather is None or not os.path.exists(path):
+        return None
+    df = feather.read_table(path, memory_map=True).to_pandas()
+    # زمان تغییر فایل نشان آخرین استفاده است (برای prune_snapshots)
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return df
+
+
+def prune_snapshots(snapshot_dir=None, max_bytes=SNAPSHOT_MAX_MB * 1024 * 1024, keep=()):
+    """حذف snapshot هایی که مدت بیشتری استفاده نشده‌اند تا حجم کل از max_bytes بیشتر نشود
+
+    فایل‌های موقت نیمه‌کاره قدیمی هم حذف می‌شوند. مسیرهای keep حذف نمی‌شوند.
+    خروجی تعداد فایل‌های حذف‌شده است.
+    """
+    snapshot_dir = snapshot_dir or SNAPSHOT_DIR
+    try:
+        entries = list(os.scandir(snapshot_dir))
+    except FileNotFoundError:
+        return 0
+    now = time.time()
+    keep = {os.path.abspath(path) for path in keep}
+    snapshots, doomed = [], []
+    for entry in entries:
+        try:
+            info = entry.stat()
+        except FileNotFoundError:
+            continue
+        if entry.name.endswith('.tmp'):
+            if now - info.st_mtime > STALE_TMP_SECONDS:
+                doomed.append(entry.path)
+        elif entry.name.endswith('.feather'):
+            snapshots.append((info.st_mtime, info.st_size, entry.path))
+
+    total = sum(size for _, size, _ in snapshots)
+    for _, size, path in sorted(snapshots):
+        if total <= max_bytes:
+            break
+        if os.path.abspath(path) not in keep:
+            doomed.append(path)
+            total -= size
+
+    removed = 0
+    for path in doomed:
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def remove_snapshot(file_hash, snapshot_dir=None):
+    """حذف snapshot یک فایل تا دفعه بعد دوباره پردازش شود"""
+    try:
+        os.remove(snapshot_path(file_hash, snapshot_dir))
+        return True
+    except FileNotFoundError:
+        return False
+
+
+@profiled()
+def ingest_upload(data, filename, file_hash=None, snapshot_dir=None):
+    """خواندن فایل نمرات با استفاده از snapshot ستونی در صورت وجود
+
+    خروجی شامل DataFrame نرمال‌شده، هش فایل، منبع داده (snapshot یا فایل)
+    و زمان هر مرحله بر حسب ثانیه است.
+    """
+    timings = {}
+    start = time.perf_counter()
+    if file_hash is None:
+        file_hash = content_hash(data)
+        timings['hash'] = time.perf_counter() - start
+
+    path = snapshot_path(file_hash, snapshot_dir)
+    start = time.perf_counter()
+    df = read_snapshot(path)
+    if df is not None:
+        timings['snapshot_read'] = time.perf_counter() - start
+        source = 'snapshot'
+    else:
+        start = time.perf_counter()
+        df = parse_upload(data, filename)
+        timings['parse'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        df = normalize_frame(df)
+        timings['normalize'] = time.perf_counter() - start
+
+        # snapshot فقط بهینه‌سازی است؛ اگر نوشته نشود همان DataFrame خوانده‌شده استفاده می‌شود
+        start = time.perf_counter()
+        try:
+            written = write_snapshot(df, path)
+        except Exception as e:
+            logger.warning("snapshot فایل %s نوشته نشد: %s: %s", filename, type(e).__name__, e)
+            written = False
+        if written:
+            timings['snapshot_write'] = time.perf_counter() - start
+            prune_snapshots(snapshot_dir, keep=[path])
+        source = 'file'
+
+    for stage, seconds in timings.items():
+        record(f'ingest.{stage}', seconds, rows=len(df), cols=len(df.columns))
+    return {
+        'frame': df,
+        'hash': file_hash,
+        'source': source,
+        'timings': timings,
+    }
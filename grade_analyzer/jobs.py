@@ -0,0 +1,248 @@
+"""صف کارهای پس‌زمینه برای تحلیل‌ها و خروجی‌های طولانی
+
+کارها در یک thread pool جدا از thread اجرای اسکریپت streamlit اجرا
+می‌شوند، پس اجرای دوباره صفحه (با تغییر هر ویجت) کار نیمه‌تمام را از بین
+نمی‌برد. هر کار با کلید نتیجه‌اش (مثل کلیدهای کش) ثبت می‌شود و درخواست
+دوباره همان کلید از هر نشستی به همان کار می‌رسد. وضعیت کارهای تمام‌شده تا
+سقف MAX_FINISHED_JOBS کار نگه داشته می‌شود؛ اگر صف به کش تحلیل وصل باشد
+نتیجه‌ها با همان کلید در کش ذخیره می‌شوند و در سقف حافظه آن حساب می‌شوند.
+
+هر نشست با شناسه owner به کار می‌پیوندد و لغو یک نشست فقط آن نشست را جدا
+می‌کند؛ کار وقتی واقعاً متوقف می‌شود که نشست دیگری منتظر آن نباشد.
+
+تابع کار یک آرگومان progress(fraction, message=None) می‌گیرد که پیشرفت را
+ثبت می‌کند و اگر لغو کار درخواست شده باشد JobCancelled می‌اندازد.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# تعداد کارهایی که هم‌زمان اجرا می‌شوند
+DEFAULT_JOB_WORKERS = int(os.environ.get('GRADE_ANALYZER_JOB_WORKERS', '2'))
+MAX_FINISHED_JOBS = 32
+
+FINISHED_STATES = ('done', 'failed', 'cancelled')
+
+_MISSING = object()
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    """کار به درخواست کاربر لغو شد"""
+
+
+class Job:
+    """وضعیت یک کار: pending، running، done، failed یا cancelled"""
+
+    def __init__(self, key, label=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.label = label
+        self.state = 'pending'
+        self.progress = 0.0
+        self.message = None
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.cancel_requested = False
+        self.future = None
+        self.owners = set()
+
+    @property
+    def done(self):
+        return self.state in FINISHED_STATES
+
+    def report(self, fraction, message=None):
+        """ثبت پیشرفت (بین 0 و 1)؛ نقطه بررسی لغو کار هم هست"""
+        if self.cancel_requested:
+            raise JobCancelled()
+        self.progress = min(max(float(fraction), 0.0), 1.0)
+        if message is not None:
+            self.message = message
+
+    def elapsed(self):
+        """زمان اجرای کار تا پایان (یا تا الان) به ثانیه"""
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def info(self):
+        return {
+            'id': self.id,
+            'label': self.label,
+            'state': self.state,
+            'progress': self.progress,
+            'message': self.message,
+            'error': self.error,
+            'seconds': round(self.elapsed(), 2),
+        }
+
+
+def stage_progress(progress, start, end, message=None):
+    """تبدیل پیشرفت (done, total) یک مرحله به بازه start تا end کل کار"""
+    def report(done, total):
+        progress(start + (end - start) * done / max(total, 1), message)
+    return report
+
+
+class JobQueue:
+    """صف کارهای پس‌زمینه با شناسه کار، قابل اشتراک بین نشست‌های هم‌زمان
+
+    کاری که با کلید تکراری ثبت شود دوباره اجرا نمی‌شود و شناسه کار قبلی
+    (در حال اجرا یا تمام‌شده) برگردانده می‌شود. کارهای ناموفق یا لغوشده فقط
+    با retry از نو اجرا می‌شوند و کار تمام‌شده فقط وقتی نتیجه‌اش از کش حذف
+    شده باشد.
+    """
+
+    def __init__(self, workers=DEFAULT_JOB_WORKERS, max_finished=MAX_FINISHED_JOBS, cache=None):
+        self.max_finished = max_finished
+        self.cache = cache
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers),
+                                            thread_name_prefix='grade-analyzer-job')
+        self._jobs = OrderedDict()
+        self._by_key = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, func, label=None, owner=None, retry=False):
+        """ثبت کار func(progress) با کلید key و برگرداندن شناسه کار"""
+        with self._lock:
+            job = self._by_key.get(key)
+            if job is not None and not self._rerun(job, retry):
+                if owner is not None:
+                    job.owners.add(owner)
+                self._jobs.move_to_end(job.id)
+                return job.id
+            job = Job(key, label)
+            if owner is not None:
+                job.owners.add(owner)
+            self._jobs[job.id] = job
+            self._by_key[key] = job
+            job.future = self._executor.submit(self._run, job, func)
+            self._evict()
+        return job.id
+
+    def _run(self, job, func):
+        if job.cancel_requested:
+            job.state = 'cancelled'
+            job.finished = time.time()
+            return
+        job.state = 'running'
+        job.started = time.time()
+        try:
+            self._keep_result(job, self._compute(job, func))
+            job.progress = 1.0
+            job.state = 'done'
+        except JobCancelled:
+            job.state = 'cancelled'
+        except Exception as e:
+            logger.exception("کار %s ناموفق بود", job.label or job.id)
+            job.error = f"{type(e).__name__}: {e}"
+            job.state = 'failed'
+        finally:
+            job.finished = time.time()
+            with self._lock:
+                self._evict()
+
+    def get(self, job_id):
+        """کار با این شناسه (یا None اگر وجود نداشته یا حذف شده باشد)"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def find(self, key):
+        """آخرین کار ثبت‌شده با این کلید"""
+        with self._lock:
+            return self._by_key.get(key)
+
+    def result(self, job_id, default=None):
+        """نتیجه کار تمام‌شده (default اگر تمام نشده یا نتیجه از کش حذف شده باشد)"""
+        job = self.get(job_id)
+        if job is None or job.state != 'done':
+            return default
+        if self.cache is None or job.result is not None:
+            return job.result
+        return self.cache.get(job.key, default)
+
+    def wait(self, job_id, timeout=None):
+        """انتظار تا پایان کار (برای خط فرمان و آزمایش)"""
+        job = self.get(job_id)
+        if job is not None:
+            try:
+                job.future.result(timeout)
+            except Exception:
+                pass
+        return job
+
+    def cancel(self, job_id, owner=None):
+        """درخواست لغو؛ کار در حال اجرا در نقطه بعدی گزارش پیشرفت متوقف می‌شود
+
+        با owner فقط همان نشست از کار جدا می‌شود و اگر نشست دیگری منتظر
+        کار باشد اجرای آن ادامه پیدا می‌کند.
+        """
+        job = self.get(job_id)
+        if job is None or job.done:
+            return False
+        if owner is not None:
+            with self._lock:
+                job.owners.discard(owner)
+                if job.owners:
+                    return True
+        job.cancel_requested = True
+        if job.future.cancel():
+            job.state = 'cancelled'
+            job.finished = time.time()
+        return True
+
+    def jobs(self):
+        """وضعیت همه کارها از جدیدترین"""
+        with self._lock:
+            items = list(self._jobs.values())
+        return [job.info() for job in reversed(items)]
+
+    def shutdown(self, wait=False):
+        for job in list(self._jobs.values()):
+            job.cancel_requested = True
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _rerun(self, job, retry):
+        """آیا کار قبلی همین کلید باید از نو اجرا شود"""
+        if job.state in ('failed', 'cancelled'):
+            return retry
+        return job.state == 'done' and not self._has_result(job)
+
+    def _has_result(self, job):
+        return self.cache is None or job.result is not None or job.key in self.cache
+
+    def _compute(self, job, func):
+        """نتیجه موجود در کش یا اجرای func؛ نتیجه فقط یک بار و در _keep_result در کش نوشته می‌شود"""
+        if self.cache is not None:
+            result = self.cache.get(job.key, _MISSING)
+            if result is not _MISSING:
+                return result
+        return func(job.report)
+
+    def _keep_result(self, job, result):
+        """نتیجه در کش؛ نتیجه‌ای که از کل سقف کش بزرگ‌تر است فقط روی آخرین کار می‌ماند"""
+        if self.cache is None:
+            job.result = result
+            return
+        if job.key not in self.cache:
+            self.cache.put(job.key, result)
+        if job.key not in self.cache:
+            with self._lock:
+                for other in self._jobs.values():
+                    other.result = None
+            job.result = result
+
+    def _evict(self):
+        finished = [job for job in self._jobs.values() if job.done]
+        for job in finished[:max(len(finished) - self.max_finished, 0)]:
+            del self._jobs[job.id]
+            if self._by_key.get(job.key) is job:
+                del self._by_key[job.key]
@@ -0,0 +1,155 @@
+"""اجرای موازی تحلیل‌ها در process pool یا thread pool
+
+آرایه‌های عددی مشترک (ماتریس نمرات، کد کلاس‌ها و ...) یک بار در حافظه
+مشترک (multiprocessing.shared_memory) کپی می‌شوند و هر کارگر فقط نام بلوک
+را می‌گیرد؛ DataFrame و آرایه‌ها برای هر کار pickle نمی‌شوند. بقیه داده‌های
+مشترک یک بار هنگام شروع هر کارگر فرستاده می‌شوند.
+
+تعداد کارگرها و نوع pool با GRADE_ANALYZER_WORKERS و GRADE_ANALYZER_POOL
+(process یا thread) قابل تنظیم است.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+POOL_KINDS = ('process', 'thread')
+
+# داده‌های مشترک هر پردازه کارگر (یک بار در شروع کارگر مقداردهی می‌شود)
+_worker_shared = {}
+# بلوک‌های حافظه مشترکی که کارگر به آن‌ها وصل است
+_attached = []
+
+
+def default_workers():
+    """تعداد کارگرها از GRADE_ANALYZER_WORKERS (پیش‌فرض: تعداد هسته‌ها)"""
+    value = os.environ.get('GRADE_ANALYZER_WORKERS')
+    return max(1, int(value)) if value else os.cpu_count() or 1
+
+
+def default_pool_kind():
+    """نوع pool از GRADE_ANALYZER_POOL (پیش‌فرض: process)"""
+    kind = os.environ.get('GRADE_ANALYZER_POOL', 'process')
+    if kind not in POOL_KINDS:
+        raise ValueError(f"نوع pool نامعتبر: {kind} (یکی از {', '.join(POOL_KINDS)})")
+    return kind
+
+
+def _shareable(value):
+    return isinstance(value, np.ndarray) and value.dtype != object and value.size > 0
+
+
+class SharedArrays:
+    """کپی آرایه‌های عددی در حافظه مشترک تا پایان بلوک with
+
+    خروجی __enter__ مشخصات قابل pickle بلوک‌هاست که attach_arrays در
+    کارگر از آن آرایه‌ها را بدون کپی می‌سازد.
+    """
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.blocks = []
+
+    def __enter__(self):
+        spec = {}
+        try:
+            for name, array in self.arrays.items():
+                order = 'F' if array.flags.f_contiguous and not array.flags.c_contiguous else 'C'
+                block = shared_memory.SharedMemory(create=True, size=array.nbytes)
+                self.blocks.append(block)
+                view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf, order=order)
+                view[...] = array
+                spec[name] = (block.name, array.shape, array.dtype.str, order)
+        except BaseException:
+            self.__exit__(None, None, None)
+            raise
+        return spec
+
+    def __exit__(self, *exc):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+
+def attach_arrays(spec):
+    """آرایه‌های یک مشخصات SharedArrays (فقط‌خواندنی و بدون کپی)"""
+    arrays = {}
+    for name, (block_name, shape, dtype, order) in spec.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _attached.append(block)
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf, order=order)
+        array.flags.writeable = False
+        arrays[name] = array
+    return arrays
+
+
+def _init_worker(spec, extras):
+    _worker_shared.clear()
+    _worker_shared.update(extras)
+    _worker_shared.update(attach_arrays(spec))
+
+
+def _run_task(payload):
+    func, task = payload
+    return func(_worker_shared, task)
+
+
+def _collect(results, total, progress, executor=None):
+    """جمع نتایج به ترتیب و گزارش تعداد کارهای تمام‌شده به progress(done, total)"""
+    collected = []
+    try:
+        for result in results:
+            collected.append(result)
+            if progress is not None:
+                progress(len(collected), total)
+    except BaseException:
+        # کارهای شروع‌نشده لغو می‌شوند (مثلاً وقتی progress لغو کار را اعلام کند)
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    return collected
+
+
+def parallel_map(func, tasks, shared=None, workers=None, kind=None, chunksize=1, progress=None):
+    """اجرای func(shared, task) برای همه کارها و برگرداندن نتایج به ترتیب
+
+    func باید تابع سطح ماژول باشد. در process pool آرایه‌های عددی shared از
+    حافظه مشترک خوانده می‌شوند؛ در thread pool و اجرای تک‌کارگره خود shared
+    به func داده می‌شود. progress(done, total) پس از رسیدن هر نتیجه صدا زده
+    می‌شود.
+    """
+    tasks = list(tasks)
+    shared = shared or {}
+    workers = min(workers or default_workers(), len(tasks))
+    if workers <= 1:
+        return _collect((func(shared, task) for task in tasks), len(tasks), progress)
+
+    kind = kind or default_pool_kind()
+    if kind == 'thread':
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return _collect(executor.map(lambda task: func(shared, task), tasks),
+                            len(tasks), progress, executor)
+
+    arrays = {name: value for name, value in shared.items() if _shareable(value)}
+    extras = {name: value for name, value in shared.items() if name not in arrays}
+    context = multiprocessing.get_context('spawn')
+    with SharedArrays(arrays) as spec:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker, initargs=(spec, extras)) as executor:
+            return _collect(executor.map(_run_task, [(func, task) for task in tasks], chunksize=chunksize),
+                            len(tasks), progress, executor)
+
+
+def balanced_ranges(sizes, parts):
+    """تقسیم اندیس‌های پشت‌سرهم به حداکثر parts بازه با مجموع sizes نزدیک به هم"""
+    sizes = np.asarray(sizes)
+    if not len(sizes):
+        return []
+    cumulative = np.cumsum(sizes)
+    targets = cumulative[-1] * np.arange(1, parts) / parts
+    cuts = np.unique(np.concatenate([[0], np.searchsorted(cumulative, targets, side='right'),
+                                     [len(sizes)]]))
+    return [(int(start), int(end)) for start, end in zip(cuts[:-1], cuts[1:]) if end > start]
@@ -0,0 +1,210 @@
+"""اندازه‌گیری زمان و حافظه مراحل تحلیل
+
+با متغیر محیطی GRADE_ANALYZER_PROFILE روشن می‌شود:
+    1       زمان هر مرحله، تعداد ردیف/ستون و بیشینه RSS پردازه
+    memory  به علاوه بیشینه حافظه تخصیص‌یافته در هر مرحله (tracemalloc، کندتر)
+
+هر مرحله یک رکورد JSON در logger «grade_analyzer.profile» می‌نویسد و
+رکوردها در یک بافر مشترک (با قفل) برای نمایش در برنامه نگه داشته می‌شوند،
+پس مراحل اجراشده در کارگرهای صف کارها و parallel_map هم دیده می‌شوند.
+تو در تو بودن مراحل برای هر thread جداست و نام thread در رکورد ثبت می‌شود. وقتی خاموش است profiled تابع را بدون تغییر برمی‌گرداند و span یک
+context manager خالی است، پس هزینه‌ای ندارد.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from functools import wraps
+
+PROFILE_MODE = os.environ.get('GRADE_ANALYZER_PROFILE', '').strip().lower()
+ENABLED = PROFILE_MODE not in ('', '0', 'false', 'off')
+TRACE_MEMORY = PROFILE_MODE == 'memory'
+MAX_RECORDS = 10_000
+
+logger = logging.getLogger('grade_analyzer.profile')
+
+_local = threading.local()
+_lock = threading.Lock()
+_buffer = deque(maxlen=MAX_RECORDS)
+_next_seq = 0
+_disabled_span = nullcontext()
+
+
+def _setup():
+    if TRACE_MEMORY:
+        import tracemalloc
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+
+if ENABLED:
+    _setup()
+
+
+def _peak_rss_mb():
+    """بیشینه RSS پردازه (مگابایت)؛ در سیستم‌های بدون resource برابر None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # لینوکس کیلوبایت و macOS بایت گزارش می‌کند
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _state():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+        _local.since = 0
+    return _local
+
+
+def start_run(name=None):
+    """شروع یک اجرای جدید (مثلاً یک بار اجرای اسکریپت streamlit)؛ رکوردهای قبلی دیگر برنگردانده می‌شوند"""
+    state = _state()
+    with _lock:
+        state.since = _next_seq
+    state.stack = []
+    state.run = name
+    state.run_start = time.perf_counter()
+
+
+def records():
+    """رکوردهای ثبت‌شده از شروع اجرای جاری این thread، از همه threadها"""
+    since = _state().since
+    with _lock:
+        return [record for seq, record in _buffer if seq >= since]
+
+
+def _emit(record):
+    global _next_seq
+    state = _state()
+    if getattr(state, 'run', None):
+        record['run'] = state.run
+    record['thread'] = threading.current_thread().name
+    with _lock:
+        _buffer.append((_next_seq, record))
+        _next_seq += 1
+    logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+
+def _shape_fields(value):
+    """تعداد ردیف و ستون یک DataFrame یا آرایه"""
+    shape = getattr(value, 'shape', None)
+    if shape is None or not isinstance(shape, tuple) or not shape:
+        return {}
+    fields = {'rows': int(shape[0])}
+    if len(shape) > 1:
+        fields['cols'] = int(shape[1])
+    return fields
+
+
+class _Span:
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+
+    def set(self, **fields):
+        """افزودن اطلاعات به رکورد این مرحله (مثلاً تعداد ردیف پس از خواندن)"""
+        self.fields.update(fields)
+
+    def __enter__(self):
+        state = _state()
+        self.parent = state.stack[-1] if state.stack else None
+        state.stack.append(self)
+        if TRACE_MEMORY:
+            import tracemalloc
+
+            current, peak = tracemalloc.get_traced_memory()
+            if self.parent is not None:
+                self.parent.seen = max(self.parent.seen, peak)
+            tracemalloc.reset_peak()
+            self.base = self.seen = current
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        state = _state()
+        state.stack.pop()
+        record = {
+            'span': self.name,
+            'parent': self.parent.name if self.parent else None,
+            'depth': len(state.stack),
+            'ms': round(elapsed * 1000, 3),
+            **self.fields,
+            'rss_peak_mb': _peak_rss_mb(),
+        }
+        if TRACE_MEMORY:
+            import tracemalloc
+
+            self.seen = max(self.seen, tracemalloc.get_traced_memory()[1])
+            record['alloc_peak_mb'] = round((self.seen - self.base) / 1024 / 1024, 2)
+            if self.parent is not None:
+                self.parent.seen = max(self.parent.seen, self.seen)
+        if exc_type is not None:
+            record['error'] = exc_type.__name__
+        _emit(record)
+        return False
+
+
+def span(name, **fields):
+    """context manager اندازه‌گیری یک مرحله؛ در حالت خاموش بدون هزینه"""
+    if not ENABLED:
+        return _disabled_span
+    return _Span(name, fields)
+
+
+def record(name, seconds, **fields):
+    """ثبت مرحله‌ای که زمانش جداگانه اندازه‌گیری شده است"""
+    if not ENABLED:
+        return
+    state = _state()
+    parent = state.stack[-1] if state.stack else None
+    _emit({
+        'span': name,
+        'parent': parent.name if parent else None,
+        'depth': len(state.stack),
+        'ms': round(seconds * 1000, 3),
+        **fields,
+    })
+
+
+def profiled(name=None):
+    """دکوراتور اندازه‌گیری یک تابع؛ تعداد ردیف/ستون اولین آرگومان هم ثبت می‌شود
+
+    در حالت خاموش خود تابع بدون wrapper برگردانده می‌شود.
+    """
+    def decorator(func):
+        if not ENABLED:
+            return func
+        label = name or f'{func.__module__.rsplit(".", 1)[-1]}.{func.__name__}'
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Span(label, _shape_fields(args[0]) if args else {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def summary(items=None):
+    """جمع زمان هر مرحله در اجرای جاری: {نام: {'calls', 'ms', 'max_ms'}}"""
+    totals = {}
+    for item in records() if items is None else items:
+        entry = totals.setdefault(item['span'], {'calls': 0, 'ms': 0.0, 'max_ms': 0.0})
+        entry['calls'] += 1
+        entry['ms'] += item['ms']
+        entry['max_ms'] = max(entry['max_ms'], item['ms'])
+    return totals
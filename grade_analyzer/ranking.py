@@ -0,0 +1,202 @@
+"""شاخص رتبه و صدک دانش‌آموزان در هر درس
+
+برای هر درس (و معدل) یک بار ترتیب نزولی نمرات کل مدرسه و هر کلاس با
+argsort/lexsort ساخته می‌شود و رتبه و صدک هر دانش‌آموز از همان ترتیب به دست
+می‌آید. بعد از آن جدول برترین‌ها با O(k) و کارنامه رتبه یک دانش‌آموز با
+O(تعداد دروس) و بدون مرتب‌سازی دوباره خوانده می‌شود.
+
+رتبه‌ها به روش رقابتی‌اند (نمرات برابر رتبه برابر دارند: ۱، ۲، ۲، ۴) و
+صدک هر نمره سهم نمرات کمتر به اضافه نصف نمرات برابر است. دانش‌آموز بدون نمره
+رتبه 0 و صدک NaN دارد.
+"""
+import numpy as np
+import pandas as pd
+
+from .cube import group_rows
+from .profiling import profiled
+from .stats import CLASS_COLUMN, get_subject_columns, score_matrix
+
+# ستون معدل که در کنار دروس رتبه‌بندی می‌شود
+GPA_COLUMN = 'معدل'
+TOP_K = 10
+
+RANK_SCOPES = ('school', 'class')
+
+
+def rank_columns(df):
+    """ستون‌های رتبه‌بندی: دروس و در صورت وجود معدل"""
+    columns = get_subject_columns(df)
+    if GPA_COLUMN in df.columns:
+        columns.append(GPA_COLUMN)
+    return columns
+
+
+def _segment_ranks(sorted_scores, segment_starts, valid_counts):
+    """رتبه و صدک نمرات مرتب‌شده (نزولی) در بخش‌های پشت‌سرهم
+
+    segment_starts برای هر خانه شروع بخش آن و valid_counts تعداد نمرات
+    معتبر همان بخش است؛ نمرات خالی انتهای هر بخش هستند.
+    """
+    n = len(sorted_scores)
+    positions = np.arange(n)
+    new_group = np.ones(n, dtype=bool)
+    new_group[1:] = ((sorted_scores[1:] != sorted_scores[:-1])
+                     | (segment_starts[1:] != segment_starts[:-1]))
+    group_start = np.maximum.accumulate(np.where(new_group, positions, 0))
+    group_id = np.cumsum(new_group) - 1
+    equal = np.bincount(group_id)[group_id]
+
+    rank = group_start - segment_starts + 1
+    below = valid_counts - (rank - 1) - equal
+    with np.errstate(invalid='ignore', divide='ignore'):
+        percentile = (below + equal / 2) / valid_counts * 100
+    missing = np.isnan(sorted_scores)
+    return np.where(missing, 0, rank), np.where(missing, np.nan, percentile)
+
+
+def _scatter(order, values, dtype):
+    """برگرداندن مقادیر ترتیب مرتب‌شده به ترتیب ردیف‌ها"""
+    result = np.empty(len(order), dtype=dtype)
+    result[order] = values
+    return result
+
+
+@profiled()
+def build_rank_index(df, cube=None, columns=None, class_column=CLASS_COLUMN):
+    """ساخت شاخص رتبه یک فایل نمرات
+
+    خروجی دیکشنری شامل ترتیب نزولی ردیف‌ها ('school_order' و 'class_order'،
+    بلوک هر کلاس در بازه starts/ends)، رتبه‌ها و صدک‌ها (آرایه‌های ردیف ×
+    ستون) و تعداد نمرات معتبر هر ستون در مدرسه و هر کلاس است. اگر مکعب آمار
+    داده شود گروه‌بندی کلاس‌ها از آن خوانده می‌شود.
+    """
+    if columns is None:
+        columns = rank_columns(df)
+    columns = list(columns)
+    if cube is not None:
+        groups = {key: cube[key] for key in ('classes', 'order', 'starts', 'ends')}
+        codes = np.full(len(df), -1, dtype=np.intp)
+        for c in range(len(groups['classes'])):
+            codes[groups['order'][groups['starts'][c]:groups['ends'][c]]] = c
+    else:
+        groups = group_rows(df, class_column)
+        codes = groups['codes']
+
+    n, m = len(df), len(columns)
+    starts, ends = np.asarray(groups['starts']), np.asarray(groups['ends'])
+    index = {
+        'columns': columns,
+        'column_index': {column: j for j, column in enumerate(columns)},
+        'classes': groups['classes'],
+        'class_index': {name: c for c, name in enumerate(groups['classes'])},
+        'codes': codes.astype(np.int32),
+        'starts': starts,
+        'ends': ends,
+        'school_count': np.zeros(m, dtype=np.int64),
+        'class_count': np.zeros((len(starts), m), dtype=np.int64),
+    }
+    for scope in RANK_SCOPES:
+        index[f'{scope}_order'] = np.empty((n, m), dtype=np.int32, order='F')
+        index[f'{scope}_rank'] = np.empty((n, m), dtype=np.int32, order='F')
+        index[f'{scope}_percentile'] = np.empty((n, m), dtype=np.float32, order='F')
+
+    matrix = score_matrix(df, columns)
+    # ردیف‌های بدون کلاس (کد -1) ابتدای ترتیب کلاسی و خارج از همه بلوک‌ها هستند
+    class_of_position = np.repeat(np.arange(-1, len(starts)),
+                                  np.diff(np.concatenate([[0], starts, [n]])))
+    for j in range(m):
+        scores = matrix[:, j]
+        key = np.where(np.isnan(scores), np.inf, -scores)
+        valid = ~np.isnan(scores)
+
+        order = np.argsort(key, kind='stable')
+        count = int(valid.sum())
+        rank, percentile = _segment_ranks(scores[order], np.zeros(n, dtype=np.intp), count)
+        index['school_order'][:, j] = order
+        index['school_count'][j] = count
+        index['school_rank'][:, j] = _scatter(order, rank, np.int32)
+        index['school_percentile'][:, j] = _scatter(order, percentile, np.float32)
+
+        order = np.lexsort((key, codes))
+        counts = np.bincount(codes[valid] + 1, minlength=len(starts) + 1)
+        segment = class_of_position + 1
+        segment_starts = np.concatenate([[0], starts])[segment]
+        rank, percentile = _segment_ranks(scores[order], segment_starts, counts[segment])
+        rank, percentile = np.where(segment > 0, rank, 0), np.where(segment > 0, percentile, np.nan)
+        index['class_order'][:, j] = order
+        index['class_count'][:, j] = counts[1:]
+        index['class_rank'][:, j] = _scatter(order, rank, np.int32)
+        index['class_percentile'][:, j] = _scatter(order, percentile, np.float32)
+    return index
+
+
+def top_rows(index, column, k=TOP_K, class_name=None):
+    """شماره ردیف k دانش‌آموز برتر یک ستون در مدرسه یا یک کلاس (O(k))"""
+    j = index['column_index'].get(column)
+    if j is None:
+        return np.empty(0, dtype=np.intp)
+    if class_name is None:
+        return index['school_order'][:min(k, index['school_count'][j]), j].astype(np.intp)
+    c = index['class_index'].get(class_name)
+    if c is None:
+        return np.empty(0, dtype=np.intp)
+    start = index['starts'][c]
+    return index['class_order'][start:start + min(k, index['class_count'][c, j]), j].astype(np.intp)
+
+
+def student_names(df, rows):
+    """نام و نام خانوادگی دانش‌آموزان ردیف‌های rows"""
+    if 'نام' in df.columns and 'نام خانوادگی' in df.columns:
+        return (df['نام'].iloc[rows].astype(str).to_numpy() + ' '
+                + df['نام خانوادگی'].iloc[rows].astype(str).to_numpy())
+    return np.array([''] * len(rows), dtype=object)
+
+
+def leaderboard(index, df, column, k=TOP_K, class_name=None):
+    """جدول k دانش‌آموز برتر یک درس (یا معدل) در مدرسه یا یک کلاس"""
+    rows = top_rows(index, column, k, class_name)
+    j = index['column_index'].get(column)
+    scope = 'school' if class_name is None else 'class'
+    classes = np.array(index['classes'] + [''], dtype=object)
+    return pd.DataFrame({
+        'رتبه': index[f'{scope}_rank'][rows, j] if len(rows) else [],
+        'نام': student_names(df, rows),
+        'کلاس': classes[index['codes'][rows]],
+        'نمره': np.round(score_matrix(df.iloc[rows], [column])[:, 0], 2) if len(rows) else [],
+        'صدک': np.round(index[f'{scope}_percentile'][rows, j].astype(float), 1) if len(rows) else [],
+    })
+
+
+def student_ranks(index, row):
+    """رتبه‌ها و صدک‌های یک دانش‌آموز (شماره ردیف موقعیتی) در همه ستون‌ها (O(تعداد دروس))"""
+    c = index['codes'][row]
+    class_count = index['class_count'][c] if c >= 0 else np.zeros(len(index['columns']), dtype=np.int64)
+    return {
+        'columns': index['columns'],
+        'class': index['classes'][c] if c >= 0 else None,
+        'school_rank': index['school_rank'][row],
+        'school_count': index['school_count'],
+        'school_percentile': index['school_percentile'][row],
+        'class_rank': index['class_rank'][row] if c >= 0 else np.zeros(len(class_count), dtype=np.int32),
+        'class_count': class_count,
+        'class_percentile': (index['class_percentile'][row] if c >= 0
+                             else np.full(len(class_count), np.nan, dtype=np.float32)),
+    }
+
+
+def student_profile(index, df, row):
+    """کارنامه رتبه یک دانش‌آموز: نمره، رتبه و صدک هر درس در کلاس و مدرسه"""
+    ranks = student_ranks(index, row)
+    scores = score_matrix(df.iloc[[row]], index['columns'])[0]
+
+    def rank_text(rank, count):
+        return [f"{r} از {n}" if r else '-' for r, n in zip(rank, count)]
+
+    return pd.DataFrame({
+        'درس': index['columns'],
+        'نمره': np.round(scores, 2),
+        'رتبه در کلاس': rank_text(ranks['class_rank'], ranks['class_count']),
+        'صدک در کلاس': np.round(ranks['class_percentile'].astype(float), 1),
+        'رتبه در مدرسه': rank_text(ranks['school_rank'], ranks['school_count']),
+        'صدک در مدرسه': np.round(ranks['school_percentile'].astype(float), 1),
+    })
@@ -0,0 +1,300 @@
+"""تولید گزارش‌های HTML و PDF از آمار و گزارش‌های از پیش محاسبه‌شده
+
+قالب‌ها یک بار در بارگذاری ماژول ساخته می‌شوند و فقط با مقادیر آماده پر
+می‌شوند. PDF با weasyprint ساخته می‌شود؛ اگر نصب نباشد خروجی HTML
+برگردانده می‌شود. گزارش‌ها به اینترنت نیاز ندارند: قلم وزیرمتن از
+سیستم خوانده می‌شود یا فایل آن (GRADE_ANALYZER_FONT) داخل HTML قرار می‌گیرد.
+"""
+import base64
+import html
+import os
+import re
+import zipfile
+from datetime import datetime
+from functools import lru_cache
+from string import Template
+
+from .parallel import parallel_map
+from .profiling import profiled
+from .reports import DATE_FORMAT, report_filename
+
+PDF_MIME = 'application/pdf'
+HTML_MIME = 'text/html'
+
+# فایل قلم وزیرمتن (ttf، otf یا woff2) برای قرار گرفتن داخل گزارش
+FONT_FILE = os.environ.get('GRADE_ANALYZER_FONT', '')
+FONT_FORMATS = {'.ttf': 'truetype', '.otf': 'opentype', '.woff': 'woff', '.woff2': 'woff2'}
+
+
+@lru_cache(maxsize=4)
+def font_face(path=FONT_FILE):
+    """قاعده @font-face وزیرمتن: فایل قلم به صورت data URI یا قلم نصب‌شده روی سیستم"""
+    sources = ["local('Vazirmatn')", "local('Vazirmatn Regular')"]
+    fmt = FONT_FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt and os.path.isfile(path):
+        with open(path, 'rb') as f:
+            data = base64.b64encode(f.read()).decode('ascii')
+        sources.append(f"url(data:font/{fmt};base64,{data}) format('{fmt}')")
+    return "@font-face { font-family: 'Vazirmatn'; src: %s; }" % ', '.join(sources)
+
+
+STYLE = font_face() + """
+@page { size: A4; margin: 15mm; }
+body { font-family: 'Vazirmatn', Tahoma, sans-serif; direction: rtl; font-size: 11pt; color: #222; }
+.header { text-align: center; background: #1E3C72; color: white; padding: 16px; border-radius: 10px; }
+.header h1 { margin: 0 0 6px 0; }
+section { margin: 14px 0; padding: 10px 14px; background: #f8f9fa;
+          border-right: 5px solid #007bff; page-break-inside: avoid; }
+section.warning { background: #fff3cd; border-color: #ffc107; }
+section.danger { background: #f8d7da; border-color: #dc3545; }
+table { border-collapse: collapse; width: 100%; margin: 6px 0; }
+th, td { border: 1px solid #ccc; padding: 4px 6px; text-align: center; }
+th { background: #e9ecef; }
+h2 { margin: 0 0 8px 0; }
+h3 { margin: 10px 0 4px 0; font-size: 12pt; }
+ul { margin: 4px 0; }
+"""
+
+PAGE_TEMPLATE = Template("""<!DOCTYPE html>
+<html dir="rtl" lang="fa">
+<head>
+<meta charset="UTF-8">
+<title>$title</title>
+<style>$style</style>
+</head>
+<body>
+<div class="header">
+<h1>$title</h1>
+<p>$subtitle</p>
+<p>تاریخ تولید: $date</p>
+</div>
+$body
+</body>
+</html>
+""")
+
+SECTION_TEMPLATE = Template("""<section class="$level">
+<h2>$heading</h2>
+$content
+</section>
+""")
+
+# ستون‌های جدول آمار هر درس
+STAT_COLUMNS = [
+    ('count', 'تعداد'),
+    ('mean', 'میانگین'),
+    ('median', 'میانه'),
+    ('std', 'انحراف معیار'),
+    ('min', 'حداقل'),
+    ('max', 'حداکثر'),
+    ('q1', 'چارک اول'),
+    ('q3', 'چارک سوم'),
+    ('outlier_count', 'تعداد پرت'),
+]
+
+
+def _text(value):
+    """متن امن HTML با تبدیل **پررنگ** به <strong>"""
+    return re.sub(r'\*\*(.+?)\*\*', r'<strong>\1</strong>', html.escape(str(value)))
+
+
+def _number(value):
+    if isinstance(value, float):
+        return f'{value:.2f}'
+    return _text(value)
+
+
+def _table(headers, rows):
+    head = ''.join(f'<th>{_text(header)}</th>' for header in headers)
+    body = ''.join('<tr>' + ''.join(f'<td>{_number(value)}</td>' for value in row) + '</tr>'
+                   for row in rows)
+    return f'<table><tr>{head}</tr>{body}</table>'
+
+
+def _list(title, items):
+    if not items:
+        return ''
+    entries = ''.join(f'<li>{_text(item)}</li>' for item in items)
+    return f'<h3>{_text(title)}</h3><ul>{entries}</ul>'
+
+
+def _level(mean):
+    """کلاس رنگی بخش بر اساس میانگین"""
+    if mean < 12:
+        return 'danger'
+    if mean < 15:
+        return 'warning'
+    return ''
+
+
+def _stats_table(stats):
+    return _table([label for _, label in STAT_COLUMNS], [[stats[key] for key, _ in STAT_COLUMNS]])
+
+
+def _page(title, subtitle, sections, date=None):
+    return PAGE_TEMPLATE.substitute(
+        title=_text(title),
+        subtitle=_text(subtitle),
+        date=date or datetime.now().strftime(DATE_FORMAT),
+        style=STYLE,
+        body=''.join(sections),
+    )
+
+
+def _subject_section(subject, analysis):
+    stats = analysis['stats']
+    distribution = _table(list(analysis['grade_distribution']),
+                          [list(analysis['grade_distribution'].values())])
+    content = ''.join([
+        _stats_table(stats),
+        '<h3>توزیع نمرات</h3>', distribution,
+        _list('نقاط ضعف', analysis['weaknesses']),
+        _list('نقاط قوت', analysis['strengths']),
+        _list('توصیه‌ها', analysis['recommendations']),
+    ])
+    return SECTION_TEMPLATE.substitute(level=_level(stats['mean']), heading=_text(subject),
+                                       content=content)
+
+
+@profiled()
+def school_report_html(analyses, date=None):
+    """گزارش کلی مدرسه برای همه دروس"""
+    sections = [_subject_section(subject, analysis)
+                for subject, analysis in analyses.items() if analysis]
+    return _page('گزارش تحلیلی نمرات مدرسه', f'{len(sections)} درس', sections, date)
+
+
+@profiled()
+def subject_report_html(subject, analysis, class_analyses, date=None):
+    """گزارش یک درس در کل مدرسه و جدول آمار همه کلاس‌ها
+
+    class_analyses دیکشنری نام کلاس ← تحلیل همین درس در آن کلاس است.
+    """
+    sections = [_subject_section(subject, analysis)] if analysis else []
+    rows = [[class_name] + [item['stats'][key] for key, _ in STAT_COLUMNS]
+            for class_name, item in class_analyses.items() if item]
+    if rows:
+        table = _table(['کلاس'] + [label for _, label in STAT_COLUMNS], rows)
+        sections.append(SECTION_TEMPLATE.substitute(level='', heading='آمار کلاس‌ها', content=table))
+    return _page(f'گزارش درس {subject}', f'{len(rows)} کلاس', sections, date)
+
+
+@profiled()
+def comparison_report_html(class1, class2, comparisons, date=None):
+    """گزارش مقایسه دو کلاس در همه دروس (خروجی compare_classes برای هر درس)"""
+    sections = []
+    for subject, comparison in comparisons.items():
+        if not comparison:
+            continue
+        stats1, stats2 = comparison['class1']['stats'], comparison['class2']['stats']
+        table = _table(['کلاس'] + [label for _, label in STAT_COLUMNS],
+                       [[class1] + [stats1[key] for key, _ in STAT_COLUMNS],
+                        [class2] + [stats2[key] for key, _ in STAT_COLUMNS]])
+        content = table + _list('نتایج مقایسه', comparison['comparison_points'])
+        sections.append(SECTION_TEMPLATE.substitute(
+            level=_level(min(stats1['mean'], stats2['mean'])), heading=_text(subject), content=content))
+    return _page(f'مقایسه کلاس {class1} و {class2}', f'{len(sections)} درس', sections, date)
+
+
+@profiled()
+def problems_report_html(problems, at_risk=None, date=None):
+    """گزارش دروس مشکل‌دار و دانش‌آموزان نیازمند حمایت"""
+    sections = []
+    for problem in problems:
+        content = _list('مشکلات', problem['مشکلات']) + _table(
+            ['میانگین', 'تعداد ضعیف', 'اولویت'],
+            [[problem['میانگین'], problem['تعداد ضعیف'], problem['اولویت']]])
+        sections.append(SECTION_TEMPLATE.substitute(
+            level='danger' if problem['اولویت'] == 'بالا' else 'warning',
+            heading=_text(problem['درس']), content=content))
+    if at_risk is not None and len(at_risk):
+        table = _table(list(at_risk.columns), at_risk.itertuples(index=False, name=None))
+        sections.append(SECTION_TEMPLATE.substitute(
+            level='', heading='دانش‌آموزان نیازمند حمایت ویژه', content=table))
+    return _page('گزارش مشکلات آموزشی', f'{len(problems)} درس مشکل‌دار', sections, date)
+
+
+def teacher_report_html(report):
+    """گزارش معلم (خروجی generate_teacher_report یا generate_all_reports)"""
+    analysis = report['detailed_analysis']
+    actions = _table(['اولویت', 'اقدام', 'مهلت', 'مسئول'],
+                     [[item['priority'], item['action'], item['deadline'], item['responsible']]
+                      for item in report['action_items']]) if report['action_items'] else ''
+    sections = [
+        SECTION_TEMPLATE.substitute(level=_level(analysis['stats']['mean']), heading='خلاصه عملکرد',
+                                    content=_list('خلاصه', report['summary']) + actions),
+        _subject_section(report['subject'], analysis),
+        SECTION_TEMPLATE.substitute(level='', heading='موفقیت‌ها و نگرانی‌ها', content=''.join([
+            _list('نقاط قوت', report['success_stories']),
+            _list('نگرانی‌ها', report['concerns']),
+        ])),
+    ]
+    subtitle = ' | '.join(part for part in [
+        report.get('teacher') and f"معلم: {report['teacher']}",
+        report.get('class') and f"کلاس: {report['class']}",
+    ] if part)
+    return _page(f"گزارش درس {report['subject']}", subtitle, sections, report.get('date'))
+
+
+@lru_cache(maxsize=1)
+def pdf_available():
+    """آیا weasyprint و کتابخانه‌های سیستمی آن در دسترس هستند"""
+    try:
+        import weasyprint  # noqa: F401
+    except (ImportError, OSError):
+        return False
+    return True
+
+
+def html_to_pdf(document):
+    """تبدیل HTML به PDF با weasyprint؛ اگر در دسترس نباشد None برمی‌گرداند"""
+    if not pdf_available():
+        return None
+    from weasyprint import HTML
+
+    return HTML(string=document).write_pdf()
+
+
+@profiled()
+def render_document(document, fmt='pdf'):
+    """خروجی قابل دانلود یک گزارش: {'data', 'mime', 'extension'}
+
+    اگر PDF خواسته شود و weasyprint در دسترس نباشد خروجی HTML است.
+    """
+    if fmt == 'pdf':
+        pdf = html_to_pdf(document)
+        if pdf is not None:
+            return {'data': pdf, 'mime': PDF_MIME, 'extension': '.pdf'}
+    return {'data': document.encode('utf-8'), 'mime': HTML_MIME, 'extension': '.html'}
+
+
+def _render_teacher_report(shared, report):
+    rendered = render_document(teacher_report_html(report), shared['format'])
+    return report_filename(report, rendered['extension']), rendered['data']
+
+
+@profiled()
+def render_teacher_reports(reports, fmt='pdf', workers=None, kind=None, progress=None):
+    """ساخت فایل همه گزارش‌های معلم؛ ساخت PDF با workers > 1 در pool موازی
+
+    خروجی لیست (نام فایل، محتوا) است. پر کردن قالب HTML سریع‌تر از راه‌اندازی
+    پردازه‌هاست، پس فقط تبدیل به PDF موازی می‌شود. progress(done, total)
+    پس از ساخت هر فایل صدا زده می‌شود.
+    """
+    parallel = fmt == 'pdf' and pdf_available()
+    return parallel_map(_render_teacher_report, reports, {'format': fmt},
+                        workers if parallel and workers else 1, kind, chunksize=8, progress=progress)
+
+
+def write_rendered(rendered, out):
+    """نوشتن فایل‌های ساخته‌شده در یک پوشه، فایل ‎.zip یا شیء فایل باینری"""
+    if not isinstance(out, (str, os.PathLike)) or str(out).lower().endswith('.zip'):
+        with zipfile.ZipFile(out, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for name, data in rendered:
+                archive.writestr(name, data)
+    else:
+        os.makedirs(out, exist_ok=True)
+        for name, data in rendered:
+            with open(os.path.join(out, name), 'wb') as f:
+                f.write(data)
+    return [name for name, _ in rendered]
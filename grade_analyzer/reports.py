@@ -0,0 +1,320 @@
+import json
+import os
+import re
+import zipfile
+from datetime import datetime
+
+import numpy as np
+
+from .analysis import analyze_subject_scores, cube_analyses, cube_analysis
+from .cube import build_stats_cube
+from .parallel import parallel_map
+from .profiling import profiled
+from .ranking import top_rows
+from .stats import score_matrix
+
+DATE_FORMAT = "%Y/%m/%d"
+
+# تعداد دانش‌آموزان برتر در بخش موفقیت‌ها
+TOP_STUDENTS = 3
+
+
+@profiled()
+def generate_teacher_report(df, subject_column, teacher_name="", cube=None, ranks=None):
+    """تولید گزارش جامع برای معلم (دانش‌آموزان برتر از شاخص رتبه ranks در صورت وجود)"""
+    if cube is None:
+        analysis = analyze_subject_scores(df, subject_column)
+    else:
+        analysis = cube_analysis(cube, subject_column)
+
+    if not analysis:
+        return None
+
+    stats = analysis['stats']
+
+    report = {
+        'teacher': teacher_name,
+        'subject': subject_column,
+        'date': datetime.now().strftime(DATE_FORMAT),
+        'summary': generate_summary(stats, analysis),
+        'detailed_analysis': analysis,
+        'action_items': generate_action_items(stats, analysis),
+        'success_stories': identify_success_stories(df, subject_column, ranks),
+        'concerns': identify_concerns(df, subject_column)
+    }
+
+    return report
+
+
+def generate_summary(stats, analysis):
+    """خلاصه گزارش"""
+    summary = []
+
+    mean = stats['mean']
+    if mean >= 16:
+        summary.append("🎉 **عملکرد عالی**: میانگین کلاس در سطح ممتاز")
+    elif mean >= 14:
+        summary.append("✅ **عملکرد خوب**: میانگین کلاس قابل قبول")
+    elif mean >= 12:
+        summary.append("⚠️ **نیاز به بهبود**: میانگین کلاس نیاز به ارتقا دارد")
+    else:
+        summary.append("🚨 **نیاز به مداخله فوری**: میانگین کلاس بسیار پایین")
+
+    if stats['outlier_percent'] > 20:
+        summary.append(f"⚠️ **تعداد زیاد outlier**: {stats['outlier_percent']:.1f}% دانش‌آموزان خارج از محدوده عادی")
+
+    if stats['std'] > 6:
+        summary.append("📊 **پراکندگی بالا**: اختلاف سطح دانش‌آموزان زیاد است")
+
+    return summary
+
+
+def generate_action_items(stats, analysis):
+    """اقدامات لازم"""
+    actions = []
+
+    # اقدامات بر اساس میانگین
+    if stats['mean'] < 12:
+        actions.append({
+            'priority': 'بالا',
+            'action': 'برگزاری کلاس جبرانی فشرده',
+            'deadline': 'فوری',
+            'responsible': 'معلم'
+        })
+
+    # اقدامات برای outliers
+    if stats['outlier_count'] > 0:
+        actions.append({
+            'priority': 'متوسط',
+            'action': 'جلسات مشاوره فردی با دانش‌آموزان outlier',
+            'deadline': '۲ هفته',
+            'responsible': 'معلم + مشاور'
+        })
+
+    # اقدامات برای پراکندگی
+    if stats['std'] > 5:
+        actions.append({
+            'priority': 'متوسط',
+            'action': 'تدریس تفکیکی و گروه‌بندی',
+            'deadline': '۱ ماه',
+            'responsible': 'معلم'
+        })
+
+    return actions
+
+
+def _descending_order(values):
+    """ترتیب نزولی پایدار نمرات با قرار دادن نمرات خالی در انتها"""
+    return np.argsort(np.where(np.isnan(values), np.inf, -values), kind='stable')
+
+
+def _top_rows(scores, k=TOP_STUDENTS):
+    """k ردیف با بیشترین نمره بدون مرتب کردن همه نمرات (برابرها به ترتیب ردیف)"""
+    valid = np.flatnonzero(~np.isnan(scores))
+    if len(valid) > k:
+        threshold = -np.partition(-scores[valid], k - 1)[k - 1]
+        above = valid[scores[valid] > threshold]
+        tied = valid[scores[valid] == threshold][:k - len(above)]
+        valid = np.concatenate([above, tied])
+    return valid[_descending_order(scores[valid])]
+
+
+def _column(df, column):
+    return score_matrix(df, [column])[:, 0]
+
+
+def _success_stories(first_names, last_names, top_scores, gpa_aligned):
+    """متن موفقیت‌ها از دانش‌آموزان برتر و تعداد هماهنگ با معدل"""
+    success = []
+
+    # برترین دانش‌آموزان
+    if len(top_scores):
+        students = ', '.join(f'{first} {last} ({float(score)})'
+                             for first, last, score in zip(first_names, last_names, top_scores))
+        success.append(f"**برترین دانش‌آموزان**: {students}")
+
+    # بیشترین پیشرفت (اگر داده تاریخی داریم)
+    if gpa_aligned:
+        success.append(f"**هماهنگی با معدل**: {gpa_aligned} دانش‌آموز هم در این درس و هم در معدل عالی هستند")
+
+    return success
+
+
+def _concerns(weak_count, zero_count, low_discipline_count):
+    """متن نگرانی‌ها از شمارش‌های از پیش محاسبه‌شده"""
+    concerns = []
+
+    # دانش‌آموزان با نمره زیر ۱۰
+    if weak_count > 3:
+        concerns.append(f"**تعداد زیاد ضعیف**: {weak_count} دانش‌آموز نمره زیر ۱۰ دارند")
+
+    # نمرات صفر
+    if zero_count > 0:
+        concerns.append(f"**نمره صفر**: {zero_count} دانش‌آموز نمره صفر گرفته‌اند")
+
+    # عدم مشارکت (اگر ستون حضور داریم)
+    if low_discipline_count:
+        concerns.append(f"**مشکل انضباطی و درسی**: {low_discipline_count} دانش‌آموز هم نمره پایین و هم انضباط ضعیف دارند")
+
+    return concerns
+
+
+def identify_success_stories(df, subject_column, ranks=None):
+    """شناسایی موفقیت‌ها"""
+    scores = _column(df, subject_column)
+    if ranks is not None and subject_column in ranks['column_index']:
+        top = top_rows(ranks, subject_column, TOP_STUDENTS)
+    else:
+        top = _top_rows(scores)
+    gpa_aligned = int(np.count_nonzero(scores >= 18)) if 'معدل' in df.columns else 0
+    return _success_stories(df['نام'].to_numpy()[top], df['نام خانوادگی'].to_numpy()[top],
+                            scores[top], gpa_aligned)
+
+
+def identify_concerns(df, subject_column):
+    """شناسایی نگرانی‌ها"""
+    scores = _column(df, subject_column)
+    weak = scores < 10
+    low_discipline = 0
+    if 'انضباط' in df.columns:
+        low_discipline = int(np.count_nonzero(weak & (_column(df, 'انضباط') < 15)))
+    return _concerns(int(np.count_nonzero(weak)), int(np.count_nonzero(scores == 0)), low_discipline)
+
+
+def _subject_reports_task(shared, task):
+    subject, j, class_analyses = task
+    scores = shared['matrix'][:, j]
+    if shared.get('class_order') is not None:
+        order = shared['class_order'][:, j]
+    else:
+        order = np.lexsort((np.where(np.isnan(scores), np.inf, -scores), shared['codes']))
+    return _subject_reports(shared, subject, scores, order, class_analyses)
+
+
+def _subject_reports(shared, subject, scores, order, class_analyses):
+    """گزارش همه کلاس‌های یک درس از ترتیب (کلاس، نمره نزولی) ردیف‌ها
+
+    دانش‌آموزان برتر هر کلاس ابتدای بلوک همان کلاس در order هستند.
+    """
+    codes = shared['codes']
+    class_ids = np.arange(len(shared['classes']))
+    sorted_codes = codes[order]
+    starts = np.searchsorted(sorted_codes, class_ids, side='left')
+    ends = np.searchsorted(sorted_codes, class_ids, side='right')
+
+    reports = []
+    for c, class_name in enumerate(shared['classes']):
+        analysis = class_analyses[c]
+        if not analysis:
+            continue
+        rows = order[starts[c]:ends[c]]
+        block = scores[rows]
+        top = rows[:TOP_STUDENTS]
+        weak = block < 10
+
+        gpa_aligned = int(np.count_nonzero(block >= 18)) if shared['has_gpa'] else 0
+        low_discipline = 0
+        if shared['discipline'] is not None:
+            low_discipline = int(np.count_nonzero(weak & (shared['discipline'][rows] < 15)))
+
+        stats = analysis['stats']
+        reports.append({
+            'teacher': '',
+            'subject': subject,
+            'class': class_name,
+            'date': shared['date'],
+            'summary': generate_summary(stats, analysis),
+            'detailed_analysis': analysis,
+            'action_items': generate_action_items(stats, analysis),
+            'success_stories': _success_stories(shared['first_names'][top], shared['last_names'][top],
+                                                scores[top], gpa_aligned),
+            'concerns': _concerns(int(np.count_nonzero(weak)), int(np.count_nonzero(block == 0)),
+                                  low_discipline),
+        })
+    return reports
+
+
+@profiled()
+def generate_all_reports(df, subjects=None, workers=None, teacher_names=None, cube=None, kind=None,
+                         progress=None, ranks=None):
+    """تولید گزارش معلم برای همه ترکیب‌های (درس، کلاس) بدون رابط کاربری
+
+    آمار کلاس‌ها یک بار از مکعب آمار خوانده می‌شود و هر درس یک کار مستقل
+    است که با workers > 1 در pool موازی (parallel_map) اجرا می‌شود؛ ماتریس
+    نمرات و کد کلاس‌ها از حافظه مشترک خوانده می‌شوند. teacher_names
+    می‌تواند نام معلم را با کلید (درس، کلاس) یا فقط درس مشخص کند.
+    progress(done, total) پس از تحلیل هر کلاس و ساخت گزارش‌های هر درس صدا
+    زده می‌شود. با شاخص رتبه ranks ترتیب کلاسی نمرات دوباره مرتب نمی‌شود.
+    """
+    if cube is None:
+        cube = build_stats_cube(df, subjects)
+    subjects = cube['subjects']
+    classes = cube['classes']
+    teacher_names = teacher_names or {}
+
+    codes = np.full(len(df), -1, dtype=np.intp)
+    for c in range(len(classes)):
+        codes[cube['order'][cube['starts'][c]:cube['ends'][c]]] = c
+
+    shared = {
+        'codes': codes,
+        'classes': classes,
+        'first_names': df['نام'].astype(str).to_numpy(),
+        'last_names': df['نام خانوادگی'].astype(str).to_numpy(),
+        'discipline': _column(df, 'انضباط') if 'انضباط' in df.columns else None,
+        'has_gpa': 'معدل' in df.columns,
+        'date': datetime.now().strftime(DATE_FORMAT),
+    }
+    shared['matrix'] = score_matrix(df, subjects)
+    if ranks is not None and all(subject in ranks['column_index'] for subject in subjects):
+        shared['class_order'] = ranks['class_order'][:, [ranks['column_index'][s] for s in subjects]]
+    total = len(classes) + len(subjects)
+    class_analyses = []
+    for class_name in classes:
+        class_analyses.append(cube_analyses(cube, class_name))
+        if progress is not None:
+            progress(len(class_analyses), total)
+    tasks = [(subject, j, [analyses.get(subject) for analyses in class_analyses])
+             for j, subject in enumerate(subjects)]
+    subject_progress = None if progress is None else (
+        lambda done, _: progress(len(classes) + done, total))
+    results = parallel_map(_subject_reports_task, tasks, shared, workers or 1, kind,
+                           progress=subject_progress)
+
+    reports = [report for subject_reports in results for report in subject_reports]
+    for report in reports:
+        report['teacher'] = teacher_names.get((report['subject'], report['class']),
+                                              teacher_names.get(report['subject'], ''))
+    return reports
+
+
+def report_filename(report, extension='.json'):
+    """نام فایل یک گزارش (پیش‌فرض JSON)"""
+    parts = [report['subject'], str(report.get('class', ''))]
+    safe = [re.sub(r'[\\/:*?"<>|\s]+', '-', part).strip('-') for part in parts]
+    return '__'.join(part for part in safe if part) + extension
+
+
+@profiled()
+def write_reports(reports, out):
+    """نوشتن گزارش‌ها به صورت فایل‌های JSON در یک پوشه یا یک فایل zip
+
+    out می‌تواند مسیر پوشه، مسیر فایل ‎.zip یا یک شیء فایل باینری باشد.
+    """
+    files = []
+    for report in reports:
+        files.append((report_filename(report), json.dumps(report, ensure_ascii=False, indent=2)))
+    index = [{'subject': report['subject'], 'class': report.get('class'), 'file': name}
+             for report, (name, _) in zip(reports, files)]
+    files.append(('index.json', json.dumps(index, ensure_ascii=False, indent=2)))
+
+    if not isinstance(out, (str, os.PathLike)) or str(out).lower().endswith('.zip'):
+        with zipfile.ZipFile(out, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for name, payload in files:
+                archive.writestr(name, payload)
+    else:
+        os.makedirs(out, exist_ok=True)
+        for name, payload in files:
+            with open(os.path.join(out, name), 'w', encoding='utf-8') as f:
+                f.write(payload)
+    return index
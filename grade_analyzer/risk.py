@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+from .profiling import profiled
+from .stats import CLASS_COLUMN, get_subject_columns, score_matrix
+
+# نمره کمتر از این مقدار ضعیف حساب می‌شود
+WEAK_SCORE = 10
+
+# حداقل تعداد دروس ضعیف برای نیاز به حمایت ویژه
+MIN_WEAK_SUBJECTS = 3
+
+# تعداد دروس ضعیف نمایش داده‌شده برای هر دانش‌آموز
+TOP_WEAK_SUBJECTS = 3
+
+
+def weak_score_matrix(matrix, min_score=WEAK_SCORE):
+    """ماتریس بولی نمرات ضعیف (نمره خالی ضعیف حساب نمی‌شود)"""
+    with np.errstate(invalid='ignore'):
+        return matrix < min_score
+
+
+def _student_names(df, rows):
+    if 'نام' in df.columns and 'نام خانوادگی' in df.columns:
+        first = df['نام'].iloc[rows].astype(str).to_numpy()
+        last = df['نام خانوادگی'].iloc[rows].astype(str).to_numpy()
+        return [f"{a} {b}" for a, b in zip(first, last)]
+    return ['-'] * len(rows)
+
+
+@profiled()
+def detect_at_risk_students(df, subjects=None, min_score=WEAK_SCORE,
+                            min_weak_subjects=MIN_WEAK_SUBJECTS,
+                            top_k=TOP_WEAK_SUBJECTS, class_column=CLASS_COLUMN):
+    """شناسایی برداری دانش‌آموزان نیازمند حمایت ویژه
+
+    خروجی جدولی است که بر اساس تعداد دروس ضعیف (نزولی) و میانگین نمرات
+    ضعیف (صعودی) رتبه‌بندی شده و برای هر دانش‌آموز k درس با کمترین نمره
+    را نشان می‌دهد. اندیس جدول همان اندیس ردیف در DataFrame ورودی است.
+    """
+    if subjects is None:
+        subjects = get_subject_columns(df)
+    subjects = list(subjects)
+    columns = ['نام', 'کلاس', 'تعداد دروس ضعیف', 'دروس ضعیف', 'میانگین دروس ضعیف']
+    if not subjects or len(df) == 0:
+        return pd.DataFrame(columns=columns)
+
+    matrix = score_matrix(df, subjects)
+    weak = weak_score_matrix(matrix, min_score)
+    weak_counts = weak.sum(axis=1)
+    rows = np.flatnonzero(weak_counts >= max(min_weak_subjects, 1))
+    if len(rows) == 0:
+        return pd.DataFrame(columns=columns)
+
+    weak_rows = weak[rows]
+    counts = weak_counts[rows]
+    weak_scores = np.where(weak_rows, matrix[rows], np.inf)
+    k = min(top_k, len(subjects))
+    top_idx = np.argsort(weak_scores, axis=1, kind='stable')[:, :k]
+    top_scores = np.take_along_axis(weak_scores, top_idx, axis=1)
+    weak_mean = np.where(weak_rows, matrix[rows], 0.0).sum(axis=1) / counts
+
+    labels = []
+    for idx_row, score_row, count in zip(top_idx, top_scores, counts):
+        parts = [f"{subjects[j]}: {score:g}" for j, score in zip(idx_row, score_row)
+                 if np.isfinite(score)]
+        labels.append(', '.join(parts) + ('...' if count > k else ''))
+
+    if class_column in df.columns:
+        class_names = df[class_column].iloc[rows].to_numpy()
+    else:
+        class_names = np.full(len(rows), '-', dtype=object)
+
+    result = pd.DataFrame({
+        'نام': _student_names(df, rows),
+        'کلاس': class_names,
+        'تعداد دروس ضعیف': counts,
+        'دروس ضعیف': labels,
+        'میانگین دروس ضعیف': np.round(weak_mean, 2),
+    }, index=df.index[rows])
+    rank = np.lexsort((weak_mean, -counts))
+    return result.iloc[rank]
+
+
+def student_risk_flags(df, row, subjects=None, min_score=WEAK_SCORE,
+                       min_weak_subjects=MIN_WEAK_SUBJECTS):
+    """نشانه‌های خطر یک دانش‌آموز (شماره ردیف موقعیتی) با همان معیار detect_at_risk_students"""
+    if subjects is None:
+        subjects = get_subject_columns(df)
+    subjects = list(subjects)
+    scores = score_matrix(df.iloc[[row]], subjects)[0] if subjects else np.empty(0)
+    weak = weak_score_matrix(scores, min_score)
+    weak_subjects = [subjects[j] for j in np.argsort(np.where(weak, scores, np.inf), kind='stable')
+                     if weak[j]]
+    return {
+        'scores': dict(zip(subjects, scores.tolist())),
+        'weak_subjects': weak_subjects,
+        'weak_count': len(weak_subjects),
+        'zero_subjects': [subject for subject, score in zip(subjects, scores) if score == 0],
+        'missing_subjects': [subject for subject, score in zip(subjects, scores) if np.isnan(score)],
+        'at_risk': len(weak_subjects) >= max(min_weak_subjects, 1),
+    }
@@ -0,0 +1,279 @@
+import hashlib
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+
+# قوانین پیش‌فرض تحلیل دروس
+#
+# هر قانون یک شاخص، یک عملگر مقایسه و یک آستانه دارد. شاخص‌ها یا از آمار
+# IQR می‌آیند (mean، std، min، iqr، outlier_count و ...) یا شاخص آستانه‌ای
+# هستند: count_below / share_below (نمره کمتر از param) و
+# count_at_least / share_at_least (نمره بزرگ‌تر یا مساوی param).
+# از میان قوانین هم‌گروه (group) فقط اولین قانون برقرار اعمال می‌شود.
+DEFAULT_RULES = {
+    'grade_bands': [
+        {'label': 'ضعیف (0-9)', 'min': 0, 'max': 9},
+        {'label': 'قابل قبول (10-14)', 'min': 10, 'max': 14},
+        {'label': 'خوب (15-17)', 'min': 15, 'max': 17},
+        {'label': 'عالی (18-20)', 'min': 18, 'max': 20},
+    ],
+    'weaknesses': [
+        {'metric': 'share_below', 'param': 10, 'op': '>', 'value': 0.3,
+         'message': 'تعداد زیاد دانش‌آموزان ضعیف (نمره زیر ۱۰)'},
+        {'metric': 'std', 'op': '>', 'value': 6,
+         'message': 'پراکندگی زیاد نمرات (اختلاف سطح بالا)'},
+        {'metric': 'min', 'op': '==', 'value': 0,
+         'message': 'وجود نمره صفر (نیاز به بررسی ویژه)'},
+        {'metric': 'count_below', 'param': 5, 'op': '>', 'value': 0,
+         'message': 'وجود نمرات بسیار پایین (زیر ۵)'},
+    ],
+    'strengths': [
+        {'metric': 'mean', 'op': '>', 'value': 15,
+         'message': 'میانگین کلاس عالی'},
+        {'metric': 'share_at_least', 'param': 18, 'op': '>', 'value': 0.4,
+         'message': 'تعداد قابل توجه دانش‌آموزان ممتاز'},
+        {'metric': 'std', 'op': '<', 'value': 4,
+         'message': 'همگنی مناسب کلاس'},
+        {'metric': 'min', 'op': '>', 'value': 10,
+         'message': 'عدم وجود دانش‌آموز بسیار ضعیف'},
+    ],
+    'recommendations': [
+        {'metric': 'mean', 'op': '<', 'value': 12, 'group': 'mean',
+         'message': '🔴 **نیاز فوری**: برگزاری کلاس‌های جبرانی فشرده'},
+        {'metric': 'mean', 'op': '<', 'value': 15, 'group': 'mean',
+         'message': '🟡 **نیاز متوسط**: افزایش تمرین‌های تکمیلی'},
+        {'metric': 'mean', 'op': '>=', 'value': 15, 'group': 'mean',
+         'message': '🟢 **وضعیت مطلوب**: ادامه رویه فعلی با افزودن چالش‌های بیشتر'},
+        {'metric': 'std', 'op': '>', 'value': 6,
+         'message': '🎯 **تدریس تفکیکی**: گروه‌بندی دانش‌آموزان بر اساس سطح'},
+        {'metric': 'outlier_count', 'op': '>', 'value': 0,
+         'message': '👥 **حمایت ویژه**: توجه خاص به دانش‌آموزان outlier'},
+        {'metric': 'iqr', 'op': '>', 'value': 8,
+         'message': '📊 **بازبینی روش**: بررسی تأثیر روش تدریس فعلی'},
+    ],
+}
+
+# مسیر فایل JSON برای بازنویسی قوانین پیش‌فرض
+RULES_ENV_VAR = 'GRADE_ANALYZER_RULES'
+
+RULE_SETS = ['weaknesses', 'strengths', 'recommendations']
+
+OPERATORS = {
+    '<': np.less,
+    '<=': np.less_equal,
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '==': np.equal,
+    '!=': np.not_equal,
+}
+
+# شاخص آستانه‌ای: (شمارش از بالای آستانه؟، نسبت به جای تعداد؟)
+THRESHOLD_METRICS = {
+    'count_below': (False, False),
+    'share_below': (False, True),
+    'count_at_least': (True, False),
+    'share_at_least': (True, True),
+}
+
+# شاخص‌های آمار IQR که قوانین می‌توانند به آن‌ها ارجاع دهند
+STATS_METRICS = ['count', 'mean', 'median', 'std', 'min', 'max', 'q1', 'q3', 'iqr',
+                 'lower_bound', 'upper_bound', 'outlier_count', 'outlier_percent']
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _rule_error(rule_set, i, rule, problem):
+    """خطای قانون نامعتبر همراه با جایگاه و متن خود قانون"""
+    text = json.dumps(rule, ensure_ascii=False) if isinstance(rule, dict) else repr(rule)
+    return ValueError(f"قانون {i + 1} از «{rule_set}» نامعتبر است: {problem}: {text}")
+
+
+def _validate_rule(rule_set, i, rule):
+    if not isinstance(rule, dict):
+        raise _rule_error(rule_set, i, rule, "قانون باید یک شیء JSON باشد")
+    for key in ('metric', 'op', 'value', 'message'):
+        if key not in rule:
+            raise _rule_error(rule_set, i, rule, f"کلید «{key}» وجود ندارد")
+    metric = rule['metric']
+    if metric not in STATS_METRICS and metric not in THRESHOLD_METRICS:
+        valid = '، '.join([*STATS_METRICS, *THRESHOLD_METRICS])
+        raise _rule_error(rule_set, i, rule, f"شاخص ناشناخته {metric!r} (شاخص‌های مجاز: {valid})")
+    if metric in THRESHOLD_METRICS and not _is_number(rule.get('param')):
+        raise _rule_error(rule_set, i, rule, f"شاخص {metric} به آستانه عددی param نیاز دارد")
+    if rule['op'] not in OPERATORS:
+        raise _rule_error(rule_set, i, rule, f"عملگر نامعتبر {rule['op']!r} (عملگرهای مجاز: {' '.join(OPERATORS)})")
+    if not _is_number(rule['value']):
+        raise _rule_error(rule_set, i, rule, "مقدار value باید عدد باشد")
+
+
+def _validate_bands(bands):
+    if not isinstance(bands, list) or not bands:
+        raise ValueError("grade_bands باید فهرستی ناخالی از بازه‌های نمره باشد")
+    for i, band in enumerate(bands):
+        if not isinstance(band, dict) or 'label' not in band:
+            raise _rule_error('grade_bands', i, band, "بازه باید کلید label داشته باشد")
+        if not (_is_number(band.get('min')) and _is_number(band.get('max'))):
+            raise _rule_error('grade_bands', i, band, "min و max بازه باید عدد باشند")
+
+
+def compile_rules(config=None):
+    """آماده‌سازی قوانین برای ارزیابی برداری
+
+    آستانه‌های یکتای همه قوانین جمع‌آوری می‌شوند تا برای هر درس فقط یک
+    جستجوی دودویی روی نمرات مرتب‌شده لازم باشد. شاخص، عملگر و مقدار هر
+    قانون همین‌جا بررسی می‌شود و قانون نامعتبر با ValueError گزارش می‌شود.
+    """
+    merged = dict(DEFAULT_RULES)
+    if config:
+        unknown = [key for key in config if key not in DEFAULT_RULES]
+        if unknown:
+            raise ValueError(f"بخش ناشناخته در قوانین: {'، '.join(map(str, unknown))}")
+        merged.update(config)
+
+    bands = merged['grade_bands']
+    _validate_bands(bands)
+    thresholds = set()
+    for band in bands:
+        thresholds.add(('left', float(band['min'])))
+        thresholds.add(('right', float(band['max'])))
+
+    compiled = {}
+    for rule_set in RULE_SETS:
+        if not isinstance(merged[rule_set], list):
+            raise ValueError(f"«{rule_set}» باید فهرستی از قوانین باشد")
+        rules = []
+        for i, rule in enumerate(merged[rule_set]):
+            _validate_rule(rule_set, i, rule)
+            if rule['metric'] in THRESHOLD_METRICS:
+                thresholds.add(('left', float(rule['param'])))
+            rules.append(dict(rule, func=OPERATORS[rule['op']]))
+        compiled[rule_set] = rules
+
+    fingerprint = hashlib.blake2b(
+        json.dumps(merged, sort_keys=True, ensure_ascii=False).encode(), digest_size=8
+    ).hexdigest()
+    return {
+        'grade_bands': bands,
+        'thresholds': sorted(thresholds),
+        'fingerprint': fingerprint,
+        **compiled,
+    }
+
+
+@lru_cache(maxsize=8)
+def _load_rules(path, mtime):
+    if path is None:
+        return compile_rules()
+    with open(path, encoding='utf-8') as f:
+        return compile_rules(json.load(f))
+
+
+def load_rules():
+    """قوانین فعال (پیش‌فرض یا فایل معرفی‌شده در GRADE_ANALYZER_RULES)"""
+    path = os.environ.get(RULES_ENV_VAR)
+    if not path:
+        return _load_rules(None, None)
+    # با تغییر فایل، قوانین دوباره خوانده می‌شوند
+    return _load_rules(path, os.path.getmtime(path))
+
+
+def _threshold_counts(batch, thresholds):
+    """تعداد نمرات کمتر از (یا کمتر مساوی) هر آستانه برای همه دروس"""
+    sorted_matrix = batch['sorted']
+    counts = batch['count']
+    left = np.array([value for side, value in thresholds if side == 'left'])
+    right = np.array([value for side, value in thresholds if side == 'right'])
+    result = {}
+    for j in range(sorted_matrix.shape[1]):
+        column = sorted_matrix[:int(counts[j]), j]
+        for value, position in zip(left, np.searchsorted(column, left, side='left')):
+            result.setdefault(('left', value), []).append(position)
+        for value, position in zip(right, np.searchsorted(column, right, side='right')):
+            result.setdefault(('right', value), []).append(position)
+    return {key: np.array(values) for key, values in result.items()}
+
+
+def _metric(batch, below, rule):
+    """مقادیر یک شاخص برای همه دروس"""
+    metric = rule['metric']
+    if metric not in THRESHOLD_METRICS:
+        return batch[metric]
+    at_least, share = THRESHOLD_METRICS[metric]
+    count = np.asarray(batch['count'])
+    if below is None:
+        # بدون نمرات خام، شاخص آستانه‌ای قابل محاسبه نیست
+        return np.full(count.shape, np.nan)
+    value = below[('left', float(rule['param']))]
+    if at_least:
+        value = count - value
+    if share:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            value = value / count
+    return value
+
+
+def _evaluate(rules, batch, below):
+    """ماتریس بولی (قانون × درس) برای یک مجموعه قانون"""
+    n_subjects = len(batch['count'])
+    fired = np.zeros((len(rules), n_subjects), dtype=bool)
+    group_taken = {}
+    with np.errstate(invalid='ignore'):
+        for i, rule in enumerate(rules):
+            hit = rule['func'](_metric(batch, below, rule), rule['value'])
+            group = rule.get('group')
+            if group is not None:
+                taken = group_taken.get(group, np.zeros(n_subjects, dtype=bool))
+                hit = hit & ~taken
+                group_taken[group] = taken | hit
+            fired[i] = hit
+    return fired
+
+
+def evaluate_stats(stats, rule_set, rules=None):
+    """ارزیابی یک مجموعه قانون روی دیکشنری آمار یک درس
+
+    قوانین آستانه‌ای که به نمرات خام نیاز دارند در این حالت برقرار نمی‌شوند.
+    """
+    if rules is None:
+        rules = load_rules()
+    batch = {key: np.array([value]) for key, value in stats.items()
+             if np.isscalar(value)}
+    fired = _evaluate(rules[rule_set], batch, None)
+    return [rule['message'] for rule, hit in zip(rules[rule_set], fired[:, 0]) if hit]
+
+
+def evaluate_batch(batch, rules=None):
+    """ارزیابی همه قوانین برای همه دروس یک دسته آماری
+
+    خروجی برای هر ستون یک دیکشنری با توزیع نمرات، نقاط ضعف، نقاط قوت و
+    توصیه‌ها است.
+    """
+    if rules is None:
+        rules = load_rules()
+    if batch['sorted'].shape[0] == 0:
+        batch = dict(batch, sorted=np.full((1, len(batch['count'])), np.nan))
+    below = _threshold_counts(batch, rules['thresholds'])
+
+    band_counts = [
+        below[('right', float(band['max']))] - below[('left', float(band['min']))]
+        for band in rules['grade_bands']
+    ]
+    fired = {rule_set: _evaluate(rules[rule_set], batch, below) for rule_set in RULE_SETS}
+
+    results = []
+    for j in range(len(batch['count'])):
+        result = {
+            'grade_distribution': {
+                band['label']: int(max(counts[j], 0))
+                for band, counts in zip(rules['grade_bands'], band_counts)
+            },
+        }
+        for rule_set in RULE_SETS:
+            result[rule_set] = [rule['message'] for rule, hit
+                                in zip(rules[rule_set], fired[rule_set][:, j]) if hit]
+        results.append(result)
+    return results
@@ -0,0 +1,203 @@
+"""جستجوی دانش‌آموزان با نام یا کد
+
+نام‌ها پیش از جستجو یکسان‌سازی می‌شوند (ی/ي، ک/ك، اعراب، کشیده، نیم‌فاصله و
+ارقام فارسی و عربی) و برای هر دانش‌آموز چند کلید فشرده بدون فاصله ساخته
+می‌شود: نام، نام خانوادگی، «نام + نام خانوادگی»، «نام خانوادگی + نام» و کد
+دانش‌آموز. کلیدهای یکتا مرتب نگه داشته می‌شوند و جستجوی پیشوندی با جستجوی
+دودویی روی آن‌هاست؛ ردیف‌های هر کلید پشت سر هم ذخیره شده‌اند، پس ردیف‌های
+همه کلیدهای یک پیشوند یک بازه پیوسته‌اند.
+
+برای غلط‌های تایپی یک شاخص سه‌حرفی (trigram) روی کلیدها ساخته می‌شود و
+شباهت هر کلید با پرسش از تعداد سه‌حرفی‌های مشترک (ضریب Dice) به دست می‌آید.
+"""
+import re
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+from .profiling import profiled
+from .stats import CLASS_COLUMN, STUDENT_ID_COLUMNS
+
+NAME_COLUMNS = ['نام', 'نام خانوادگی']
+MAX_RESULTS = 20
+
+# حداقل شباهت سه‌حرفی برای نتایج تقریبی
+FUZZY_THRESHOLD = 0.4
+
+_CHAR_MAP = str.maketrans({
+    'ي': 'ی', 'ى': 'ی', 'ئ': 'ی', 'ك': 'ک', 'ة': 'ه', 'ۀ': 'ه',
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا', 'ؤ': 'و',
+    '\u200c': ' ', '\u200d': '', '\u0640': '',
+    **{chr(0x06F0 + digit): str(digit) for digit in range(10)},
+    **{chr(0x0660 + digit): str(digit) for digit in range(10)},
+})
+# اعراب و علامت‌های قرآنی
+_DIACRITICS = re.compile('[\u064b-\u065f\u0670\u06d6-\u06ed]')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    """یکسان‌سازی متن برای جستجو (حروف عربی، اعراب، کشیده، نیم‌فاصله و ارقام)"""
+    text = _DIACRITICS.sub('', str(text).translate(_CHAR_MAP)).lower()
+    return _SPACES.sub(' ', text).strip()
+
+
+def search_key(text):
+    """کلید فشرده بدون فاصله؛ «محمدرضا»، «محمد رضا» و «محمد‌رضا» یک کلیدند"""
+    return normalize_text(text).replace(' ', '')
+
+
+def _value_text(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _column_keys(series):
+    """کلید جستجوی هر ردیف یک ستون؛ هر مقدار یکتا فقط یک بار یکسان‌سازی می‌شود"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes, uniques = series.cat.codes.to_numpy(), series.cat.categories
+    else:
+        codes, uniques = pd.factorize(series)
+    if pd.api.types.is_numeric_dtype(uniques.dtype):
+        # کدهای عددی یکسان‌سازی لازم ندارند
+        keys = np.array([_value_text(value) for value in uniques.tolist()] + [''], dtype=object)
+    else:
+        keys = np.array([search_key(_value_text(value)) for value in uniques] + [''], dtype=object)
+    # کد -1 (مقدار خالی) به کلید خالی آخر آرایه می‌رسد
+    return keys[codes]
+
+
+def _scatter_positions(order):
+    """جایگاه هر عضو در ترتیب order (وارون جایگشت)"""
+    positions = np.empty(len(order), dtype=np.int64)
+    positions[order] = np.arange(len(order))
+    return positions
+
+
+def _trigrams(key):
+    padded = f'^{key}$'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@profiled()
+def build_search_index(df):
+    """ساخت شاخص جستجوی نام و کد دانش‌آموزان یک DataFrame (یک بار برای هر فایل)"""
+    n = len(df)
+    variants, fuzzy_variants = [], 0
+    if all(column in df.columns for column in NAME_COLUMNS):
+        first, last = (_column_keys(df[column]) for column in NAME_COLUMNS)
+        variants += [first, last, first + last, last + first]
+        # «نام خانوادگی + نام» تقریباً همان سه‌حرفی‌های «نام + نام خانوادگی» را دارد
+        fuzzy_variants = 3
+    for column in STUDENT_ID_COLUMNS:
+        if column in df.columns:
+            variants.append(_column_keys(df[column]))
+
+    keys = np.concatenate(variants) if variants else np.empty(0, dtype=object)
+    rows = np.tile(np.arange(n), len(variants))
+    keep = keys != ''
+    codes, uniques = pd.factorize(keys[keep])
+    # مرتب‌سازی فهرست پایتونی رشته‌ها چند برابر سریع‌تر از argsort آرایه object است
+    uniques = uniques.tolist()
+    key_order = sorted(range(len(uniques)), key=uniques.__getitem__)
+    uniques = [uniques[i] for i in key_order]
+    codes = _scatter_positions(key_order)[codes]
+    order = np.argsort(codes, kind='stable')
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(uniques)))])
+
+    # کلیدهای منبع شاخص سه‌حرفی ابتدای keys هستند
+    fuzzy_end = int(keep[:fuzzy_variants * n].sum())
+    key_ids = pd.unique(codes[:fuzzy_end])
+    grams, owners = [], []
+    for key_id in key_ids:
+        key_grams = _trigrams(uniques[key_id])
+        grams.extend(key_grams)
+        owners.extend([key_id] * len(key_grams))
+    gram_codes, gram_names = pd.factorize(pd.Series(grams, dtype=object))
+    owners = np.asarray(owners, dtype=np.int64)
+    gram_order = np.argsort(gram_codes, kind='stable')
+    return {
+        'keys': uniques,
+        'offsets': offsets,
+        'postings': rows[keep][order],
+        'size': n,
+        'variants': len(variants),
+        'grams': {gram: g for g, gram in enumerate(gram_names)},
+        'gram_offsets': np.concatenate([[0], np.cumsum(np.bincount(gram_codes, minlength=len(gram_names)))]),
+        'gram_postings': owners[gram_order],
+        'gram_counts': np.bincount(owners, minlength=len(uniques)),
+    }
+
+
+def _merge(result_rows, result_scores, rows, score, limit):
+    """افزودن ردیف‌های جدید (بدون تکرار) تا سقف limit"""
+    seen = set(result_rows)
+    for row in rows.tolist():
+        if len(result_rows) >= limit:
+            break
+        if row not in seen:
+            seen.add(row)
+            result_rows.append(row)
+            result_scores.append(score)
+
+
+def _fuzzy_keys(index, key, limit):
+    """کلیدهای شبیه به key به ترتیب شباهت: (شماره کلیدها، شباهت‌ها)"""
+    query_grams = [index['grams'][gram] for gram in _trigrams(key) if gram in index['grams']]
+    if not query_grams:
+        return np.empty(0, dtype=np.intp), np.empty(0)
+    offsets = index['gram_offsets']
+    candidates = np.concatenate([index['gram_postings'][offsets[g]:offsets[g + 1]] for g in query_grams])
+    shared = np.bincount(candidates, minlength=len(index['gram_counts']))
+    ids = np.flatnonzero(shared)
+    shared = shared[ids]
+    similarity = 2 * shared / (len(_trigrams(key)) + index['gram_counts'][ids])
+    keep = similarity >= FUZZY_THRESHOLD
+    ids, similarity = ids[keep], similarity[keep]
+    if len(ids) > limit:
+        top = np.argpartition(-similarity, limit - 1)[:limit]
+        ids, similarity = ids[top], similarity[top]
+    order = np.argsort(-similarity, kind='stable')
+    return ids[order], similarity[order]
+
+
+@profiled()
+def search_students(index, query, limit=MAX_RESULTS, fuzzy=True):
+    """ردیف‌های (موقعیتی) دانش‌آموزان مطابق با پرسش و امتیاز تطابق هر کدام
+
+    ابتدا تطابق کامل (امتیاز 1)، سپس پیشوندی (0.9) و اگر نتایج کمتر از limit
+    باشد نتایج تقریبی با امتیاز شباهت سه‌حرفی برگردانده می‌شوند.
+    """
+    key = search_key(query)
+    rows, scores = [], []
+    if not key:
+        return {'rows': np.empty(0, dtype=np.intp), 'scores': np.empty(0)}
+    keys, offsets, postings = index['keys'], index['offsets'], index['postings']
+    lo = bisect_left(keys, key)
+    hi = bisect_left(keys, key + '\uffff', lo)
+    if lo < hi and keys[lo] == key:
+        _merge(rows, scores, postings[offsets[lo]:offsets[lo + 1]], 1.0, limit)
+        lo += 1
+    if lo < hi:
+        # هر ردیف حداکثر یک بار در هر نوع کلید آمده است
+        end = min(offsets[hi], offsets[lo] + limit * index['variants'])
+        _merge(rows, scores, postings[offsets[lo]:end], 0.9, limit)
+    if fuzzy and len(rows) < limit:
+        for key_id, similarity in zip(*_fuzzy_keys(index, key, limit)):
+            _merge(rows, scores, postings[offsets[key_id]:offsets[key_id + 1]],
+                   round(float(similarity), 2), limit)
+    return {'rows': np.asarray(rows, dtype=np.intp), 'scores': np.asarray(scores)}
+
+
+def search_table(df, result):
+    """جدول نتایج جستجو با نام، کلاس و کد دانش‌آموز"""
+    rows = result['rows']
+    table = {'ردیف': rows}
+    for column in NAME_COLUMNS + [CLASS_COLUMN] + STUDENT_ID_COLUMNS:
+        if column in df.columns:
+            values = df[column].iloc[rows]
+            table[column] = values.astype(object).map(_value_text).where(values.notna(), '').to_numpy()
+    table['تطابق'] = result['scores']
+    return pd.DataFrame(table)
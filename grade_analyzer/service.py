@@ -0,0 +1,380 @@
+"""سرویس HTTP/JSON محلی روی موتور تحلیل نمرات (ASGI)
+
+سامانه‌های دیگر مدرسه بدون رابط streamlit به نتایج تحلیل دسترسی دارند:
+
+    POST   /uploads?filename=grades.xlsx       بارگذاری فایل (بدنه خام درخواست)
+    GET    /uploads/{hash}                     خلاصه فایل: ردیف‌ها، دروس و کلاس‌ها
+    DELETE /uploads/{hash}                     حذف فایل و نتایج کش‌شده آن
+    GET    /uploads/{hash}/subjects            تحلیل همه دروس (?class=)
+    GET    /uploads/{hash}/subjects/{subject}  تحلیل یک درس (?class=)
+    GET    /uploads/{hash}/compare             مقایسه دو کلاس (?subject=&class1=&class2=)
+    GET    /uploads/{hash}/at-risk             دانش‌آموزان نیازمند حمایت (?min_score=&min_weak_subjects=&limit=)
+    GET    /uploads/{hash}/reports/{subject}   گزارش معلم (?teacher=&class=)
+    GET    /health                             وضعیت سرویس و کش
+
+برنامه یک ASGI خام و بدون وابستگی است و با هر سرور ASGI (مثلاً uvicorn در
+فرمان serve) اجرا می‌شود. پاسخ هر درخواست GET یک بار ساخته، به JSON (و
+gzip) تبدیل و در AnalysisCache مشترک نگه داشته می‌شود؛ درخواست تکراری بدون
+محاسبه و بدون ترک حلقه رویداد پاسخ داده می‌شود. محاسبه‌ها در thread جدا
+اجرا می‌شوند و تعداد هم‌زمانشان با یک semaphore محدود است؛ وقتی صف انتظار
+پر باشد پاسخ 503 برمی‌گردد.
+"""
+import asyncio
+import gzip
+import json
+import logging
+import math
+import os
+import re
+import time
+from datetime import datetime
+from urllib.parse import parse_qs
+
+import numpy as np
+import pandas as pd
+
+from .analysis import compare_classes, cube_analyses, cube_analysis
+from .cache import AnalysisCache, make_key
+from .cube import build_stats_cube
+from .ingest import ingest_upload, read_snapshot, remove_snapshot, snapshot_path
+from .ranking import build_rank_index
+from .reports import DATE_FORMAT, generate_all_reports, generate_teacher_report
+from .risk import MIN_WEAK_SUBJECTS, WEAK_SCORE, detect_at_risk_students
+from .rules import load_rules
+
+# تعداد محاسبه‌های هم‌زمان و حداکثر درخواست‌های منتظر
+DEFAULT_CONCURRENCY = int(os.environ.get('GRADE_ANALYZER_SERVICE_CONCURRENCY', '4'))
+MAX_PENDING_REQUESTS = int(os.environ.get('GRADE_ANALYZER_SERVICE_QUEUE', '64'))
+
+# حداکثر حجم فایل بارگذاری‌شده (مگابایت)
+MAX_UPLOAD_MB = int(os.environ.get('GRADE_ANALYZER_MAX_UPLOAD_MB', '100'))
+
+# پاسخ‌های کوچک‌تر از این حجم فشرده نمی‌شوند
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+
+UPLOAD_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPError(Exception):
+    """خطای درخواست با کد وضعیت HTTP"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def to_jsonable(value):
+    """تبدیل نتیجه تحلیل به ساختار JSON (انواع NumPy به پایتون، NaN به null)"""
+    if isinstance(value, dict):
+        return {str(k): to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [to_jsonable(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return to_jsonable(value.tolist())
+    if isinstance(value, pd.DataFrame):
+        return to_jsonable(value.to_dict(orient='records'))
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def encode_response(data, status=200):
+    """پاسخ آماده ارسال: بدنه JSON و نسخه gzip آن (برای پاسخ‌های بزرگ)"""
+    body = json.dumps(to_jsonable(data), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    compressed = gzip.compress(body, GZIP_LEVEL) if len(body) >= GZIP_MIN_BYTES else None
+    return {'status': status, 'body': body, 'gzip': compressed}
+
+
+def _param(params, name, default=None):
+    values = params.get(name)
+    return values[0] if values else default
+
+
+def _number(params, name, default, kind=float, minimum=None):
+    value = _param(params, name)
+    if value is None:
+        return default
+    try:
+        number = kind(value)
+    except ValueError:
+        raise HTTPError(400, f"مقدار نامعتبر برای {name}: {value}") from None
+    if not math.isfinite(number) or (minimum is not None and number < minimum):
+        raise HTTPError(400, f"مقدار {name} باید عددی بزرگ‌تر یا مساوی {minimum} باشد: {value}")
+    return number
+
+
+# مسیرها: (متد، الگو، نام تابع پاسخ، پاسخ کش‌شدنی)
+_HASH = r'/uploads/(?P<file_hash>[0-9a-f]+)'
+ROUTES = [
+    ('GET', re.compile(r'^/health$'), 'health', False),
+    ('POST', re.compile(r'^/uploads$'), 'upload', False),
+    ('GET', re.compile(rf'^{_HASH}$'), 'summary', True),
+    ('DELETE', re.compile(rf'^{_HASH}$'), 'delete', False),
+    ('GET', re.compile(rf'^{_HASH}/subjects$'), 'subjects', True),
+    ('GET', re.compile(rf'^{_HASH}/subjects/(?P<subject>[^/]+)$'), 'subject', True),
+    ('GET', re.compile(rf'^{_HASH}/compare$'), 'compare', True),
+    ('GET', re.compile(rf'^{_HASH}/at-risk$'), 'at_risk', True),
+    ('GET', re.compile(rf'^{_HASH}/reports/(?P<subject>[^/]+)$'), 'report', True),
+]
+
+
+class AnalysisService:
+    """برنامه ASGI سرویس تحلیل با کش نتایج مشترک بین همه درخواست‌ها"""
+
+    def __init__(self, cache=None, concurrency=DEFAULT_CONCURRENCY, max_pending=MAX_PENDING_REQUESTS,
+                 max_upload_bytes=MAX_UPLOAD_MB * 1024 * 1024, snapshot_dir=None):
+        self.cache = cache if cache is not None else AnalysisCache()
+        self.concurrency = max(1, concurrency)
+        self.max_pending = max_pending
+        self.max_upload_bytes = max_upload_bytes
+        self.snapshot_dir = snapshot_dir
+        self.requests = 0
+        self.pending = 0
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            self.requests += 1
+            try:
+                response = await self._dispatch(scope, receive)
+            except HTTPError as e:
+                response = encode_response({'error': e.message}, e.status)
+            except Exception as e:
+                logger.exception("خطای سرویس در %s", scope.get('path'))
+                response = encode_response({'error': f"{type(e).__name__}: {e}"}, 500)
+            await self._send(scope, send, response)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _dispatch(self, scope, receive):
+        path = scope['path'].rstrip('/') or '/'
+        method = 'GET' if scope['method'] == 'HEAD' else scope['method']
+        matched = False
+        for route_method, pattern, name, cached in ROUTES:
+            match = pattern.match(path)
+            if match is not None:
+                matched = True
+                if method == route_method:
+                    break
+        else:
+            raise HTTPError(405, "متد پشتیبانی نمی‌شود") if matched else HTTPError(404, "مسیر یافت نشد")
+
+        params = parse_qs(scope.get('query_string', b'').decode('utf-8'))
+        args = match.groupdict()
+        handler = getattr(self, f'_route_{name}')
+        if name == 'health':
+            return encode_response(handler(params))
+        if name == 'upload':
+            args['data'] = await self._read_body(receive)
+            args['headers'] = dict(scope.get('headers', []))
+        status = 201 if method == 'POST' else 200
+        if not cached:
+            return await self._run(lambda: encode_response(handler(params, **args), status))
+
+        # پاسخ کش‌شده بدون رفتن به thread برگردانده می‌شود
+        query = tuple(sorted((key, tuple(values)) for key, values in params.items()))
+        key = make_key(args['file_hash'], 'http', name, args.get('subject'), query,
+                       load_rules()['fingerprint'], datetime.now().strftime(DATE_FORMAT))
+        response = self.cache.get(key)
+        if response is not None:
+            return response
+        return await self._run(lambda: self.cache.get_or_compute(
+            key, lambda: encode_response(handler(params, **args))))
+
+    async def _run(self, func):
+        """اجرای محاسبه در thread با سقف هم‌زمانی"""
+        if self.pending >= self.concurrency + self.max_pending:
+            raise HTTPError(503, "سرویس مشغول است؛ کمی بعد دوباره تلاش کنید")
+        self.pending += 1
+        try:
+            async with self._semaphore:
+                return await asyncio.to_thread(func)
+        finally:
+            self.pending -= 1
+
+    async def _read_body(self, receive):
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                raise HTTPError(400, "اتصال قطع شد")
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > self.max_upload_bytes:
+                raise HTTPError(413, f"حجم فایل بیشتر از {self.max_upload_bytes // (1024 * 1024)} مگابایت است")
+            chunks.append(chunk)
+            if not message.get('more_body'):
+                return b''.join(chunks)
+
+    async def _send(self, scope, send, response):
+        body = response['body']
+        headers = [(b'content-type', b'application/json; charset=utf-8'), (b'vary', b'accept-encoding')]
+        accept = dict(scope.get('headers', [])).get(b'accept-encoding', b'')
+        if response['gzip'] is not None and b'gzip' in accept:
+            body = response['gzip']
+            headers.append((b'content-encoding', b'gzip'))
+        if response['status'] == 503:
+            headers.append((b'retry-after', b'1'))
+        headers.append((b'content-length', str(len(body)).encode()))
+        await send({'type': 'http.response.start', 'status': response['status'], 'headers': headers})
+        await send({'type': 'http.response.body', 'body': b'' if scope['method'] == 'HEAD' else body})
+
+    # داده‌های هر فایل در کش مشترک (با همان کلیدها و مقادیر برنامه streamlit)
+
+    def frame(self, file_hash):
+        """DataFrame فایل بارگذاری‌شده؛ اگر از کش حذف شده باشد از snapshot خوانده می‌شود"""
+        ingest = self.cache.get(make_key(file_hash, 'frame'))
+        if ingest is None:
+            start = time.perf_counter()
+            df = read_snapshot(snapshot_path(file_hash, self.snapshot_dir))
+            if df is None:
+                raise HTTPError(404, "فایلی با این شناسه یافت نشد؛ دوباره بارگذاری کنید")
+            ingest = {'frame': df, 'hash': file_hash, 'source': 'snapshot',
+                      'timings': {'snapshot_read': time.perf_counter() - start}}
+            self.cache.put(make_key(file_hash, 'frame'), ingest)
+        return ingest['frame']
+
+    def cube(self, file_hash):
+        """مکعب آمار فایل"""
+        df = self.frame(file_hash)
+        return self.cache.get_or_compute(make_key(file_hash, 'cube'), lambda: build_stats_cube(df))
+
+    def ranks(self, file_hash):
+        """شاخص رتبه فایل"""
+        df, cube = self.frame(file_hash), self.cube(file_hash)
+        return self.cache.get_or_compute(make_key(file_hash, 'ranks'), lambda: build_rank_index(df, cube))
+
+    def class_labels(self, file_hash):
+        """برچسب هر کلاس مکعب با کلید متنی آن (پارامترهای آدرس همیشه متن‌اند)"""
+        cube = self.cube(file_hash)
+        return self.cache.get_or_compute(make_key(file_hash, 'class_labels'),
+                                         lambda: {str(c): c for c in cube['classes']})
+
+    def _check(self, file_hash, subject=None):
+        cube = self.cube(file_hash)
+        if subject is not None and subject not in cube['subject_index']:
+            raise HTTPError(404, f"درس یافت نشد: {subject}")
+        return cube
+
+    def _class(self, file_hash, class_name):
+        """برچسب کلاس در مکعب برای پارامتر متنی (مثلاً '101' برای کلاس عددی 101)"""
+        if class_name is None:
+            return None
+        label = self.class_labels(file_hash).get(class_name)
+        if label is None:
+            raise HTTPError(404, f"کلاس یافت نشد: {class_name}")
+        return label
+
+    # پاسخ هر مسیر
+
+    def _route_health(self, params):
+        return {'status': 'ok', 'requests': self.requests, 'pending': self.pending,
+                'concurrency': self.concurrency, 'cache': self.cache.info()}
+
+    def _route_upload(self, params, data, headers):
+        filename = _param(params, 'filename') or headers.get(b'x-filename', b'').decode('utf-8')
+        if not filename.lower().endswith(UPLOAD_EXTENSIONS):
+            raise HTTPError(400, f"نام فایل (filename) باید با یکی از {'، '.join(UPLOAD_EXTENSIONS)} تمام شود")
+        if not data:
+            raise HTTPError(400, "فایل خالی است")
+        try:
+            ingest = ingest_upload(data, filename, snapshot_dir=self.snapshot_dir)
+        except Exception as e:
+            raise HTTPError(400, f"فایل قابل خواندن نیست: {e}") from None
+        self.cache.put(make_key(ingest['hash'], 'frame'), ingest)
+        return {**self._route_summary(params, ingest['hash']), 'source': ingest['source']}
+
+    def _route_summary(self, params, file_hash):
+        df = self.frame(file_hash)
+        cube = self.cube(file_hash)
+        return {
+            'hash': file_hash,
+            'rows': len(df),
+            'subjects': cube['subjects'],
+            'classes': cube['classes'],
+        }
+
+    def _route_delete(self, params, file_hash):
+        removed = self.cache.invalidate(file_hash)
+        if not remove_snapshot(file_hash, self.snapshot_dir) and not removed:
+            raise HTTPError(404, "فایلی با این شناسه یافت نشد")
+        return {'hash': file_hash, 'deleted': True}
+
+    def _route_subjects(self, params, file_hash):
+        cube = self._check(file_hash)
+        return cube_analyses(cube, self._class(file_hash, _param(params, 'class')))
+
+    def _route_subject(self, params, file_hash, subject):
+        cube = self._check(file_hash, subject)
+        class_name = self._class(file_hash, _param(params, 'class'))
+        analysis = cube_analysis(cube, subject, class_name)
+        if analysis is None:
+            raise HTTPError(404, f"نمره کافی برای تحلیل {subject} وجود ندارد")
+        return {'subject': subject, 'class': class_name, **analysis}
+
+    def _route_compare(self, params, file_hash):
+        subject, class1, class2 = (_param(params, name) for name in ('subject', 'class1', 'class2'))
+        if not (subject and class1 and class2):
+            raise HTTPError(400, "پارامترهای subject، class1 و class2 لازم‌اند")
+        cube = self._check(file_hash, subject)
+        class1, class2 = self._class(file_hash, class1), self._class(file_hash, class2)
+        comparison = compare_classes(self.frame(file_hash), class1, class2, subject, cube=cube)
+        if comparison is None:
+            raise HTTPError(404, "نمره کافی برای مقایسه این دو کلاس وجود ندارد")
+        return comparison
+
+    def _route_at_risk(self, params, file_hash):
+        df = self.frame(file_hash)
+        subjects = self._check(file_hash)['subjects']
+        min_score = _number(params, 'min_score', WEAK_SCORE, minimum=0)
+        min_weak_subjects = _number(params, 'min_weak_subjects', MIN_WEAK_SUBJECTS, int, minimum=1)
+        limit = _number(params, 'limit', None, int, minimum=1)
+        table = detect_at_risk_students(df, subjects, min_score, min_weak_subjects)
+        students = table if limit is None else table.head(limit)
+        return {
+            'min_score': min_score,
+            'min_weak_subjects': min_weak_subjects,
+            'count': len(table),
+            'students': students.reset_index(names='ردیف'),
+        }
+
+    def _route_report(self, params, file_hash, subject):
+        df = self.frame(file_hash)
+        teacher = _param(params, 'teacher', '')
+        cube = self._check(file_hash, subject)
+        class_name = self._class(file_hash, _param(params, 'class'))
+        if class_name is None:
+            report = generate_teacher_report(df, subject, teacher, cube=cube, ranks=self.ranks(file_hash))
+        else:
+            # گزارش‌های کلاسی همه دروس یک بار ساخته و کش می‌شوند
+            all_reports = self.cache.get_or_compute(
+                make_key(file_hash, 'all_reports', load_rules()['fingerprint'],
+                         datetime.now().strftime(DATE_FORMAT)),
+                lambda: generate_all_reports(df, cube=cube, ranks=self.ranks(file_hash)))
+            report = next((dict(report, teacher=teacher) for report in all_reports
+                           if report['subject'] == subject and report['class'] == class_name), None)
+        if report is None:
+            raise HTTPError(404, f"نمره کافی برای گزارش {subject} وجود ندارد")
+        return report
+
+
+def create_app(**options):
+    """برنامه ASGI سرویس (برای uvicorn: ‎--factory grade_analyzer.service:create_app)"""
+    return AnalysisService(**options)
@@ -0,0 +1,274 @@
+"""آمار تقریبی چارک‌ها با خلاصه‌های ادغام‌پذیر KLL
+
+برای جمع‌بندی منطقه‌ای (میلیون‌ها نمره از چند مدرسه) لازم نیست همه نمرات
+مرتب در حافظه باشند: هر فایل به یک خلاصه با اندازه ثابت تبدیل می‌شود و
+خلاصه‌های مدارس بدون خواندن دوباره نمرات با هم ادغام می‌شوند. خطای رتبه
+چارک‌ها حدود 1.7/k از تعداد نمرات است (برای k=200 کمتر از یک درصد).
+تعداد، میانگین، انحراف معیار، حداقل و حداکثر دقیق نگه داشته می‌شوند.
+
+روش دقیق (calculate_iqr_statistics و مکعب آمار) همچنان پیش‌فرض است.
+"""
+import json
+import math
+
+import numpy as np
+import pandas as pd
+
+from .export import CLASS_STAT_COLUMNS
+from .ingest import CSV_CHUNK_ROWS, ingest_upload
+from .profiling import profiled
+from .stats import MIN_COUNT, get_subject_columns
+
+SKETCH_K = 200
+SKETCH_VERSION = 1
+
+# نسبت کاهش ظرفیت سطح‌های پایین‌تر در KLL
+_DECAY = 2 / 3
+
+
+class QuantileSketch:
+    """خلاصه چارکی KLL برای یک ستون نمره
+
+    نمرات در سطح‌هایی نگه داشته می‌شوند که وزن هر عضو سطح h برابر 2**h
+    است. وقتی سطحی از ظرفیتش بیشتر شود مرتب و نصف می‌شود (یک در میان با
+    شروع تصادفی) و نیمه باقی‌مانده به سطح بالاتر می‌رود.
+    """
+
+    def __init__(self, k=SKETCH_K, seed=None):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self.total = 0.0
+        self.total_squares = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._rng = np.random.default_rng(seed)
+
+    @classmethod
+    def from_values(cls, values, k=SKETCH_K, seed=None):
+        sketch = cls(k, seed)
+        sketch.update(values)
+        return sketch
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * _DECAY ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                items = np.sort(items)
+                # با تعداد فرد، یک عضو در همین سطح می‌ماند
+                kept = items[:len(items) % 2]
+                paired = items[len(items) % 2:]
+                promoted = paired[self._rng.integers(2)::2]
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[level] = kept
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def update(self, values):
+        """افزودن یک دسته نمره (مقادیر خالی نادیده گرفته می‌شوند)"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.total_squares += float(np.dot(values, values))
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """ادغام خلاصه دیگر در این خلاصه"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self.total += other.total
+        self.total_squares += other.total_squares
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _weighted(self):
+        """اعضای مرتب و وزن تجمعی آن‌ها"""
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2 ** level, dtype=np.int64)
+                                  for level, items in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        return items[order], np.cumsum(weights[order])
+
+    def quantiles(self, qs):
+        """چندک‌های تقریبی (بین 0 و 1)؛ چندک 0 و 1 دقیقاً حداقل و حداکثرند"""
+        qs = np.asarray(qs, dtype=np.float64)
+        if not self.count:
+            return np.full(qs.shape, np.nan)
+        items, cumulative = self._weighted()
+        ranks = qs * cumulative[-1]
+        positions = np.minimum(np.searchsorted(cumulative, ranks, side='left'), len(items) - 1)
+        result = items[positions]
+        result = np.where(qs <= 0, self.min, result)
+        return np.where(qs >= 1, self.max, result)
+
+    def quantile(self, q):
+        return float(self.quantiles([q])[0])
+
+    def rank(self, value, inclusive=False):
+        """سهم تقریبی نمرات کمتر از value (یا کمتر/مساوی با inclusive)"""
+        if not self.count:
+            return 0.0
+        items, cumulative = self._weighted()
+        position = np.searchsorted(items, value, side='right' if inclusive else 'left')
+        return float(cumulative[position - 1] / cumulative[-1]) if position else 0.0
+
+    @property
+    def size(self):
+        """تعداد اعضای نگه‌داشته‌شده (مستقل از تعداد نمرات)"""
+        return sum(len(items) for items in self.levels)
+
+    def statistics(self):
+        """آمار IQR تقریبی با همان کلیدهای calculate_iqr_statistics
+
+        فهرست نمرات پرت در دسترس نیست و تعداد آن‌ها از رتبه حدود تخمین زده
+        می‌شود.
+        """
+        if self.count < MIN_COUNT:
+            return None
+        q1, median, q3 = (float(value) for value in self.quantiles([0.25, 0.5, 0.75]))
+        iqr = q3 - q1
+        lower_bound, upper_bound = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+        outlier_share = self.rank(lower_bound) + 1 - self.rank(upper_bound, inclusive=True)
+        mean = self.total / self.count
+        variance = max(self.total_squares / self.count - mean ** 2, 0.0)
+        return {
+            'count': self.count,
+            'mean': mean,
+            'median': median,
+            'std': math.sqrt(variance),
+            'min': self.min,
+            'max': self.max,
+            'q1': q1,
+            'q3': q3,
+            'iqr': iqr,
+            'lower_bound': lower_bound,
+            'upper_bound': upper_bound,
+            'outliers': [],
+            'outlier_count': int(round(outlier_share * self.count)),
+            'outlier_percent': outlier_share * 100,
+            'approximate': True,
+        }
+
+    def to_dict(self):
+        return {
+            'version': SKETCH_VERSION,
+            'k': self.k,
+            'count': self.count,
+            'total': self.total,
+            'total_squares': self.total_squares,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+            'levels': [items.tolist() for items in self.levels],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['k'])
+        sketch.levels = [np.asarray(items, dtype=np.float64) for items in data['levels']]
+        sketch.count = data['count']
+        sketch.total = data['total']
+        sketch.total_squares = data['total_squares']
+        if sketch.count:
+            sketch.min, sketch.max = data['min'], data['max']
+        return sketch
+
+
+def update_sketches(sketches, df, subjects=None, k=SKETCH_K):
+    """افزودن نمرات یک DataFrame (یا یک تکه از فایل) به خلاصه‌های هر درس"""
+    if subjects is None:
+        subjects = get_subject_columns(df)
+    for subject in subjects:
+        if subject not in df.columns:
+            continue
+        if subject not in sketches:
+            sketches[subject] = QuantileSketch(k)
+        sketches[subject].update(pd.to_numeric(df[subject], errors='coerce').to_numpy(dtype=np.float64))
+    return sketches
+
+
+def sketch_frame(df, subjects=None, k=SKETCH_K):
+    """خلاصه‌های هر درس یک DataFrame"""
+    return update_sketches({}, df, subjects, k)
+
+
+@profiled()
+def sketch_file(path, subjects=None, k=SKETCH_K, chunk_rows=CSV_CHUNK_ROWS):
+    """خلاصه‌های هر درس یک فایل نمرات
+
+    فایل CSV تکه‌تکه خوانده می‌شود و در هر لحظه فقط یک تکه در حافظه است؛
+    فایل اکسل یک‌جا خوانده می‌شود.
+    """
+    if str(path).lower().endswith('.csv'):
+        sketches = {}
+        for chunk in pd.read_csv(path, chunksize=chunk_rows, encoding='utf-8-sig'):
+            update_sketches(sketches, chunk, subjects, k)
+        return sketches
+    with open(path, 'rb') as f:
+        data = f.read()
+    return sketch_frame(ingest_upload(data, str(path))['frame'], subjects, k)
+
+
+def merge_sketches(sketch_sets):
+    """ادغام چند مجموعه خلاصه {درس: خلاصه} (مثلاً مدارس یک منطقه)"""
+    merged = {}
+    for sketches in sketch_sets:
+        for subject, sketch in sketches.items():
+            if subject in merged:
+                merged[subject].merge(sketch)
+            else:
+                merged[subject] = QuantileSketch.from_dict(sketch.to_dict())
+    return merged
+
+
+def sketch_statistics(sketches):
+    """آمار تقریبی هر درس از خلاصه‌ها"""
+    return {subject: sketch.statistics() for subject, sketch in sketches.items()}
+
+
+def sketch_table(sketches):
+    """جدول آمار تقریبی هر درس با همان عنوان‌های خروجی اکسل"""
+    rows = []
+    for subject, stats in sketch_statistics(sketches).items():
+        if stats:
+            rows.append({'درس': subject, **{label: round(float(stats[metric]), 2)
+                                            for metric, label in CLASS_STAT_COLUMNS.items()}})
+    return pd.DataFrame(rows, columns=['درس', *CLASS_STAT_COLUMNS.values()])
+
+
+def save_sketches(sketches, path, source=None):
+    """ذخیره خلاصه‌ها در فایل JSON"""
+    data = {
+        'version': SKETCH_VERSION,
+        'source': source,
+        'subjects': {subject: sketch.to_dict() for subject, sketch in sketches.items()},
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    return path
+
+
+def load_sketches(path):
+    """خواندن خلاصه‌های ذخیره‌شده با save_sketches"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('version') != SKETCH_VERSION:
+        raise ValueError(f"نسخه فایل خلاصه پشتیبانی نمی‌شود: {data.get('version')}")
+    return {subject: QuantileSketch.from_dict(item) for subject, item in data['subjects'].items()}
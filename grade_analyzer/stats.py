@@ -0,0 +1,180 @@
+import numpy as np
+import pandas as pd
+
+# نام ستون کلاس در فایل نمرات
+CLASS_COLUMN = 'کلاس'
+
+# ستون‌های شناسه یکتای دانش‌آموز (در صورت وجود در فایل)
+STUDENT_ID_COLUMNS = ['کد دانش‌آموز', 'شماره دانش‌آموزی', 'کد ملی']
+
+# ستون‌هایی که نمره درس نیستند
+NON_SUBJECT_COLUMNS = ['ردیف', 'کلاس', 'نام', 'نام خانوادگی', 'معدل', 'متنمعدل', 'حروفی', 'انضباط', 'جمع',
+                       *STUDENT_ID_COLUMNS]
+
+# حداقل تعداد نمره برای محاسبه چارک‌ها
+MIN_COUNT = 3
+
+
+def get_subject_columns(df):
+    """فهرست ستون‌های نمره دروس"""
+    return [col for col in df.columns if col not in NON_SUBJECT_COLUMNS]
+
+
+def score_dtype(df, subjects):
+    """نوع فشرده ماتریس نمرات: float32 اگر همه دروس float32 باشند (خروجی normalize_frame)"""
+    dtypes = [df[subject].dtype for subject in subjects]
+    return np.float32 if dtypes and all(dtype == np.float32 for dtype in dtypes) else np.float64
+
+
+def score_matrix(df, subjects, dtype=np.float64):
+    """ساخت ماتریس دوبعدی نمرات (ردیف: دانش‌آموز، ستون: درس)"""
+    block = df[list(subjects)]
+    if not all(pd.api.types.is_numeric_dtype(dtype) for dtype in block.dtypes):
+        block = block.apply(pd.to_numeric, errors='coerce')
+    # ترتیب ستونی تا هر درس یک بلوک پیوسته در حافظه باشد
+    return np.asfortranarray(block.to_numpy(dtype=dtype, na_value=np.nan))
+
+
+def _half_median(sorted_matrix, start, length):
+    """میانه بخشی از هر ستون مرتب‌شده که از start شروع و length عضو دارد"""
+    cols = np.arange(sorted_matrix.shape[1])
+    # بخش خالی (مثلاً نیمه بالای ستون تک‌عضوی) به اندیس معتبر محدود می‌شود؛ نتیجه آن استفاده نمی‌شود
+    last = len(sorted_matrix) - 1
+    lo = np.clip(start + (length - 1) // 2, 0, last)
+    hi = np.clip(start + length // 2, 0, last)
+    return (sorted_matrix[lo, cols].astype(np.float64) + sorted_matrix[hi, cols]) / 2
+
+
+def batch_iqr_statistics(matrix):
+    """محاسبه آمار IQR همه ستون‌های یک ماتریس در یک گذر برداری
+
+    مقادیر NaN نادیده گرفته می‌شوند. چارک‌ها به روش میانه دو نیمه
+    (همان روش calculate_iqr_statistics) محاسبه می‌شوند. ماتریس float32 با
+    همان نوع مرتب و نگه داشته می‌شود ولی همه آماره‌ها با float64 محاسبه
+    می‌شوند، پس نتیجه با ورودی float64 همان مقادیر یکسان است.
+    """
+    matrix = np.asarray(matrix)
+    if matrix.dtype != np.float32:
+        matrix = matrix.astype(np.float64, copy=False)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(-1, 1)
+
+    valid = ~np.isnan(matrix)
+    count = valid.sum(axis=0)
+    # NaN ها در انتهای هر ستون مرتب‌شده قرار می‌گیرند
+    sorted_matrix = np.sort(matrix, axis=0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        median = _half_median(sorted_matrix, 0, count) if len(matrix) else np.full(len(count), np.nan)
+        half = count // 2
+        if len(matrix):
+            q1 = _half_median(sorted_matrix, 0, half)
+            q3 = _half_median(sorted_matrix, count - half, half)
+        else:
+            q1 = q3 = np.full(len(count), np.nan)
+
+        filled = np.where(valid, matrix, 0.0)
+        safe_count = np.maximum(count, 1)
+        mean = filled.sum(axis=0, dtype=np.float64) / safe_count
+        deviation = np.where(valid, matrix - mean, 0.0)
+        std = np.sqrt((deviation ** 2).sum(axis=0) / safe_count)
+
+        iqr = q3 - q1
+        lower_bound = q1 - 1.5 * iqr
+        upper_bound = q3 + 1.5 * iqr
+        outlier_mask = valid & ((matrix < lower_bound) | (matrix > upper_bound))
+        outlier_count = outlier_mask.sum(axis=0)
+
+    ok = count >= MIN_COUNT
+    if len(matrix):
+        col_min = np.where(count > 0, sorted_matrix[0], np.nan).astype(np.float64)
+        col_max = sorted_matrix[np.maximum(count - 1, 0), np.arange(len(count))].astype(np.float64)
+    else:
+        col_min = col_max = np.full(len(count), np.nan)
+    return {
+        'valid': ok,
+        'count': count,
+        'mean': mean,
+        'median': median,
+        'std': std,
+        'min': col_min,
+        'max': col_max,
+        'q1': q1,
+        'q3': q3,
+        'iqr': iqr,
+        'lower_bound': lower_bound,
+        'upper_bound': upper_bound,
+        'outlier_mask': outlier_mask & ok,
+        'outlier_count': np.where(ok, outlier_count, 0),
+        'outlier_percent': np.where(ok, outlier_count / safe_count * 100, 0.0),
+        'sorted': sorted_matrix,
+    }
+
+
+def stats_view(batch, j):
+    """نمای دیکشنری آمار ستون j (سازگار با خروجی calculate_iqr_statistics)"""
+    if not batch['valid'][j]:
+        return None
+    n = int(batch['count'][j])
+    sorted_col = batch['sorted'][:n, j]
+    lower, upper = batch['lower_bound'][j], batch['upper_bound'][j]
+    outliers = sorted_col[(sorted_col < lower) | (sorted_col > upper)].tolist()
+    return {
+        'count': n,
+        'mean': float(batch['mean'][j]),
+        'median': float(batch['median'][j]),
+        'std': float(batch['std'][j]),
+        'min': float(batch['min'][j]),
+        'max': float(batch['max'][j]),
+        'q1': float(batch['q1'][j]),
+        'q3': float(batch['q3'][j]),
+        'iqr': float(batch['iqr'][j]),
+        'lower_bound': float(lower),
+        'upper_bound': float(upper),
+        'outliers': outliers,
+        'outlier_count': len(outliers),
+        'outlier_percent': len(outliers) / n * 100,
+    }
+
+
+def batch_columns(batch, columns):
+    """زیرمجموعه‌ای از ستون‌های یک دسته آماری (بدون محاسبه دوباره)"""
+    columns = list(columns)
+    return {key: value[:, columns] if value.ndim == 2 else value[columns]
+            for key, value in batch.items() if isinstance(value, np.ndarray)}
+
+
+def subject_statistics(df, subjects=None):
+    """آمار همه دروس یک DataFrame در یک گذر"""
+    if subjects is None:
+        subjects = get_subject_columns(df)
+    subjects = list(subjects)
+    batch = batch_iqr_statistics(score_matrix(df, subjects))
+    batch['subjects'] = subjects
+    batch['index'] = {subject: j for j, subject in enumerate(subjects)}
+    return batch
+
+
+def subject_view(batch, subject):
+    """آمار یک درس از نتیجه subject_statistics"""
+    j = batch['index'].get(subject)
+    if j is None:
+        return None
+    return stats_view(batch, j)
+
+
+def calculate_iqr_statistics(data, method='exact'):
+    """محاسبه آمار IQR برای یک سری داده
+
+    با method='sketch' چارک‌ها از خلاصه KLL (grade_analyzer.sketch) با حافظه
+    ثابت و خطای رتبه محدود تخمین زده می‌شوند.
+    """
+    if len(data) < MIN_COUNT:
+        return None
+    if method == 'sketch':
+        from .sketch import QuantileSketch
+
+        return QuantileSketch.from_values(data).statistics()
+    if method != 'exact':
+        raise ValueError(f"روش نامعتبر: {method}")
+    return stats_view(batch_iqr_statistics(np.asarray(data, dtype=np.float64)), 0)
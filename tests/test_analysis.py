@@ -0,0 +1,25 @@
+from grade_analyzer.analysis import analyze_subject_scores, compare_classes, cube_analyses, cube_analysis
+from grade_analyzer.cube import build_stats_cube
+
+from .test_cube import grade_sheet
+
+
+def test_cube_analysis_matches_all_subject_evaluation():
+    df = grade_sheet([30, 12, 2, 1])
+    cube = build_stats_cube(df)
+    for class_name in [None, *cube['classes']]:
+        analyses = cube_analyses(cube, class_name)
+        for subject in cube['subjects']:
+            assert cube_analysis(cube, subject, class_name) == analyses[subject]
+    assert cube_analysis(cube, 'ریاضی') == analyze_subject_scores(df, 'ریاضی')
+    assert cube_analysis(cube, 'فیزیک') is None
+    assert cube_analysis(cube, 'ریاضی', '999') is None
+
+
+def test_compare_classes_with_and_without_cube():
+    df = grade_sheet([25, 18, 1])
+    cube = build_stats_cube(df)
+    with_cube = compare_classes(df, '101', '102', 'ریاضی', cube=cube)
+    assert with_cube == compare_classes(df, '101', '102', 'ریاضی')
+    assert with_cube['class1']['stats']['count'] == 25
+    assert compare_classes(df, '101', '103', 'ریاضی', cube=cube) is None
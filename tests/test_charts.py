@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from grade_analyzer.charts import box_summary, cube_box, cube_histogram, histogram_bins
+from grade_analyzer.cube import build_stats_cube
+from grade_analyzer.stats import calculate_iqr_statistics
+
+from .test_cube import grade_sheet
+
+
+def chart_sheet():
+    df = grade_sheet([300, 40, 1], seed=12)
+    # نمرات روی مرز بازه‌ها و نمرات پرت در هر دو طرف
+    df.loc[:9, 'ریاضی'] = [0.0, 0.0, 20.0, 20.0, 10.0, 10.0, 5.0, 15.0, 0.5, 19.5]
+    df.loc[10:40, 'علوم'] = 2.0
+    return df
+
+
+def test_histogram_matches_numpy():
+    df = chart_sheet()
+    cube = build_stats_cube(df)
+    for subject in ['ریاضی', 'علوم', 'ادبیات']:
+        for class_name in [None, '101', '102']:
+            block = df if class_name is None else df[df['کلاس'] == class_name]
+            scores = block[subject].dropna().to_numpy()
+            for nbins, score_range in [(20, None), (7, None), (20, (0.0, 20.0))]:
+                histogram = cube_histogram(cube, subject, class_name, nbins, score_range)
+                counts, edges = np.histogram(scores, nbins, score_range)
+                np.testing.assert_array_equal(histogram['counts'], counts)
+                np.testing.assert_allclose(histogram['edges'], edges)
+                assert histogram['total'] == len(scores)
+    # کلاس تک‌نفره آمار معتبر ندارد
+    assert cube_histogram(cube, 'ریاضی', '103') is None
+    single = histogram_bins(np.array([12.0, 12.0]), 4)
+    assert single['total'] == 2 and single['edges'][0] < 12.0 < single['edges'][-1]
+
+
+def reference_box(scores):
+    """سبیل‌ها و نمرات پرت مستقیم از نمرات خام و حدود calculate_iqr_statistics"""
+    stats = calculate_iqr_statistics(scores.tolist())
+    inside = scores[(scores >= stats['lower_bound']) & (scores <= stats['upper_bound'])]
+    outliers = np.sort(scores[(scores < stats['lower_bound']) | (scores > stats['upper_bound'])])
+    return stats, inside.min(), inside.max(), outliers
+
+
+def test_box_matches_raw_scores():
+    df = chart_sheet()
+    cube = build_stats_cube(df)
+    for subject in ['ریاضی', 'علوم', 'ادبیات']:
+        for class_name in [None, '101', '102']:
+            block = df if class_name is None else df[df['کلاس'] == class_name]
+            scores = block[subject].dropna().to_numpy()
+            stats, low, high, outliers = reference_box(scores)
+            box = cube_box(cube, subject, class_name)
+            for key in ('q1', 'median', 'q3', 'mean', 'count'):
+                assert box[key] == pytest.approx(stats[key])
+            assert (box['lower_fence'], box['upper_fence']) == pytest.approx((low, high))
+            assert box['outlier_count'] == len(outliers) == stats['outlier_count']
+            np.testing.assert_allclose(box['outliers'], outliers)
+
+
+def test_outliers_are_thinned_evenly():
+    scores = np.sort(np.concatenate([np.full(3000, 10.0), np.linspace(0, 1, 500), np.linspace(19, 20, 500)]))
+    stats = calculate_iqr_statistics(scores.tolist())
+    box = box_summary(scores, stats, max_outliers=50)
+    assert box['outlier_count'] == 1000
+    assert len(box['outliers']) == 50
+    # نقاط نگه‌داشته زیرمجموعه مرتب نمرات پرت و شامل دو سر آن‌هاست
+    assert box['outliers'][0] == 0.0 and box['outliers'][-1] == 20.0
+    assert np.all(np.diff(box['outliers']) >= 0)
+    assert np.isin(box['outliers'], scores[(scores < 5) | (scores > 15)]).all()
+    assert len(box_summary(scores, stats, max_outliers=None)['outliers']) == 1000
@@ -0,0 +1,47 @@
+import os
+
+import pandas as pd
+import pytest
+
+from grade_analyzer.cli import main, output_names
+
+from .test_cube import grade_sheet
+
+
+def write_schools(root, names, seed=0):
+    paths = []
+    for i, name in enumerate(names):
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        grade_sheet([10 + i, 5], seed=seed + i).to_csv(path, index=False)
+        paths.append(str(path))
+    return paths
+
+
+def test_output_names_keep_directories():
+    assert output_names(['a/north/school.csv', 'a/south/school.csv']) == [
+        os.path.join('north', 'school'), os.path.join('south', 'school')]
+    assert output_names(['x/school.csv']) == ['school']
+    with pytest.raises(ValueError):
+        output_names(['a/school.csv', 'a/school.xlsx'])
+    with pytest.raises(ValueError):
+        output_names(['a/school.csv', 'a/school.csv'])
+
+
+def test_batch_with_duplicate_basenames(tmp_path):
+    paths = write_schools(tmp_path / 'in', ['north/school.csv', 'south/school.csv'])
+    out = tmp_path / 'out'
+    assert main(['batch', *paths, '--out', str(out), '--workers', '1', '--pool', 'thread', '--no-reports']) == 0
+    for region, path in zip(['north', 'south'], paths):
+        stats = pd.read_csv(out / region / 'school' / 'subject_statistics.csv')
+        assert stats['تعداد'].sum() == pd.read_csv(path)[['ریاضی', 'علوم', 'ادبیات']].count().sum()
+    summary = pd.read_csv(out / 'batch_summary.csv')
+    assert len(set(summary['out'])) == 2
+
+
+def test_batch_fails_on_collision(tmp_path, capsys):
+    paths = write_schools(tmp_path, ['school.csv'])
+    out = tmp_path / 'out'
+    assert main(['batch', paths[0], paths[0], '--out', str(out), '--workers', '1', '--no-reports']) == 2
+    assert 'school' in capsys.readouterr().err
+    assert not out.exists()
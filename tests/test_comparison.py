@@ -0,0 +1,96 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from grade_analyzer.analysis import compare_classes
+from grade_analyzer.comparison import RANK_METRICS, class_matrix, matrix_frame, top_divergent_pairs
+from grade_analyzer.cube import build_stats_cube
+
+from .test_cube import grade_sheet
+
+
+def comparison_sheet(classes=12):
+    sizes = [int(n) for n in np.random.default_rng(6).integers(8, 40, classes)] + [1]
+    df = grade_sheet(sizes, seed=6)
+    # میانگین متفاوت برای هر کلاس تا جفت‌های پراختلاف معنی داشته باشند
+    shift = df['کلاس'].astype(int) % 7
+    df['ریاضی'] = (df['ریاضی'] * 0.6 + shift).round(2)
+    return df
+
+
+def welch_reference(a, b):
+    """آزمون t ولش و d کوهن «b منهای a» مستقیم از نمرات خام"""
+    na, nb = len(a), len(b)
+    va, vb = np.var(a, ddof=1), np.var(b, ddof=1)
+    diff = np.mean(b) - np.mean(a)
+    se2 = va / na + vb / nb
+    t = diff / np.sqrt(se2)
+    dof = se2 ** 2 / ((va / na) ** 2 / (na - 1) + (vb / nb) ** 2 / (nb - 1))
+    d = diff / np.sqrt(((na - 1) * va + (nb - 1) * vb) / (na + nb - 2))
+    return t, dof, d
+
+
+def class_scores(df, class_name, subject):
+    return df.loc[df['کلاس'] == class_name, subject].dropna().to_numpy()
+
+
+def test_matrix_matches_pairwise_comparisons():
+    df = comparison_sheet()
+    cube = build_stats_cube(df)
+    for subject in ['ریاضی', 'علوم']:
+        matrix = class_matrix(cube, subject)
+        classes = matrix['classes']
+        # کلاس تک‌نفره آمار معتبر ندارد
+        assert len(classes) == len(cube['classes']) - 1
+        for (i, c1), (j, c2) in itertools.permutations(enumerate(classes), 2):
+            comparison = compare_classes(df, c1, c2, subject)
+            s1, s2 = comparison['class1']['stats'], comparison['class2']['stats']
+            for metric in ('mean', 'median', 'std', 'iqr'):
+                assert matrix[f'{metric}_diff'][i, j] == pytest.approx(s2[metric] - s1[metric], abs=1e-9)
+            t, dof, d = welch_reference(class_scores(df, c1, subject), class_scores(df, c2, subject))
+            assert matrix['welch_t'][i, j] == pytest.approx(t, rel=1e-9)
+            assert matrix['welch_df'][i, j] == pytest.approx(dof, rel=1e-9)
+            assert matrix['cohen_d'][i, j] == pytest.approx(d, rel=1e-9)
+        assert np.allclose(np.diag(matrix['mean_diff']), 0) and (np.diag(matrix['p_value']) == 1).all()
+        assert list(matrix_frame(matrix).index) == classes
+
+
+def test_pvalues_match_scipy():
+    stats = pytest.importorskip('scipy.stats')
+    df = comparison_sheet()
+    matrix = class_matrix(build_stats_cube(df), 'ریاضی')
+    for (i, c1), (j, c2) in itertools.combinations(enumerate(matrix['classes']), 2):
+        expected = stats.ttest_ind(class_scores(df, c2, 'ریاضی'), class_scores(df, c1, 'ریاضی'),
+                                   equal_var=False)
+        assert matrix['welch_t'][i, j] == pytest.approx(expected.statistic, rel=1e-9)
+        assert matrix['p_value'][i, j] == pytest.approx(expected.pvalue, rel=1e-6)
+
+
+@pytest.mark.parametrize('metric', RANK_METRICS)
+def test_top_pairs_match_brute_force(metric):
+    df = comparison_sheet(classes=40)
+    cube = build_stats_cube(df)
+    matrix = class_matrix(cube, 'ریاضی')
+    classes = matrix['classes']
+    key = {'mean_diff': 'mean_diff', 'cohen_d': 'cohen_d', 'welch_t': 'welch_t'}[metric]
+    scores = {(classes[i], classes[j]): abs(matrix[key][i, j])
+              for i, j in itertools.combinations(range(len(classes)), 2)}
+    expected = sorted(scores, key=scores.get, reverse=True)[:10]
+    # بلوک کوچک، جست‌وجو را به چند مرحله تقسیم می‌کند
+    for block in (50, 10_000):
+        pairs = top_divergent_pairs(cube, 'ریاضی', k=10, metric=metric, block=block)
+        assert list(zip(pairs['کلاس اول'], pairs['کلاس دوم'])) == expected
+    first = pairs.iloc[0]
+    i, j = classes.index(first['کلاس اول']), classes.index(first['کلاس دوم'])
+    assert first['اختلاف میانگین'] == round(matrix['mean_diff'][i, j], 2)
+    assert first['d کوهن'] == round(matrix['cohen_d'][i, j], 2)
+
+
+def test_top_pairs_edge_cases():
+    df = comparison_sheet(classes=3)
+    cube = build_stats_cube(df)
+    assert len(top_divergent_pairs(cube, 'ریاضی', k=10)) == 3
+    assert top_divergent_pairs(cube, 'فیزیک').empty
+    with pytest.raises(ValueError):
+        top_divergent_pairs(cube, 'ریاضی', metric='median')
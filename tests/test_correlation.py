@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from grade_analyzer.correlation import (
+    MIN_PAIRS,
+    alignment_table,
+    build_correlations,
+    class_alignment_table,
+    correlation_frame,
+    strongest_pairs,
+)
+from grade_analyzer.cube import build_stats_cube
+
+from .test_cube import grade_sheet
+
+
+def correlation_sheet():
+    # بیش از CHUNK_ROWS ردیف تا مرز تکه‌ها هم آزموده شود؛ کلاس 104 تک‌نفره است
+    df = grade_sheet([3000, 1500, 6, 1, 4], seed=11)
+    rng = np.random.default_rng(4)
+    df['ادبیات'] = np.round(0.6 * df['ریاضی'] + rng.normal(4, 2, len(df)), 2)
+    df.loc[rng.random(len(df)) < 0.15, 'ادبیات'] = np.nan
+    df['معدل'] = np.round(df[['ریاضی', 'علوم', 'ادبیات']].mean(axis=1), 2)
+    df['انضباط'] = np.round(rng.uniform(14, 20, len(df)), 2)
+    return df
+
+
+def test_school_and_class_matrices_match_pandas():
+    df = correlation_sheet()
+    for correlations in (build_correlations(df), build_correlations(df, build_stats_cube(df))):
+        columns = correlations['columns']
+        assert columns == ['ریاضی', 'علوم', 'ادبیات', 'معدل', 'انضباط']
+        expected = df[columns].corr(min_periods=MIN_PAIRS)
+        np.testing.assert_allclose(correlation_frame(correlations), expected, atol=1e-12, equal_nan=True)
+        pairs = df[columns].notna().astype(int)
+        np.testing.assert_array_equal(correlations['school_pairs'], pairs.T @ pairs)
+        for class_name, block in df.groupby('کلاس'):
+            expected = block[columns].corr(min_periods=MIN_PAIRS)
+            np.testing.assert_allclose(correlation_frame(correlations, class_name), expected,
+                                       atol=1e-12, equal_nan=True)
+        # کلاس تک‌نفره و کلاس با کمتر از MIN_PAIRS نمره مشترک
+        assert np.isnan(correlation_frame(correlations, '104').to_numpy()).all()
+        assert correlations['class_pairs'][correlations['class_index']['104']].max() == 1
+
+
+def test_tables():
+    df = correlation_sheet()
+    correlations = build_correlations(df)
+    table = alignment_table(correlations)
+    assert list(table['درس']) == ['ریاضی', 'علوم', 'ادبیات']
+    assert table['همبستگی با معدل'].tolist() == pytest.approx(
+        [round(df[s].corr(df['معدل']), 3) for s in table['درس']], abs=1e-3)
+    per_class = class_alignment_table(correlations, 'ریاضی')
+    assert per_class['کلاس'].tolist() == correlations['classes']
+    pairs = strongest_pairs(correlations, k=3)
+    assert len(pairs) == 3 and pairs['همبستگی'].abs().is_monotonic_decreasing
+    assert correlation_frame(correlations, 'ناموجود').empty
+
+
+def test_empty_and_constant_columns():
+    df = grade_sheet([10])
+    df['علوم'] = 15.0
+    correlations = build_correlations(df)
+    expected = df[correlations['columns']].corr(min_periods=MIN_PAIRS)
+    np.testing.assert_allclose(correlations['school'], expected, atol=1e-12, equal_nan=True)
+    empty = build_correlations(df.iloc[:0])
+    assert empty['classes'] == [] and np.isnan(empty['school']).all()
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from grade_analyzer.cube import build_stats_cube, class_rows, cube_scores, cube_stats
+from grade_analyzer.stats import calculate_iqr_statistics
+
+from .test_stats import assert_same_stats
+
+
+def grade_sheet(sizes, seed=0):
+    """برگه نمرات آزمایشی با تعداد دانش‌آموز داده‌شده برای هر کلاس"""
+    rng = np.random.default_rng(seed)
+    classes = np.repeat([f'{101 + c}' for c in range(len(sizes))], sizes)
+    rng.shuffle(classes)
+    n = len(classes)
+    df = pd.DataFrame({
+        'ردیف': np.arange(1, n + 1),
+        'کلاس': classes,
+        'نام': [f'نام{i}' for i in range(n)],
+        'نام خانوادگی': [f'خانوادگی{i}' for i in range(n)],
+        'ریاضی': np.round(rng.uniform(0, 20, n), 2),
+        'علوم': np.round(rng.normal(14, 3, n).clip(0, 20), 2),
+        'ادبیات': np.round(rng.uniform(8, 20, n), 2),
+    })
+    df.loc[rng.random(n) < 0.1, 'علوم'] = np.nan
+    return df
+
+
+def test_cube_matches_filtered_frame():
+    df = grade_sheet([30, 7, 3, 2, 12])
+    cube = build_stats_cube(df)
+    for class_name in df['کلاس'].unique():
+        block = df[df['کلاس'] == class_name]
+        assert sorted(class_rows(cube, class_name)) == list(np.flatnonzero(df['کلاس'] == class_name))
+        for subject in ['ریاضی', 'علوم', 'ادبیات']:
+            scores = block[subject].dropna().tolist()
+            assert_same_stats(cube_stats(cube, subject, class_name), calculate_iqr_statistics(scores))
+            assert list(cube_scores(cube, subject, class_name)) == pytest.approx(sorted(scores))
+    assert_same_stats(cube_stats(cube, 'ریاضی'), calculate_iqr_statistics(df['ریاضی'].tolist()))
+
+
+def test_one_student_class():
+    df = grade_sheet([1, 25, 1])
+    cube = build_stats_cube(df)
+    single = df['کلاس'].value_counts().index[-1]
+    assert len(class_rows(cube, single)) == 1
+    assert cube_stats(cube, 'ریاضی', single) is None
+    assert len(cube_scores(cube, 'ریاضی', single)) == 1
+    assert cube_stats(cube, 'ریاضی', '102') is not None
+
+
+def test_single_row_sheet():
+    cube = build_stats_cube(grade_sheet([1]))
+    assert cube['classes'] == ['101']
+    assert cube_stats(cube, 'ریاضی', '101') is None
+    assert cube_stats(cube, 'ریاضی') is None
@@ -0,0 +1,45 @@
+from io import BytesIO
+
+import pandas as pd
+
+from grade_analyzer import export
+from grade_analyzer.analysis import cube_analyses
+from grade_analyzer.cube import build_stats_cube
+from grade_analyzer.export import class_statistics_table, export_workbook, outlier_roster
+from grade_analyzer.risk import detect_at_risk_students
+
+from .test_cube import grade_sheet
+
+
+def exported(df, path=None):
+    cube = build_stats_cube(df)
+    out = export_workbook(df, cube, cube_analyses(cube), path or BytesIO(), detect_at_risk_students(df))
+    if path is None:
+        out.seek(0)
+    return cube, pd.read_excel(out, sheet_name=None)
+
+
+def test_workbook_sheets():
+    df = grade_sheet([30, 20, 1])
+    df.loc[0, 'ریاضی'] = 0.0
+    cube, sheets = exported(df)
+    assert list(sheets) == ['آمار دروس', 'آمار کلاس‌ها', 'نیازمند حمایت', 'نمرات پرت']
+    assert len(sheets['آمار کلاس‌ها']) == len(class_statistics_table(cube)) == 9
+    assert len(sheets['نمرات پرت']) == len(outlier_roster(df, cube))
+
+
+def test_workbook_to_path(tmp_path):
+    path = str(tmp_path / 'school.xlsx')
+    _, sheets = exported(grade_sheet([10, 10]), path)
+    assert len(sheets['آمار دروس']) == 3
+
+
+def test_large_tables_are_split_across_sheets(monkeypatch):
+    monkeypatch.setattr(export, 'EXCEL_MAX_ROWS', 6)
+    frame = pd.DataFrame({'a': range(12), 'b': [f'x{i}' for i in range(12)]})
+    out = export._write_sheets([('جدول', frame), ('کوچک', frame.head(2))], BytesIO())
+    out.seek(0)
+    sheets = pd.read_excel(out, sheet_name=None)
+    assert list(sheets) == ['جدول', 'جدول (2)', 'جدول (3)', 'کوچک']
+    pd.testing.assert_frame_equal(pd.concat([sheets['جدول'], sheets['جدول (2)'], sheets['جدول (3)']],
+                                            ignore_index=True), frame)
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from grade_analyzer.history import HistoryStore, key_text, student_keys
+
+from .test_cube import grade_sheet
+
+
+@pytest.fixture
+def store(tmp_path):
+    with HistoryStore(str(tmp_path / 'history.db')) as store:
+        yield store
+
+
+def two_terms():
+    first = grade_sheet([20, 15, 1], seed=8)
+    first.insert(1, 'کد دانش‌آموز', [f'S{i}' for i in range(len(first))])
+    second = first.copy()
+    second['ریاضی'] = (second['ریاضی'] - np.arange(len(second)) % 5).clip(0, 20)
+    return first, second
+
+
+def test_student_deltas_match_frames(store):
+    first, second = two_terms()
+    assert store.ingest_term(first, 'پاییز')['students'] == len(first)
+    store.ingest_term(second, 'بهار')
+    assert store.terms()['name'].tolist() == ['پاییز', 'بهار']
+
+    deltas = store.student_deltas('پاییز', 'بهار', subject='ریاضی')
+    expected = (second['ریاضی'] - first['ریاضی']).dropna()
+    assert len(deltas) == len(expected)
+    assert deltas['delta'].is_monotonic_increasing
+    by_key = deltas.set_index('student_key')['delta']
+    for row, delta in expected.items():
+        assert by_key[first['کد دانش‌آموز'][row]] == pytest.approx(delta)
+
+    history = store.student_history('S3')
+    assert history.loc['ریاضی', 'پاییز'] == pytest.approx(first['ریاضی'][3])
+
+
+def test_class_drops_use_class_means(store):
+    first, second = two_terms()
+    store.ingest_term(first, 'پاییز')
+    store.ingest_term(second, 'بهار')
+    drops = store.class_drops('پاییز', 'بهار', subject='ریاضی')
+    for _, row in drops.iterrows():
+        mask = first['کلاس'] == row['class']
+        assert row['mean_from'] == pytest.approx(first.loc[mask, 'ریاضی'].mean())
+        assert row['mean_to'] == pytest.approx(second.loc[mask, 'ریاضی'].mean())
+    assert drops['delta'].is_monotonic_increasing
+
+
+def test_reimport_replaces_term_and_keeps_last_duplicate(store):
+    first, _ = two_terms()
+    store.ingest_term(first, 'پاییز')
+    duplicated = first.copy()
+    duplicated.loc[len(duplicated)] = duplicated.iloc[0].to_dict() | {'ریاضی': 1.0}
+    result = store.ingest_term(duplicated, 'پاییز')
+    assert result['duplicates'] == 1
+    assert len(store.terms()) == 1
+    assert store.student_history('S0').loc['ریاضی', 'پاییز'] == 1.0
+    assert store.delete_term('پاییز') and not store.delete_term('پاییز')
+
+
+def test_student_keys_without_id_column():
+    df = grade_sheet([2])
+    assert student_keys(df)[0] == f"{df['نام'][0]}|{df['نام خانوادگی'][0]}|101"
+
+
+def test_float_ids_and_classes_match_integer_terms(store):
+    first, second = two_terms()
+    first['کد دانش‌آموز'] = np.arange(1000, 1000 + len(first))
+    first['کلاس'] = first['کلاس'].astype(int)
+    second['کد دانش‌آموز'] = first['کد دانش‌آموز'].astype(float)
+    second['کلاس'] = first['کلاس'].astype(float)
+    # یک خانه خالی، ستون‌ها را float می‌کند
+    second.loc[0, 'کد دانش‌آموز'] = np.nan
+    second.loc[second.index[second['کلاس'] == 101][1], 'کلاس'] = np.nan
+    store.ingest_term(first, 'پاییز')
+    result = store.ingest_term(second, 'بهار')
+    assert result['missing_keys'] == 1 and result['students'] == len(second) - 1
+    deltas = store.student_deltas('پاییز', 'بهار', subject='ریاضی')
+    assert len(deltas) == len(second) - 1
+    assert set(deltas['student_key']) == {str(key) for key in first['کد دانش‌آموز'][1:]}
+    drops = store.class_drops('پاییز', 'بهار', subject='ریاضی')
+    assert sorted(drops['class']) == sorted(str(c) for c in first['کلاس'].unique())
+
+
+def test_key_text():
+    ids = pd.Series([1234.0, np.nan, 12.5])
+    assert list(key_text(ids)) == ['1234', None, '12.5']
+    assert list(key_text(pd.Series(['0012', ' 7 ', '', None]))) == ['0012', '7', None, None]
+    assert list(key_text(pd.Series([101, 102, 101], dtype='category'))) == ['101', '102', '101']
+    assert list(key_text(pd.Series([101.0, np.nan], dtype='category'))) == ['101', None]
+    assert list(student_keys(pd.DataFrame({'کد دانش‌آموز': [1234, np.nan]}))) == ['1234', None]
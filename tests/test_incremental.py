@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from grade_analyzer.cube import CUBE_METRICS, build_stats_cube, cube_scores
+from grade_analyzer.incremental import changed_cells_table, diff_frames, has_changes, update_cube
+
+from .test_cube import grade_sheet
+
+SUBJECTS = ['ریاضی', 'علوم', 'ادبیات']
+
+
+def assert_same_cube(actual, expected):
+    assert actual['classes'] == expected['classes']
+    assert actual['subjects'] == expected['subjects']
+    for metric in CUBE_METRICS:
+        np.testing.assert_allclose(actual[metric].astype(float), expected[metric].astype(float),
+                                   rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=metric)
+    for class_name in expected['classes']:
+        for subject in expected['subjects']:
+            np.testing.assert_array_equal(cube_scores(actual, subject, class_name),
+                                          cube_scores(expected, subject, class_name))
+
+
+def corrected(df, edits):
+    new = df.copy()
+    for row, subject, value in edits:
+        new.loc[row, subject] = value
+    return new
+
+
+@pytest.mark.parametrize('edits', [
+    [(0, 'ریاضی', 20.0)],
+    [(3, 'علوم', np.nan), (4, 'ریاضی', 0.0), (4, 'ادبیات', 19.5)],
+    [(row, 'ریاضی', 10.0) for row in range(0, 40, 3)],
+])
+def test_patched_cells_match_rebuild(edits):
+    old = grade_sheet([25, 12, 3, 1], seed=3)
+    new = corrected(old, edits)
+    diff = diff_frames(old, new, SUBJECTS)
+    assert has_changes(diff)
+    cube, work = update_cube(build_stats_cube(old), new, diff)
+    assert not work['rebuilt']
+    assert_same_cube(cube, build_stats_cube(new))
+    table = changed_cells_table(diff, new)
+    assert len(table) == len(diff['cell_rows'])
+
+
+def test_added_removed_and_moved_rows_match_rebuild():
+    old = grade_sheet([25, 12, 3, 1], seed=4)
+    old.insert(1, 'کد دانش‌آموز', [f'S{i}' for i in range(len(old))])
+    new = old.drop(index=[2, 7]).reset_index(drop=True)
+    new.loc[5, 'کلاس'] = '104'
+    extra = old.iloc[[0]].assign(**{'کد دانش‌آموز': 'S999', 'ریاضی': 11.0})
+    new = pd.concat([new, extra], ignore_index=True)
+    diff = diff_frames(old, new, SUBJECTS)
+    assert len(diff['removed']) == 2 and len(diff['added']) == 1 and len(diff['moved']) == 1
+    cube, work = update_cube(build_stats_cube(old), new, diff)
+    assert not work['rebuilt']
+    assert_same_cube(cube, build_stats_cube(new))
+
+
+def test_unchanged_sheet_has_no_changes():
+    old = grade_sheet([10, 10])
+    diff = diff_frames(old, old.copy(), SUBJECTS)
+    assert not has_changes(diff)
+    cube, work = update_cube(build_stats_cube(old), old, diff)
+    assert work['reused'] == 2
+    assert_same_cube(cube, build_stats_cube(old))
+
+
+def test_schema_change_rebuilds():
+    old = grade_sheet([10, 10])
+    new = old.drop(columns=['علوم'])
+    cube, work = update_cube(build_stats_cube(old), new, diff_frames(old, new, SUBJECTS))
+    assert work['rebuilt']
+    assert cube['subjects'] == ['ریاضی', 'ادبیات']
@@ -0,0 +1,63 @@
+import io
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from grade_analyzer.ingest import ingest_upload, prune_snapshots, snapshot_path
+
+from .test_cube import grade_sheet
+
+
+def xlsx_bytes(df):
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+def test_snapshot_round_trip(tmp_path):
+    data = xlsx_bytes(grade_sheet([10, 5]))
+    first = ingest_upload(data, 'grades.xlsx', snapshot_dir=str(tmp_path))
+    second = ingest_upload(data, 'grades.xlsx', snapshot_dir=str(tmp_path))
+    assert (first['source'], second['source']) == ('file', 'snapshot')
+    pd.testing.assert_frame_equal(first['frame'], second['frame'])
+
+
+def test_snapshot_frame_is_independent_of_the_file(tmp_path):
+    data = xlsx_bytes(grade_sheet([10, 5]))
+    ingest_upload(data, 'grades.xlsx', snapshot_dir=str(tmp_path))
+    result = ingest_upload(data, 'grades.xlsx', snapshot_dir=str(tmp_path))
+    os.remove(snapshot_path(result['hash'], str(tmp_path)))
+    df = result['frame']
+    df.loc[0, 'ریاضی'] = 1.5
+    assert df['ریاضی'][0] == 1.5 and df['ریاضی'].sum() > 0
+
+
+def test_mixed_type_id_columns_fall_back_to_parsed_frame(tmp_path):
+    df = grade_sheet([10, 5])
+    df['ردیف'] = df['ردیف'].astype(object)
+    df.loc[3, 'ردیف'] = '۴-الف'
+    df.insert(1, 'کد دانش‌آموز', [1000 + i if i % 2 else f'S{i}' for i in range(len(df))])
+    result = ingest_upload(xlsx_bytes(df), 'grades.xlsx', snapshot_dir=str(tmp_path))
+    assert result['source'] == 'file'
+    assert 'snapshot_write' not in result['timings']
+    assert len(result['frame']) == len(df)
+    assert list(result['frame']['کد دانش‌آموز'][:2]) == ['S0', 1001]
+    assert os.listdir(tmp_path) == []
+
+
+def test_prune_snapshots_removes_least_recently_used(tmp_path):
+    now = time.time()
+    for age, name in enumerate(['new', 'middle', 'old']):
+        path = snapshot_path(name, str(tmp_path))
+        with open(path, 'wb') as f:
+            f.write(np.zeros(1000, dtype=np.uint8).tobytes())
+        os.utime(path, (now - age * 100, now - age * 100))
+    stale = tmp_path / 'old.feather.123.tmp'
+    stale.write_bytes(b'x')
+    os.utime(stale, (now - 10 ** 5, now - 10 ** 5))
+
+    assert prune_snapshots(str(tmp_path), max_bytes=2500, keep=[snapshot_path('old', str(tmp_path))]) == 2
+    assert sorted(os.listdir(tmp_path)) == ['new.feather', 'old.feather']
+    assert prune_snapshots(str(tmp_path / 'missing')) == 0
@@ -0,0 +1,91 @@
+import threading
+
+from grade_analyzer.cache import AnalysisCache
+from grade_analyzer.jobs import JobQueue
+
+
+def failing(progress):
+    raise RuntimeError('boom')
+
+
+def blocking(release):
+    def run(progress):
+        while not release.wait(0.01):
+            progress(0.5)
+        return 'ok'
+    return run
+
+
+def test_failed_job_is_not_resubmitted_without_retry():
+    queue = JobQueue(workers=1)
+    calls = []
+
+    def func(progress):
+        calls.append(1)
+        return failing(progress)
+
+    first = queue.submit('k', func)
+    assert queue.wait(first, 5).state == 'failed'
+    assert queue.submit('k', func) == first
+    assert len(calls) == 1
+    retried = queue.submit('k', func, retry=True)
+    assert retried != first
+    assert queue.wait(retried, 5).state == 'failed' and len(calls) == 2
+    queue.shutdown()
+
+
+def test_cancel_detaches_one_owner_only():
+    queue = JobQueue(workers=1)
+    release = threading.Event()
+    job_id = queue.submit('k', blocking(release), owner='a')
+    assert queue.submit('k', blocking(release), owner='b') == job_id
+    assert queue.cancel(job_id, owner='a')
+    assert not queue.get(job_id).cancel_requested
+    release.set()
+    assert queue.wait(job_id, 5).state == 'done'
+    assert queue.result(job_id) == 'ok'
+
+    release.clear()
+    job_id = queue.submit('other', blocking(release), owner='a')
+    assert queue.cancel(job_id, owner='a')
+    assert queue.wait(job_id, 5).state == 'cancelled'
+    queue.shutdown()
+
+
+def test_results_live_in_the_cache_budget():
+    cache = AnalysisCache(max_bytes=10_000)
+    queue = JobQueue(workers=1, cache=cache)
+    key = ('hash', 'excel')
+    job_id = queue.submit(key, lambda progress: b'x' * 1_000)
+    queue.wait(job_id, 5)
+    assert key in cache and queue.get(job_id).result is None
+    assert queue.result(job_id) == b'x' * 1_000
+    assert queue.submit(key, lambda progress: b'y') == job_id
+
+    # پس از حذف از کش، نتیجه در دسترس نیست و کار دوباره اجرا می‌شود
+    cache.invalidate('hash')
+    assert queue.result(job_id) is None
+    rerun = queue.submit(key, lambda progress: b'y')
+    assert rerun != job_id
+    queue.wait(rerun, 5)
+    assert queue.result(rerun) == b'y'
+
+    # نتیجه بزرگ‌تر از کل سقف کش فقط روی آخرین کار می‌ماند
+    big = [queue.submit(('hash', 'big', i), lambda progress: b'z' * 20_000) for i in range(2)]
+    for job_id in big:
+        queue.wait(job_id, 5)
+    assert queue.result(big[0]) is None
+    assert queue.result(big[1]) == b'z' * 20_000
+    queue.shutdown()
+
+
+def test_cached_result_is_reused_without_running():
+    cache = AnalysisCache(max_bytes=10_000)
+    queue = JobQueue(workers=1, cache=cache)
+    key = ('hash', 'document')
+    cache.put(key, b'cached')
+    calls = []
+    job_id = queue.submit(key, lambda progress: calls.append(1) or b'new')
+    queue.wait(job_id, 5)
+    assert calls == [] and queue.result(job_id) == b'cached'
+    queue.shutdown()
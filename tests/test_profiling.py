@@ -0,0 +1,31 @@
+import threading
+
+from grade_analyzer import profiling
+from grade_analyzer.jobs import JobQueue
+
+
+def test_worker_spans_reach_the_run_records(monkeypatch):
+    monkeypatch.setattr(profiling, 'ENABLED', True)
+    with profiling.span('old'):
+        pass
+    profiling.start_run('test')
+    with profiling.span('page'):
+        pass
+
+    def work(progress):
+        with profiling.span('job'):
+            return 1
+
+    queue = JobQueue(workers=1)
+    queue.wait(queue.submit('k', work), 5)
+    queue.shutdown()
+    thread = threading.Thread(target=profiling.record, args=('worker', 0.01), name='worker')
+    thread.start()
+    thread.join()
+
+    items = profiling.records()
+    assert [item['span'] for item in items] == ['page', 'job', 'worker']
+    assert items[0]['run'] == 'test' and items[0]['thread'] == threading.current_thread().name
+    assert items[1]['thread'].startswith('grade-analyzer-job') and items[2]['thread'] == 'worker'
+    assert all(item['depth'] == 0 for item in items)
+    assert set(profiling.summary()) == {'page', 'job', 'worker'}
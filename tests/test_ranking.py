@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+from grade_analyzer.cube import build_stats_cube
+from grade_analyzer.ranking import build_rank_index, leaderboard, student_ranks, top_rows
+
+from .test_cube import grade_sheet
+
+
+def expected_ranks(scores):
+    """رتبه رقابتی و صدک «کمترها + نصف برابرها» با pandas (مرجع)"""
+    rank = scores.rank(method='min', ascending=False)
+    below = scores.rank(method='min', ascending=True) - 1
+    equal = scores.map(scores.value_counts())
+    percentile = (below + equal / 2) / scores.notna().sum() * 100
+    return rank.fillna(0).astype(int).to_numpy(), percentile.to_numpy()
+
+
+def rank_sheet():
+    df = grade_sheet([30, 9, 1], seed=5)
+    # نمرات برابر برای بررسی رتبه‌های مساوی
+    df['ریاضی'] = np.round(df['ریاضی'] / 2) * 2
+    df.loc[[0, 5], 'ریاضی'] = np.nan
+    df['معدل'] = np.round(df[['ریاضی', 'علوم', 'ادبیات']].mean(axis=1), 2)
+    return df
+
+
+def test_school_and_class_ranks_match_pandas():
+    df = rank_sheet()
+    for index in (build_rank_index(df), build_rank_index(df, build_stats_cube(df))):
+        assert index['columns'] == ['ریاضی', 'علوم', 'ادبیات', 'معدل']
+        for j, column in enumerate(index['columns']):
+            rank, percentile = expected_ranks(df[column])
+            np.testing.assert_array_equal(index['school_rank'][:, j], rank)
+            np.testing.assert_allclose(index['school_percentile'][:, j], percentile, rtol=1e-6, equal_nan=True)
+            for class_name, block in df.groupby('کلاس'):
+                rows = block.index.to_numpy()
+                rank, percentile = expected_ranks(block[column])
+                np.testing.assert_array_equal(index['class_rank'][rows, j], rank)
+                np.testing.assert_allclose(index['class_percentile'][rows, j], percentile,
+                                           rtol=1e-6, equal_nan=True)
+
+
+def test_top_rows_and_leaderboard():
+    df = rank_sheet()
+    index = build_rank_index(df)
+    top = top_rows(index, 'ریاضی', 5)
+    expected = df['ریاضی'].sort_values(ascending=False, kind='stable').index[:5]
+    assert list(df['ریاضی'].iloc[top]) == list(df['ریاضی'].loc[expected])
+    block = df[df['کلاس'] == '102']
+    top = top_rows(index, 'علوم', 50, '102')
+    assert len(top) == block['علوم'].notna().sum()
+    assert list(df['علوم'].iloc[top]) == sorted(block['علوم'].dropna(), reverse=True)
+    board = leaderboard(index, df, 'معدل', 3)
+    assert list(board['رتبه']) == [1, 2, 3]
+    assert top_rows(index, 'فیزیک').size == 0
+
+
+def test_student_without_score_has_no_rank():
+    df = rank_sheet()
+    ranks = student_ranks(build_rank_index(df), 0)
+    assert ranks['school_rank'][0] == 0
+    assert np.isnan(ranks['school_percentile'][0])
+    assert ranks['class'] == df['کلاس'][0]
+
+
+def test_student_without_class():
+    df = pd.concat([rank_sheet(), rank_sheet().iloc[[1]].assign(**{'کلاس': np.nan})], ignore_index=True)
+    index = build_rank_index(df)
+    ranks = student_ranks(index, len(df) - 1)
+    assert ranks['class'] is None
+    assert ranks['school_rank'][1] > 0
+    assert not ranks['class_rank'].any()
@@ -0,0 +1,31 @@
+import base64
+
+from grade_analyzer import render
+from grade_analyzer.analysis import cube_analyses
+from grade_analyzer.cube import build_stats_cube
+from grade_analyzer.render import render_document, school_report_html
+
+from .test_cube import grade_sheet
+
+
+def test_report_needs_no_network():
+    document = school_report_html(cube_analyses(build_stats_cube(grade_sheet([20, 1]))))
+    assert '@import' not in document
+    assert 'http://' not in document and 'https://' not in document
+    assert "local('Vazirmatn')" in document
+
+
+def test_font_file_is_embedded(tmp_path):
+    font = tmp_path / 'Vazirmatn-Regular.ttf'
+    font.write_bytes(b'\x00\x01\x00\x00font')
+    face = render.font_face(str(font))
+    assert base64.b64encode(font.read_bytes()).decode('ascii') in face
+    assert "format('truetype')" in face
+    assert 'url(' not in render.font_face(str(tmp_path / 'missing.ttf'))
+
+
+def test_html_fallback_without_pdf(monkeypatch):
+    monkeypatch.setattr(render, 'html_to_pdf', lambda document: None)
+    rendered = render_document('<p>سلام</p>')
+    assert rendered['extension'] == '.html'
+    assert rendered['data'].decode('utf-8') == '<p>سلام</p>'
@@ -0,0 +1,43 @@
+import numpy as np
+
+from grade_analyzer.reports import generate_all_reports, generate_teacher_report
+
+from .test_cube import grade_sheet
+
+
+def report_sheet():
+    df = grade_sheet([25, 12, 1], seed=3)
+    df['ریاضی'] = np.round(df['ریاضی'] * 4) / 4
+    df['معدل'] = np.round(df[['ریاضی', 'علوم', 'ادبیات']].mean(axis=1), 2)
+    df['انضباط'] = np.where(np.arange(len(df)) % 4 == 0, 14.0, 19.5)
+    return df
+
+
+def gpa_line(report):
+    return [line for line in report['success_stories'] if 'هماهنگی با معدل' in line]
+
+
+def test_batched_reports_match_single_reports():
+    df = report_sheet()
+    reports = {(report['subject'], report['class']): report
+               for report in generate_all_reports(df, ['ریاضی', 'علوم'])}
+    for class_name, block in df.groupby('کلاس'):
+        block = block.reset_index(drop=True)
+        for subject in ['ریاضی', 'علوم']:
+            single = generate_teacher_report(block, subject)
+            report = reports.get((subject, class_name))
+            # کلاس یک‌نفره در هر دو مسیر گزارشی ندارد
+            assert (report is None) == (single is None)
+            if single is None:
+                continue
+            assert report['summary'] == single['summary']
+            assert report['concerns'] == single['concerns']
+            assert gpa_line(report) == gpa_line(single)
+
+def test_gpa_line_counts_excellent_subject_scores():
+    # شمارش مرجع: نمره ۱۸ و بالاتر در درس، فقط وقتی ستون معدل وجود دارد
+    df = report_sheet()
+    report = generate_teacher_report(df, 'ریاضی')
+    expected = int((df['ریاضی'] >= 18).sum())
+    assert gpa_line(report) == [f"**هماهنگی با معدل**: {expected} دانش‌آموز هم در این درس و هم در معدل عالی هستند"]
+    assert gpa_line(generate_teacher_report(df.drop(columns=['معدل']), 'ریاضی')) == []
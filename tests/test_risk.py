@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+from grade_analyzer.risk import detect_at_risk_students, student_risk_flags
+
+from .test_cube import grade_sheet
+
+SUBJECTS = ['ریاضی', 'علوم', 'ادبیات', 'فیزیک', 'شیمی']
+
+
+def baseline_weak_students(df, subjects, min_score=10, min_weak=3):
+    """حلقه iterrows نسخه اولیه (مرجع) با همه دروس ضعیف هر دانش‌آموز"""
+    weak_students = {}
+    for index, row in df.iterrows():
+        low_scores = {}
+        for subject in subjects:
+            if pd.notna(row[subject]) and row[subject] < min_score:
+                low_scores[subject] = row[subject]
+        if len(low_scores) >= min_weak:
+            weak_students[index] = {
+                'نام': f"{row['نام']} {row['نام خانوادگی']}",
+                'کلاس': row['کلاس'] if 'کلاس' in row else '-',
+                'low_scores': low_scores,
+            }
+    return weak_students
+
+
+def risk_sheet():
+    df = grade_sheet([40, 25, 1], seed=9)
+    rng = np.random.default_rng(3)
+    df['فیزیک'] = np.round(rng.uniform(0, 20, len(df)) * 2) / 2
+    df['شیمی'] = np.round(rng.uniform(0, 20, len(df)) * 2) / 2
+    df.loc[rng.random(len(df)) < 0.1, 'فیزیک'] = np.nan
+    # نمرات برابر و دانش‌آموزان با تعداد و میانگین ضعیف یکسان
+    df.loc[[2, 7], SUBJECTS] = [4.0, 6.0, 8.0, 12.0, np.nan]
+    df.loc[11, SUBJECTS] = [9.0, 9.0, 9.0, 9.0, 9.0]
+    return df
+
+
+def parse_labels(label):
+    parts = [part for part in label.removesuffix('...').split(', ') if part]
+    return {subject: float(score) for subject, score in (part.split(': ') for part in parts)}
+
+
+def test_matches_baseline_loop():
+    df = risk_sheet()
+    for min_score, min_weak in [(10, 3), (12, 2), (10, 1)]:
+        expected = baseline_weak_students(df, SUBJECTS, min_score, min_weak)
+        result = detect_at_risk_students(df, SUBJECTS, min_score, min_weak)
+        assert set(result.index) == set(expected)
+
+        for index, row in result.iterrows():
+            low = expected[index]['low_scores']
+            assert row['نام'] == expected[index]['نام'] and row['کلاس'] == expected[index]['کلاس']
+            assert row['تعداد دروس ضعیف'] == len(low)
+            assert row['میانگین دروس ضعیف'] == round(np.mean(list(low.values())), 2)
+            # سه درس با کمترین نمره، از میان دروس ضعیف حلقه مرجع
+            shown = parse_labels(row['دروس ضعیف'])
+            lowest = sorted(low.values())[:3]
+            assert sorted(shown.values()) == lowest
+            assert all(low[subject] == score for subject, score in shown.items())
+            assert row['دروس ضعیف'].endswith('...') == (len(low) > 3)
+
+        # ترتیب: تعداد دروس ضعیف نزولی، سپس میانگین ضعیف صعودی، سپس ترتیب ردیف‌ها
+        reference = sorted(expected, key=lambda i: (-len(expected[i]['low_scores']),
+                                                    np.mean(list(expected[i]['low_scores'].values())),
+                                                    df.index.get_loc(i)))
+        assert list(result.index) == reference
+
+
+def test_empty_results_and_flags():
+    df = risk_sheet()
+    assert detect_at_risk_students(df, SUBJECTS, min_score=0).empty
+    assert detect_at_risk_students(df.iloc[:0], SUBJECTS).empty
+    assert detect_at_risk_students(df, []).empty
+    flags = student_risk_flags(df, 2, SUBJECTS)
+    assert flags['weak_subjects'] == ['ریاضی', 'علوم', 'ادبیات']
+    assert flags['missing_subjects'] == ['شیمی'] and flags['at_risk']
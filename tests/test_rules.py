@@ -0,0 +1,116 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from grade_analyzer.analysis import analyze_subject_scores
+from grade_analyzer.rules import DEFAULT_RULES, compile_rules, evaluate_batch, load_rules
+from grade_analyzer.stats import batch_iqr_statistics, calculate_iqr_statistics
+
+from .test_cube import grade_sheet
+
+
+def baseline_evaluation(scores):
+    """قوانین ثابت نسخه اولیه app.py (مرجع برابری نتایج)"""
+    stats = calculate_iqr_statistics(scores)
+    weaknesses, strengths, recommendations = [], [], []
+    if len([s for s in scores if s < 10]) / len(scores) > 0.3:
+        weaknesses.append("تعداد زیاد دانش‌آموزان ضعیف (نمره زیر ۱۰)")
+    if np.std(scores) > 6:
+        weaknesses.append("پراکندگی زیاد نمرات (اختلاف سطح بالا)")
+    if min(scores) == 0:
+        weaknesses.append("وجود نمره صفر (نیاز به بررسی ویژه)")
+    if len([s for s in scores if s < 5]) > 0:
+        weaknesses.append("وجود نمرات بسیار پایین (زیر ۵)")
+    if np.mean(scores) > 15:
+        strengths.append("میانگین کلاس عالی")
+    if len([s for s in scores if s >= 18]) / len(scores) > 0.4:
+        strengths.append("تعداد قابل توجه دانش‌آموزان ممتاز")
+    if np.std(scores) < 4:
+        strengths.append("همگنی مناسب کلاس")
+    if min(scores) > 10:
+        strengths.append("عدم وجود دانش‌آموز بسیار ضعیف")
+    if stats['mean'] < 12:
+        recommendations.append("🔴 **نیاز فوری**: برگزاری کلاس‌های جبرانی فشرده")
+    elif stats['mean'] < 15:
+        recommendations.append("🟡 **نیاز متوسط**: افزایش تمرین‌های تکمیلی")
+    else:
+        recommendations.append("🟢 **وضعیت مطلوب**: ادامه رویه فعلی با افزودن چالش‌های بیشتر")
+    if stats['std'] > 6:
+        recommendations.append("🎯 **تدریس تفکیکی**: گروه‌بندی دانش‌آموزان بر اساس سطح")
+    if stats['outlier_count'] > 0:
+        recommendations.append("👥 **حمایت ویژه**: توجه خاص به دانش‌آموزان outlier")
+    if stats['iqr'] > 8:
+        recommendations.append("📊 **بازبینی روش**: بررسی تأثیر روش تدریس فعلی")
+    return {
+        'grade_distribution': {
+            'ضعیف (0-9)': len([s for s in scores if 0 <= s <= 9]),
+            'قابل قبول (10-14)': len([s for s in scores if 10 <= s <= 14]),
+            'خوب (15-17)': len([s for s in scores if 15 <= s <= 17]),
+            'عالی (18-20)': len([s for s in scores if 18 <= s <= 20]),
+        },
+        'weaknesses': weaknesses,
+        'strengths': strengths,
+        'recommendations': recommendations,
+    }
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_default_rules_match_baseline(seed):
+    df = grade_sheet([40], seed=seed)
+    rng = np.random.default_rng(seed)
+    df['ریاضی'] = rng.integers(0, 21, len(df)).astype(float)
+    df['ادبیات'] = np.round(rng.uniform(16, 20, len(df)) * 4) / 4
+    for subject in ['ریاضی', 'علوم', 'ادبیات']:
+        scores = df[subject].dropna().tolist()
+        analysis = analyze_subject_scores(df, subject)
+        expected = baseline_evaluation(scores)
+        for key, value in expected.items():
+            assert analysis[key] == value, (subject, key)
+
+
+def test_batch_evaluation_is_per_column():
+    matrix = np.array([[0.0, 19.0], [4.0, 18.0], [12.0, 19.5], [15.0, np.nan]])
+    results = evaluate_batch(batch_iqr_statistics(matrix))
+    assert results[0]['grade_distribution']['ضعیف (0-9)'] == 2
+    assert 'وجود نمره صفر (نیاز به بررسی ویژه)' in results[0]['weaknesses']
+    assert results[1]['grade_distribution']['عالی (18-20)'] == 3
+    assert 'تعداد قابل توجه دانش‌آموزان ممتاز' in results[1]['strengths']
+
+
+@pytest.mark.parametrize('rule, message', [
+    ({'metric': 'avg', 'op': '<', 'value': 10, 'message': 'x'}, "شاخص ناشناخته 'avg'"),
+    ({'metric': 'mean', 'op': '=>', 'value': 10, 'message': 'x'}, "عملگر نامعتبر '=>'"),
+    ({'metric': 'share_below', 'op': '>', 'value': 0.5, 'message': 'x'}, 'param'),
+    ({'metric': 'mean', 'op': '<', 'value': '10', 'message': 'x'}, 'value'),
+    ({'metric': 'mean', 'op': '<', 'value': 10}, 'message'),
+])
+def test_invalid_rule_is_reported_at_compile_time(rule, message):
+    config = {'weaknesses': [DEFAULT_RULES['weaknesses'][0], rule]}
+    with pytest.raises(ValueError, match='قانون 2 از «weaknesses»') as error:
+        compile_rules(config)
+    assert message in str(error.value)
+
+
+def test_unknown_rule_set_is_rejected():
+    with pytest.raises(ValueError, match='weakness'):
+        compile_rules({'weakness': []})
+
+
+def test_rules_file_is_reloaded_when_changed(tmp_path, monkeypatch):
+    path = tmp_path / 'rules.json'
+    rules = {'strengths': [{'metric': 'mean', 'op': '>', 'value': 10, 'message': 'بالای ده'}]}
+    path.write_text(json.dumps(rules, ensure_ascii=False), encoding='utf-8')
+    monkeypatch.setenv('GRADE_ANALYZER_RULES', str(path))
+    first = load_rules()
+    assert [rule['message'] for rule in first['strengths']] == ['بالای ده']
+
+    rules['strengths'][0]['value'] = 12
+    path.write_text(json.dumps(rules, ensure_ascii=False), encoding='utf-8')
+    os.utime(path, (os.path.getmtime(path) + 10,) * 2)
+    second = load_rules()
+    assert second['strengths'][0]['value'] == 12
+    assert second['fingerprint'] != first['fingerprint']
+    monkeypatch.delenv('GRADE_ANALYZER_RULES')
+    assert load_rules()['fingerprint'] == compile_rules()['fingerprint']
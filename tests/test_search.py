@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+from grade_analyzer.search import build_search_index, normalize_text, search_key, search_students, search_table
+
+
+def roster():
+    return pd.DataFrame({
+        'کلاس': ['101', '101', '102', '102', '103'],
+        'نام': ['محمدرضا', 'علي', 'زهرا', 'محمد', 'كوثر'],
+        'نام خانوادگی': ['کریمی', 'احمدی', 'کریمی', 'رضایی', 'مُحسنی'],
+        'کد دانش‌آموز': [1401001, 1401002, 1401003, 1401004, 1401005],
+    })
+
+
+def test_normalization():
+    assert normalize_text('علي  ك') == 'علی ک'
+    assert normalize_text('مُحسنی') == 'محسنی'
+    assert search_key('محمد‌رضا') == search_key('محمد رضا') == search_key('محمدرضا')
+    assert normalize_text('۱۴۰۱') == '1401'
+
+
+def test_exact_prefix_and_full_name_matches():
+    index = build_search_index(roster())
+    result = search_students(index, 'علی', fuzzy=False)
+    assert list(result['rows']) == [1] and list(result['scores']) == [1.0]
+    result = search_students(index, 'محمد', fuzzy=False)
+    assert list(result['rows']) == [3, 0]
+    assert list(result['scores']) == [1.0, 0.9]
+    assert list(search_students(index, 'زهرا کريمي')['rows'][:1]) == [2]
+    assert list(search_students(index, 'کریمی زهرا')['rows'][:1]) == [2]
+    assert list(search_students(index, 'کوثر محسنی')['rows'][:1]) == [4]
+
+
+def test_student_id_and_typos():
+    index = build_search_index(roster())
+    assert list(search_students(index, '۱۴۰۱۰۰۳')['rows']) == [2]
+    assert 0 in search_students(index, 'محمدرزا')['rows']
+    assert len(search_students(index, '')['rows']) == 0
+    assert len(search_students(index, 'xyz', fuzzy=False)['rows']) == 0
+
+
+def test_search_table():
+    df = roster()
+    table = search_table(df, search_students(build_search_index(df), '1401002'))
+    assert table['نام'].tolist() == ['علي']
+    assert table['کد دانش‌آموز'].tolist() == ['1401002']
+
+
+def test_index_without_name_columns():
+    df = pd.DataFrame({'کد دانش‌آموز': [10.0, np.nan, 12.0]})
+    index = build_search_index(df)
+    assert list(search_students(index, '12')['rows']) == [2]
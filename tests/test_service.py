@@ -0,0 +1,108 @@
+import asyncio
+import gzip
+import json
+from urllib.parse import urlencode
+import pytest
+
+from grade_analyzer.service import AnalysisService
+
+from .test_cube import grade_sheet
+
+
+def call(app, method, path, query='', body=b'', headers=()):
+    """اجرای یک درخواست روی برنامه ASGI و برگرداندن (وضعیت، سرآیندها، بدنه)"""
+    sent = []
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query.encode(),
+             'headers': list(headers)}
+    asyncio.run(app(scope, receive, send))
+    return sent[0]['status'], dict(sent[0]['headers']), sent[1]['body']
+
+
+def get_json(app, path, query=''):
+    status, _, body = call(app, 'GET', path, query)
+    return status, json.loads(body)
+
+
+@pytest.fixture
+def service(tmp_path):
+    return AnalysisService(snapshot_dir=str(tmp_path))
+
+
+@pytest.fixture
+def upload(service):
+    df = grade_sheet([20, 15, 1], seed=2)
+    # شماره کلاس عددی، رایج‌ترین حالت برگه نمرات
+    df['کلاس'] = df['کلاس'].astype(int)
+    status, _, body = call(service, 'POST', '/uploads', 'filename=grades.csv',
+                           df.to_csv(index=False).encode('utf-8'))
+    assert status == 201
+    return json.loads(body)
+
+
+def test_upload_summary(service, upload):
+    assert upload['rows'] == 36 and sorted(upload['classes']) == [101, 102, 103]
+    assert get_json(service, f"/uploads/{upload['hash']}")[1]['subjects'] == ['ریاضی', 'علوم', 'ادبیات']
+
+
+def test_numeric_class_parameters(service, upload):
+    base = f"/uploads/{upload['hash']}"
+    status, data = get_json(service, f'{base}/subjects', 'class=101')
+    assert status == 200 and set(data) == {'ریاضی', 'علوم', 'ادبیات'}
+    status, data = get_json(service, f"{base}/subjects/ریاضی", 'class=102')
+    assert status == 200 and data['class'] == 102
+    status, data = get_json(service, f'{base}/compare',
+                            urlencode({'subject': 'ریاضی', 'class1': 101, 'class2': 102}))
+    assert status == 200
+    status, data = get_json(service, f"{base}/reports/علوم", 'class=101&teacher=x')
+    assert status == 200 and data['class'] == 101 and data['teacher'] == 'x'
+    assert get_json(service, f'{base}/subjects', 'class=999')[0] == 404
+
+
+def test_at_risk_parameters(service, upload):
+    base = f"/uploads/{upload['hash']}/at-risk"
+    status, data = get_json(service, base, 'min_score=15&min_weak_subjects=1&limit=2')
+    assert status == 200 and data['count'] >= 2 and len(data['students']) == 2
+    for query in ('limit=0', 'limit=-3', 'min_weak_subjects=0', 'min_score=-1', 'min_score=nan',
+                  'limit=abc'):
+        assert get_json(service, base, query)[0] == 400, query
+
+
+def test_not_found_and_bad_requests(service, upload):
+    assert get_json(service, '/nothing')[0] == 404
+    assert get_json(service, '/uploads/abc123')[0] == 404
+    assert get_json(service, f"/uploads/{upload['hash']}/subjects/فیزیک")[0] == 404
+    assert call(service, 'DELETE', '/uploads')[0] == 405
+    assert call(service, 'POST', '/uploads', 'filename=grades.txt', b'x')[0] == 400
+    assert get_json(service, f"/uploads/{upload['hash']}/compare", 'class1=101')[0] == 400
+
+
+def test_gzip_and_cached_responses(service, upload):
+    path = f"/uploads/{upload['hash']}/subjects"
+    status, headers, plain = call(service, 'GET', path)
+    assert status == 200 and b'content-encoding' not in headers
+    status, headers, body = call(service, 'GET', path, headers=[(b'accept-encoding', b'gzip, br')])
+    assert headers[b'content-encoding'] == b'gzip'
+    assert gzip.decompress(body) == plain
+    assert int(headers[b'content-length']) == len(body)
+
+
+def test_busy_service_returns_503(tmp_path):
+    service = AnalysisService(snapshot_dir=str(tmp_path), concurrency=1, max_pending=0)
+    service.pending = 1
+    status, headers, _ = call(service, 'POST', '/uploads', 'filename=a.csv', b'a,b\n1,2\n')
+    assert status == 503 and headers[b'retry-after'] == b'1'
+    assert get_json(service, '/health')[1]['status'] == 'ok'
+
+
+def test_frame_reloads_from_snapshot(service, upload):
+    service.cache.invalidate()
+    assert service.frame(upload['hash']).shape[0] == 36
+    assert get_json(service, f"/uploads/{upload['hash']}")[0] == 200
@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+import pytest
+
+from grade_analyzer.cli import main
+from grade_analyzer.sketch import (
+    QuantileSketch,
+    load_sketches,
+    merge_sketches,
+    save_sketches,
+    sketch_frame,
+    sketch_statistics,
+)
+from grade_analyzer.stats import calculate_iqr_statistics
+
+from .test_cube import grade_sheet
+
+
+def scores(n, seed):
+    return np.round(np.random.default_rng(seed).normal(14, 3, n).clip(0, 20) * 4) / 4
+
+
+def rank_error(sketch, values, qs):
+    """بیشترین خطای رتبه چندک‌های خلاصه نسبت به نمرات واقعی"""
+    ordered = np.sort(values)
+    estimates = sketch.quantiles(qs)
+    low = np.searchsorted(ordered, estimates, side='left') / len(values)
+    high = np.searchsorted(ordered, estimates, side='right') / len(values)
+    return max(0.0, float(np.max(np.maximum(low - qs, qs - high))))
+
+
+def test_exact_moments_and_bounded_quantile_error():
+    values = scores(50_000, 0)
+    sketch = QuantileSketch.from_values(values, seed=1)
+    stats = sketch.statistics()
+    assert stats['count'] == len(values)
+    assert stats['mean'] == pytest.approx(values.mean())
+    assert stats['std'] == pytest.approx(values.std())
+    assert (stats['min'], stats['max']) == (values.min(), values.max())
+    assert sketch.size < 2_000
+    assert rank_error(sketch, values, np.linspace(0.05, 0.95, 19)) < 0.02
+
+
+def test_merged_sketch_matches_whole_input():
+    parts = [scores(20_000, seed) for seed in range(4)]
+    merged = merge_sketches([{'ریاضی': QuantileSketch.from_values(part, seed=i)}
+                             for i, part in enumerate(parts)])['ریاضی']
+    values = np.concatenate(parts)
+    assert merged.count == len(values)
+    assert merged.statistics()['mean'] == pytest.approx(values.mean())
+    assert rank_error(merged, values, np.array([0.25, 0.5, 0.75])) < 0.02
+
+
+def test_small_input_is_exact():
+    df = grade_sheet([40])
+    exact = calculate_iqr_statistics(df['ریاضی'].tolist())
+    approx = sketch_statistics(sketch_frame(df))['ریاضی']
+    for key in ('count', 'mean', 'min', 'max'):
+        assert approx[key] == pytest.approx(exact[key])
+    assert approx['median'] in df['ریاضی'].to_numpy()
+    assert sketch_statistics({'x': QuantileSketch.from_values([1.0, 2.0])})['x'] is None
+
+
+def test_save_and_load_round_trip(tmp_path):
+    sketches = sketch_frame(grade_sheet([30, 30]))
+    path = save_sketches(sketches, tmp_path / 'school.json', source='grades.xlsx')
+    loaded = load_sketches(path)
+    assert loaded.keys() == sketches.keys()
+    for subject, sketch in sketches.items():
+        assert loaded[subject].statistics() == sketch.statistics()
+
+
+def test_sketch_command_keeps_same_named_files(tmp_path):
+    paths = []
+    for i, region in enumerate(['north', 'south']):
+        (tmp_path / region).mkdir()
+        paths.append(str(tmp_path / region / 'school.csv'))
+        grade_sheet([20, 10], seed=i).to_csv(paths[-1], index=False)
+    out = tmp_path / 'sketches'
+    assert main(['sketch', *paths, '--out', str(out)]) == 0
+    assert sorted(os.listdir(out)) == ['north__school.sketch.json', 'south__school.sketch.json']
+    assert main(['sketch', paths[0], paths[0], '--out', str(tmp_path / 'again')]) == 2
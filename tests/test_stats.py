@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from grade_analyzer.stats import batch_iqr_statistics, calculate_iqr_statistics, subject_statistics, subject_view
+
+
+def baseline_iqr_statistics(data):
+    """پیاده‌سازی اولیه calculate_iqr_statistics (مرجع برابری نتایج)"""
+    if len(data) < 3:
+        return None
+    sorted_data = sorted(data)
+    n = len(sorted_data)
+
+    def calc_median(arr):
+        if not arr:
+            return None
+        m = len(arr)
+        return arr[m // 2] if m % 2 == 1 else (arr[m // 2 - 1] + arr[m // 2]) / 2
+
+    median = calc_median(sorted_data)
+    if n % 2 == 1:
+        lower_half, upper_half = sorted_data[:n // 2], sorted_data[n // 2 + 1:]
+    else:
+        lower_half, upper_half = sorted_data[:n // 2], sorted_data[n // 2:]
+    q1, q3 = calc_median(lower_half), calc_median(upper_half)
+    if q1 is None or q3 is None:
+        return None
+    iqr = q3 - q1
+    lower_bound, upper_bound = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+    outliers = [x for x in sorted_data if x < lower_bound or x > upper_bound]
+    return {
+        'count': n,
+        'mean': float(np.mean(data)),
+        'median': float(median),
+        'std': float(np.std(data)) if n > 1 else 0,
+        'min': float(min(data)),
+        'max': float(max(data)),
+        'q1': float(q1),
+        'q3': float(q3),
+        'iqr': float(iqr),
+        'lower_bound': float(lower_bound),
+        'upper_bound': float(upper_bound),
+        'outliers': outliers,
+        'outlier_count': len(outliers),
+        'outlier_percent': len(outliers) / n * 100,
+    }
+
+
+def assert_same_stats(actual, expected):
+    if expected is None:
+        assert actual is None
+        return
+    assert actual is not None
+    assert actual.keys() == expected.keys()
+    for key, value in expected.items():
+        if key == 'outliers':
+            assert [float(x) for x in actual[key]] == pytest.approx([float(x) for x in value])
+        else:
+            assert actual[key] == pytest.approx(value, abs=1e-9), key
+
+
+@pytest.mark.parametrize('n', [3, 4, 5, 6, 7, 10, 31, 200])
+def test_matches_baseline_formula(n):
+    rng = np.random.default_rng(n)
+    data = np.round(rng.uniform(0, 20, n) * 4) / 4
+    data[:2] = [0.0, 20.0]
+    assert_same_stats(calculate_iqr_statistics(data.tolist()), baseline_iqr_statistics(data.tolist()))
+
+
+def test_batch_matches_baseline_per_column_with_missing_scores():
+    rng = np.random.default_rng(7)
+    df = pd.DataFrame({
+        'کلاس': ['101'] * 40,
+        'ریاضی': np.round(rng.uniform(0, 20, 40), 2),
+        'علوم': np.round(rng.normal(14, 3, 40), 2),
+        'ادبیات': np.round(rng.uniform(5, 20, 40), 2),
+    })
+    df.loc[rng.choice(40, 12, replace=False), 'علوم'] = np.nan
+    df.loc[rng.choice(40, 38, replace=False), 'ادبیات'] = np.nan
+    batch = subject_statistics(df)
+    assert batch['subjects'] == ['ریاضی', 'علوم', 'ادبیات']
+    for subject in batch['subjects']:
+        scores = df[subject].dropna().tolist()
+        assert_same_stats(subject_view(batch, subject), baseline_iqr_statistics(scores))
+
+
+def test_one_row_frame():
+    df = pd.DataFrame({'کلاس': ['101'], 'ریاضی': [17.0], 'علوم': [np.nan]})
+    batch = subject_statistics(df)
+    assert list(batch['count']) == [1, 0]
+    assert subject_view(batch, 'ریاضی') is None
+    assert subject_view(batch, 'علوم') is None
+
+
+def test_one_score_column():
+    matrix = np.array([[12.0, np.nan], [np.nan, np.nan], [np.nan, np.nan]])
+    batch = batch_iqr_statistics(matrix)
+    assert list(batch['count']) == [1, 0]
+    assert not batch['valid'].any()
+    assert batch['median'][0] == 12.0
+    assert calculate_iqr_statistics([12.0]) is None
+
+
+def test_empty_matrix():
+    batch = batch_iqr_statistics(np.empty((0, 2)))
+    assert list(batch['count']) == [0, 0]
+    assert not batch['valid'].any()